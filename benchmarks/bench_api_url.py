@@ -0,0 +1,89 @@
+"""Micro-benchmark for ``EmbyHandler.api_url``.
+
+Compares the precomputed base url fast path with the former
+urljoin/parse_qs/urlencode implementation. Run it with::
+
+    python benchmarks/bench_api_url.py
+"""
+from __future__ import print_function, unicode_literals
+
+import timeit
+
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit, urlunsplit
+
+import mock
+
+from mopidy_emby.remote import EmbyHandler
+
+
+NUMBER = 100000
+
+ENDPOINTS = [
+    '/Audio/18e5a9871e6a4a2294d5af998457ca16/stream?static=true',
+    '/Users/2ec276a2642e54a19b612b9418a8bd3b/Items/'
+    '18e5a9871e6a4a2294d5af998457ca16',
+    '/Users/2ec276a2642e54a19b612b9418a8bd3b/Items?Recursive=true'
+    '&SortOrder=Ascending&ParentId=eb169f4ba53fc560f549cb0f2a47d577'
+    '&IncludeItemTypes=MusicAlbum',
+]
+
+
+def legacy_api_url(hostname, port, endpoint):
+    if not hostname.startswith(('http://', 'https://')):
+        hostname = 'http://' + hostname
+
+    joined = urljoin('{}:{}'.format(hostname, port), endpoint)
+    scheme, netloc, path, query_string, fragment = urlsplit(joined)
+    query_params = parse_qs(query_string)
+    query_params['format'] = ['json']
+
+    return urlunsplit(
+        (scheme, netloc, path, urlencode(query_params, doseq=True), fragment)
+    )
+
+
+def handler():
+    config = {
+        'emby': {
+            'hostname': 'emby.local',
+            'port': 8096,
+            'username': 'embyuser',
+            'password': 'embypassword',
+            'user_id': '2ec276a2642e54a19b612b9418a8bd3b',
+        },
+        'proxy': {},
+    }
+
+    with mock.patch.object(EmbyHandler, '_get_token'):
+        return EmbyHandler(config)
+
+
+def main():
+    emby = handler()
+
+    for endpoint in ENDPOINTS:
+        legacy = timeit.timeit(
+            lambda: legacy_api_url(emby.hostname, emby.port, endpoint),
+            number=NUMBER
+        )
+        current = timeit.timeit(
+            lambda: emby.api_url(endpoint),
+            number=NUMBER
+        )
+
+        print(endpoint[:60])
+        print('  legacy  {:8.2f} us/call'.format(legacy / NUMBER * 1e6))
+        print('  current {:8.2f} us/call'.format(current / NUMBER * 1e6))
+
+    params = {'ParentId': 'eb169f4ba53fc560f549cb0f2a47d577', 'Limit': 100}
+    with_params = timeit.timeit(
+        lambda: emby.api_url('/Users/foo/Items', params),
+        number=NUMBER
+    )
+    print('/Users/foo/Items with params')
+    print('  current {:8.2f} us/call'.format(with_params / NUMBER * 1e6))
+    print('A LAN round trip to Emby takes 1000-50000 us.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""End to end benchmark of the library provider against a fake Emby server.
+
+Drives ``EmbyLibraryProvider`` against synthetic libraries and records the
+number of requests, wall time and peak Python memory of every operation.
+Run it with::
+
+    python benchmarks/bench_library.py --sizes 1000 10000 --latency 0.005
+
+``--json`` writes the results to a file, so runs can be compared.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_emby import FakeEmby, Library, USER_ID  # noqa: E402
+
+from mopidy_emby.federation import Federation, Source  # noqa: E402
+from mopidy_emby.library import EmbyLibraryProvider  # noqa: E402
+from mopidy_emby.mixes import QueueBuilder  # noqa: E402
+from mopidy_emby.remote import EmbyHandler  # noqa: E402
+from mopidy_emby.snapshot import LibrarySnapshot  # noqa: E402
+from mopidy_emby.workers import WorkerPool  # noqa: E402
+
+
+def operations(library):
+    artist = library.artists[len(library.artists) // 2]['Id']
+    album = library.albums[len(library.albums) // 2]['Id']
+    track = library.tracks[len(library.tracks) // 2]['Id']
+
+    return [
+        ('browse root', 'browse', ('emby:directory:root',), {}),
+        ('browse artist', 'browse', ('emby:artist:' + artist,), {}),
+        ('browse album', 'browse', ('emby:album:' + album,), {}),
+        ('browse latest', 'browse', ('emby:directory:latest',), {}),
+        ('most played', 'browse', ('emby:directory:most_played',), {}),
+        ('browse genres', 'browse', ('emby:directory:genres',), {}),
+        ('browse genre', 'browse', ('emby:directory:genre:Rock',), {}),
+        ('lookup track', 'lookup', (), {'uri': 'emby:track:' + track}),
+        ('lookup album', 'lookup', (), {'uri': 'emby:album:' + album}),
+        ('lookup artist', 'lookup', (), {'uri': 'emby:artist:' + artist}),
+        ('search track', 'search', (), {'query': {'track_name': ['ck 1']}}),
+        ('search album', 'search', (), {'query': {'album': ['album 1']}}),
+        ('lookup library', 'lookup', (), {'uri': 'emby:library'}),
+        ('shuffle', 'lookup', (), {'uri': 'emby:shuffle'}),
+        ('random album', 'lookup', (), {'uri': 'emby:shuffle:album'}),
+        ('instant mix', 'lookup', (), {'uri': 'emby:mix:album:' + album}),
+        ('get_images', 'get_images', ([
+            'emby:track:' + track,
+            'emby:album:' + album,
+            'emby:artist:' + artist,
+        ],), {}),
+    ]
+
+
+def provider(server, workers=3):
+    config = {
+        'emby': {
+            'hostname': server.hostname,
+            'port': server.port,
+            'username': 'embyuser',
+            'password': 'embypassword',
+            'user_id': USER_ID,
+        },
+        'proxy': {},
+    }
+    remote = EmbyHandler(config)
+    federation = Federation([Source(None, remote)])
+    backend = SimpleNamespace(
+        remote=remote,
+        federation=federation,
+        snapshot=LibrarySnapshot(federation),
+        queues=QueueBuilder(federation),
+        workers=WorkerPool(workers),
+        stream_cache=None,
+    )
+
+    return EmbyLibraryProvider(backend=backend)
+
+
+def measure(server, func, *args, **kwargs):
+    server.reset()
+    tracemalloc.start()
+    start = time.time()
+
+    func(*args, **kwargs)
+
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'requests': server.request_count,
+        'wall_ms': round(elapsed * 1000, 1),
+        'peak_kb': peak // 1024,
+    }
+
+
+def run(size, latency):
+    library = Library(size)
+    server = FakeEmby(library, latency=latency).start()
+    library_provider = provider(server)
+
+    results = []
+    try:
+        for name, method, args, kwargs in operations(library):
+            result = measure(
+                server, getattr(library_provider, method), *args, **kwargs
+            )
+            result.update(operation=name, tracks=size)
+            results.append(result)
+    finally:
+        library_provider.backend.workers.stop()
+        library_provider.backend.remote.close()
+        server.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print('{:>8} {:<14} {:>9} {:>10} {:>10}'.format(
+        'tracks', 'operation', 'requests', 'wall ms', 'peak kb'))
+
+    for size in args.sizes:
+        for result in run(size, args.latency):
+            results.append(result)
+            print('{tracks:>8} {operation:<14} {requests:>9} '
+                  '{wall_ms:>10} {peak_kb:>10}'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
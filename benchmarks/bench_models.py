@@ -0,0 +1,107 @@
+"""Benchmark of track model construction with and without interning.
+
+Builds the track models of a synthetic library once the way
+``create_track`` did before artists and albums were shared, and once with
+the interning handler. Reports wall time, peak Python memory and how many
+distinct album and artist objects the tracks hold. Mopidy already folds
+equal models into one instance after building them, so the gain is mostly
+in construction time. Run it with::
+
+    python benchmarks/bench_models.py --tracks 20000
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import mock
+
+from mopidy import models
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_emby import Library  # noqa: E402
+
+from mopidy_emby.classes import ATrack  # noqa: E402
+from mopidy_emby.remote import EmbyHandler  # noqa: E402
+
+
+def handler():
+    config = {
+        'emby': {
+            'hostname': 'emby.local',
+            'port': 8096,
+            'username': 'embyuser',
+            'password': 'embypassword',
+            'user_id': '2ec276a2642e54a19b612b9418a8bd3b',
+        },
+        'proxy': {},
+    }
+
+    with mock.patch.object(EmbyHandler, '_get_token'):
+        return EmbyHandler(config)
+
+
+def legacy_create_track(emby, track):
+    def create_artists():
+        return [
+            models.Artist(name=artist['Name'])
+            for artist in track['ArtistItems']
+        ]
+
+    return ATrack(
+        uri='emby:track:{}'.format(track['Id']),
+        name=track.get('Name'),
+        track_no=track.get('IndexNumber'),
+        genre=track.get('Genre'),
+        artists=create_artists(),
+        album=models.Album(name=track.get('Album'), artists=create_artists()),
+        artwork=emby.artwork.template(track),
+        length=int(emby.ticks_to_milliseconds(track['RunTimeTicks']))
+    )
+
+
+def measure(create_track, emby, items):
+    start = time.time()
+    [create_track(emby, item) for item in items]
+    elapsed = time.time() - start
+
+    emby.interner.clear()
+    tracemalloc.start()
+    tracks = [create_track(emby, item) for item in items]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    albums = set(id(track.album) for track in tracks)
+    artists = set(
+        id(artist) for track in tracks
+        for artist in list(track.artists) + list(track.album.artists)
+    )
+
+    return elapsed * 1000, peak / 1024.0, len(albums), len(artists)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tracks', type=int, default=20000)
+    args = parser.parse_args()
+
+    library = Library(args.tracks)
+    emby = handler()
+
+    print('{:>10} {:>10} {:>10} {:>8} {:>8}'.format(
+        'models', 'wall ms', 'peak kb', 'albums', 'artists'))
+
+    for name, create_track in (
+            ('legacy', legacy_create_track),
+            ('interned', EmbyHandler.create_track)):
+        emby.interner.clear()
+        print('{:>10} {:>10.1f} {:>10.0f} {:>8} {:>8}'.format(
+            name, *measure(create_track, emby, library.tracks)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""A fake Emby server serving a synthetic music library.
+
+Only the endpoints used by Mopidy-Emby are implemented. Every request is
+counted and can be delayed to simulate a slow server or network.
+"""
+from __future__ import unicode_literals
+
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+USER_ID = 'fakeuser00000000000000000000000'
+MUSIC_ROOT = 'musicroot0000000000000000000000'
+TICKS_PER_SECOND = 10000000
+
+
+def item_id(kind, number):
+    return '{}{:0{}d}'.format(kind, number, 32 - len(kind))
+
+
+class Library(object):
+    """Synthetic library of ``tracks`` tracks.
+
+    Every artist has ``albums_per_artist`` albums with ``tracks_per_album``
+    tracks each.
+    """
+
+    genres = ['Rock', 'Pop', 'Jazz', 'Electronic', 'Folk', 'Hip-Hop']
+
+    def __init__(self, tracks, tracks_per_album=10, albums_per_artist=5):
+        self.artists = []
+        self.albums = []
+        self.tracks = []
+        self.items = {}
+        self.children = {}
+
+        album_count = max(tracks // tracks_per_album, 1)
+        for a in range(album_count):
+            artist_number = a // albums_per_artist
+            if artist_number == len(self.artists):
+                artist = {
+                    'Id': item_id('artist', artist_number),
+                    'Name': 'Artist {}'.format(artist_number),
+                    'Type': 'MusicArtist',
+                }
+                self.artists.append(artist)
+                self.items[artist['Id']] = artist
+
+            artist = self.artists[artist_number]
+            artist_ref = {'Id': artist['Id'], 'Name': artist['Name']}
+            album = {
+                'Id': item_id('album', a),
+                'Name': 'Album {}'.format(a),
+                'Type': 'MusicAlbum',
+                'ProductionYear': 1960 + a % 60,
+                'Genres': [self.genres[a % len(self.genres)]],
+                'AlbumArtists': [artist_ref],
+                'ArtistItems': [artist_ref],
+                'ImageTags': {'Primary': 'tag{}'.format(a)},
+                'DateCreated': '2017-01-01T00:00:00.0000000Z',
+            }
+            self.albums.append(album)
+            self.items[album['Id']] = album
+            self.children.setdefault(artist['Id'], []).append(album)
+
+            for t in range(tracks_per_album):
+                number = a * tracks_per_album + t
+                if number >= tracks:
+                    break
+
+                track = {
+                    'Id': item_id('track', number),
+                    'Name': 'Track {}'.format(number),
+                    'Type': 'Audio',
+                    'IndexNumber': t + 1,
+                    'ParentIndexNumber': 1,
+                    'Album': album['Name'],
+                    'AlbumId': album['Id'],
+                    'AlbumArtist': artist['Name'],
+                    'AlbumArtists': [artist_ref],
+                    'ArtistItems': [artist_ref],
+                    'Artists': [artist['Name']],
+                    'AlbumPrimaryImageTag': 'tag{}'.format(a),
+                    'ImageTags': {},
+                    'Genres': album['Genres'],
+                    'ProductionYear': album['ProductionYear'],
+                    'RunTimeTicks': (180 + t) * TICKS_PER_SECOND,
+                    'Etag': 'etag{}'.format(number),
+                    'UserData': {'PlayCount': number % 7},
+                }
+                self.tracks.append(track)
+                self.items[track['Id']] = track
+                self.children.setdefault(album['Id'], []).append(track)
+
+        self.children[MUSIC_ROOT] = self.artists
+
+
+class FakeEmby(object):
+    """Fake Emby server running in a background thread.
+
+    :param library: Library to serve
+    :param latency: Seconds to wait before answering a request
+    """
+
+    def __init__(self, library, latency=0.0):
+        self.library = library
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                fake.handle(self)
+
+            def do_POST(self):
+                fake.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+        self.routes = [
+            (r'^/Users/Public$', self.users_public),
+            (r'^/Users/[^/]+/Views$', self.views),
+            (r'^/Users/[^/]+/Items$', self.user_items),
+            (r'^/Users/[^/]+/Items/Latest$', self.latest),
+            (r'^/Users/[^/]+/Items/(?P<item_id>[^/]+)$', self.user_item),
+            (r'^/Search/Hints$', self.search_hints),
+            (r'^/Items/(?P<item_id>[^/]+)/InstantMix$', self.instant_mix),
+        ]
+
+    @property
+    def hostname(self):
+        return 'http://127.0.0.1'
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+    @property
+    def request_count(self):
+        return len(self.requests)
+
+    def handle(self, request):
+        url = urlsplit(request.path)
+        query = dict(
+            (key, values[0]) for key, values in parse_qs(url.query).items()
+        )
+
+        with self._lock:
+            self.requests.append(request.path)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        for pattern, route in self.routes:
+            match = re.match(pattern, url.path)
+            if match:
+                status, data = route(query, **match.groupdict())
+                break
+        else:
+            status, data = 404, {'Error': 'Unknown endpoint'}
+
+        body = json.dumps(data).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    @staticmethod
+    def sort(items, query):
+        def key(item):
+            return tuple(
+                item.get('Name', '').lower() if field == 'SortName'
+                else (item.get('UserData') or {}).get(field, 0)
+                if field == 'PlayCount'
+                else item.get(field) or 0
+                for field in query['SortBy'].split(',')
+            )
+
+        if not query.get('SortBy'):
+            return items
+
+        if query['SortBy'] == 'Random':
+            return random.sample(items, len(items))
+
+        return sorted(items, key=key,
+                      reverse=query.get('SortOrder') == 'Descending')
+
+    @staticmethod
+    def shape(item, query):
+        """Drops and adds fields like Emby does for a query."""
+        fields = query.get('Fields', '').split(',')
+        item = dict(item)
+
+        if query.get('EnableUserData') == 'false':
+            item.pop('UserData', None)
+        if 'SortName' in fields:
+            item['SortName'] = item['Name'].lower()
+
+        return item
+
+    def page(self, items, query):
+        start = int(query.get('StartIndex', 0))
+        limit = query.get('Limit')
+        end = start + int(limit) if limit else None
+        items = self.sort(items, query)
+
+        return {
+            'Items': [self.shape(i, query) for i in items[start:end]],
+            'TotalRecordCount': len(items),
+            'StartIndex': start,
+        }
+
+    def users_public(self, query):
+        return 200, [{'Name': 'embyuser', 'Id': USER_ID}]
+
+    def views(self, query):
+        return 200, {
+            'Items': [
+                {'Id': 'movies', 'Name': 'Movies',
+                 'CollectionType': 'movies'},
+                {'Id': MUSIC_ROOT, 'Name': 'Music',
+                 'CollectionType': 'music'},
+            ],
+            'TotalRecordCount': 2,
+        }
+
+    def user_items(self, query):
+        library = self.library
+        types = query.get('IncludeItemTypes', '').split(',')
+
+        if query.get('Ids'):
+            items = [
+                library.items[i] for i in query['Ids'].split(',')
+                if i in library.items
+            ]
+        elif query.get('Recursive') == 'true':
+            items = []
+            if 'MusicAlbum' in types:
+                items.extend(library.albums)
+            if 'Audio' in types:
+                items.extend(library.tracks)
+            if 'MusicArtist' in types:
+                items.extend(library.artists)
+        else:
+            items = library.children.get(query.get('ParentId'), [])
+
+        return 200, self.page(items, query)
+
+    def latest(self, query):
+        limit = int(query.get('Limit', 20))
+
+        return 200, [
+            self.shape(album, query) for album in self.library.albums[-limit:]
+        ]
+
+    def user_item(self, query, item_id):
+        if item_id not in self.library.items:
+            return 404, {'Error': 'Not found'}
+
+        return 200, self.library.items[item_id]
+
+    def instant_mix(self, query, item_id):
+        item = self.library.items.get(item_id)
+        if item is None:
+            return 404, {'Error': 'Not found'}
+
+        # tracks of the same genre
+        genres = set(item.get('Genres') or [])
+        tracks = [
+            track for track in self.library.tracks
+            if genres & set(track['Genres'])
+        ]
+
+        return 200, self.page(random.sample(tracks, len(tracks)), query)
+
+    def search_hints(self, query):
+        term = query.get('SearchTerm', '').lower()
+        types = query.get('IncludeItemTypes', '').split(',')
+        limit = int(query.get('Limit', 20))
+
+        hints = []
+        for items in (self.library.artists, self.library.albums,
+                      self.library.tracks):
+            for item in items:
+                if len(hints) >= limit:
+                    break
+                if item['Type'] in types and term in item['Name'].lower():
+                    hints.append({
+                        'Id': item['Id'],
+                        'Name': item['Name'],
+                        'Type': item['Type'],
+                    })
+
+        return 200, {'SearchHints': hints, 'TotalRecordCount': len(hints)}
@@ -28,9 +28,32 @@ class Extension(ext.Extension):
         schema['password'] = config.Secret()
         schema['hostname'] = config.String()
         schema['port'] = config.Port()
+        schema['servers'] = config.List(optional=True)
+        schema['libraries'] = config.List(optional=True)
+        schema['max_connections'] = config.Integer(minimum=1, optional=True)
+        schema['max_connections_per_endpoint'] = config.Integer(
+            minimum=1, optional=True)
+        schema['requests_per_second'] = config.Integer(
+            minimum=1, optional=True)
+        schema['workers'] = config.Integer(minimum=2, optional=True)
+        schema['profile_sample_rate'] = config.Float(
+            minimum=0.0, maximum=1.0, optional=True)
+        schema['profile_slowest'] = config.Integer(minimum=1, optional=True)
+        schema['library_events'] = config.Boolean(optional=True)
+        schema['playback_reporting'] = config.Boolean(optional=True)
+        schema['image_sizes'] = config.List(optional=True)
+        schema['stream_cache'] = config.Boolean(optional=True)
+        schema['library_snapshot'] = config.Boolean(optional=True)
+        schema['mix_size'] = config.Integer(minimum=1, optional=True)
+        schema['memory_budget'] = config.Integer(minimum=32, optional=True)
+        schema['stream_cache_size'] = config.Integer(minimum=1, optional=True)
 
         return schema
 
     def setup(self, registry):
         from .backend import EmbyBackend
+        from .frontend import EmbyFrontend
+        from .web import factory
         registry.add('backend', EmbyBackend)
+        registry.add('frontend', EmbyFrontend)
+        registry.add('http:app', {'name': self.ext_name, 'factory': factory})
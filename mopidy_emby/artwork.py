@@ -0,0 +1,156 @@
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from collections import OrderedDict
+
+from mopidy import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class ArtworkResolver(object):
+    """Builds artwork urls for Emby items.
+
+    ``template`` returns the ``artwork`` string stored on the models, with
+    ``%1`` and ``%2`` as height and width placeholders for clients. ``url``
+    and ``images`` return ready to use urls. Their templates are compiled
+    once per size and resolved urls are cached by item, tag and size.
+
+    With ``max_entries`` set, each of the template and url caches keeps
+    only that many of the most recently resolved entries.
+    """
+
+    # oldest entries get dropped above this number, None keeps them all
+    max_entries = None
+
+    def __init__(self, hostname, port, base_url, sizes=(400,)):
+        self.sizes = tuple(sizes)
+
+        self._template = (
+            '{}:{}/emby/Items/{{}}/Images/{{}}'
+            '?maxHeight=%1&maxWidth=%2&tag={{}}'
+        ).format(hostname, port)
+
+        self._base_url = base_url
+        self._sized = {}
+        for size in self.sizes:
+            self._compile(size)
+
+        self._templates = OrderedDict()
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compile(self, size):
+        """Returns the url template for a size.
+        """
+        sized = self._sized[size] = (
+            '{}/emby/Items/{{}}/Images/{{}}'
+            '?maxHeight={}&maxWidth={}&tag={{}}'
+        ).format(self._base_url, size, size)
+
+        return sized
+
+    def _remember(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            if self.max_entries:
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """Drops the cached templates and urls.
+        """
+        with self._lock:
+            self._templates.clear()
+            self._urls.clear()
+
+    @staticmethod
+    def source(item):
+        """Picks the image to show for an Emby item.
+
+        Prefers the items own primary image, then the primary image of its
+        album and then the backdrop of its parent.
+
+        :param item: Item from Emby API
+        :type item: dict
+        :returns: Tuple of item ID, image type and tag or None
+        :rtype: tuple
+        """
+        image_tags = item.get('ImageTags') or {}
+        if 'Primary' in image_tags:
+            return item['Id'], 'Primary', image_tags['Primary']
+
+        if item.get('AlbumPrimaryImageTag') and item.get('AlbumId'):
+            return item['AlbumId'], 'Primary', item['AlbumPrimaryImageTag']
+
+        if item.get('ParentBackdropImageTags'):
+            return (
+                item['ParentBackdropItemId'],
+                'Backdrop',
+                item['ParentBackdropImageTags'][0]
+            )
+
+        return None
+
+    def template(self, item):
+        """Returns the artwork template of an item or an empty string.
+
+        :param item: Item from Emby API
+        :type item: dict
+        :returns: Artwork template
+        :rtype: str
+        """
+        source = self.source(item)
+        if source is None:
+            return ''
+
+        try:
+            return self._templates[source]
+        except KeyError:
+            return self._remember(
+                self._templates, source, self._template.format(*source))
+
+    def url(self, item, size):
+        """Returns the artwork url of an item in a given size or None.
+
+        :param item: Item from Emby API
+        :param size: Maximum height and width
+        :type item: dict
+        :type size: int
+        :returns: Url
+        :rtype: str
+        """
+        source = self.source(item)
+        if source is None:
+            return None
+
+        key = source + (size,)
+        try:
+            return self._urls[key]
+        except KeyError:
+            pass
+
+        sized = self._sized.get(size) or self._compile(size)
+
+        return self._remember(self._urls, key, sized.format(*source))
+
+    def images(self, item):
+        """Returns the artwork of an item in all configured sizes.
+
+        :param item: Item from Emby API
+        :type item: dict
+        :returns: Images, largest first
+        :rtype: list of mopidy.models.Image
+        """
+        if self.source(item) is None:
+            return []
+
+        return [
+            models.Image(uri=self.url(item, size), width=size, height=size)
+            for size in sorted(self.sizes, reverse=True)
+        ]
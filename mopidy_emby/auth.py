@@ -0,0 +1,70 @@
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialStore(object):
+    """Keeps Emby access tokens on disk between runs.
+
+    Credentials are stored per server and user in a JSON file only
+    readable by the owner.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(base_url, username):
+        return '{}|{}'.format(base_url, username)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, self.path)
+
+    def load(self, key):
+        """Returns the stored credentials or None.
+
+        :param key: Key from :meth:`key`
+        :type key: str
+        :returns: Dict with ``user_id`` and ``token``
+        :rtype: dict
+        """
+        with self._lock:
+            credentials = self._read().get(key)
+
+        if credentials and credentials.get('token') \
+                and credentials.get('user_id'):
+            return credentials
+
+    def save(self, key, user_id, token):
+        with self._lock:
+            data = self._read()
+            data[key] = {'user_id': user_id, 'token': token}
+            self._write(data)
+
+    def forget(self, key):
+        with self._lock:
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
@@ -1,19 +1,98 @@
 from __future__ import unicode_literals
 
+import functools
 import logging
+import os
+import queue
+
+from concurrent.futures import ThreadPoolExecutor
 
 from mopidy import backend
 
 import pykka
 
+from pykka.messages import ProxyCall
+
+import mopidy_emby
+
+from mopidy_emby.events import EmbyEventListener
+from mopidy_emby.federation import Federation, Source, server_configs
 from mopidy_emby.library import EmbyLibraryProvider
+from mopidy_emby.memory import MemoryGuard
+from mopidy_emby.mixes import QueueBuilder
 from mopidy_emby.playback import EmbyPlaybackProvider
+from mopidy_emby.playlists import EmbyPlaylistsProvider
+from mopidy_emby.profiling import profiler
 from mopidy_emby.remote import EmbyHandler
+from mopidy_emby.reporting import PlaybackReporter
+from mopidy_emby.snapshot import LibrarySnapshot, dump_path
+from mopidy_emby.streamcache import StreamCache, cache_path, local_url
+from mopidy_emby.utils import cache
+from mopidy_emby.workers import BACKGROUND, WorkerPool
 
 
 logger = logging.getLogger(__name__)
 
 
+class ProviderInbox(queue.Queue):
+    """Actor inbox answering provider calls outside of the actor thread.
+
+    The actor handles one message at a time, so a slow browse would hold
+    up everything queued behind it, down to the ``translate_uri`` of the
+    next track. Calls to the library and playlists providers run on a
+    pool of ``callers`` threads instead, calls to the playback provider
+    on a thread of their own, in the order they were sent. All other
+    messages go to the actor as usual.
+
+    :param backend: Backend owning the inbox
+    :type backend: :class:`EmbyBackend`
+    :param callers: Library and playlists calls running at once
+    :type callers: int
+    """
+
+    def __init__(self, backend, callers=8):
+        super(ProviderInbox, self).__init__()
+        self.backend = backend
+        self.lanes = {
+            'library': ThreadPoolExecutor(callers, 'EmbyLibraryCall'),
+            'playlists': ThreadPoolExecutor(callers, 'EmbyPlaylistsCall'),
+            'playback': ThreadPoolExecutor(1, 'EmbyPlaybackCall'),
+        }
+
+    def put(self, envelope, block=True, timeout=None):
+        message = getattr(envelope, 'message', None)
+        path = getattr(message, 'attr_path', None)
+
+        if (isinstance(message, ProxyCall) and
+                len(path) == 2 and path[0] in self.lanes):
+            self.lanes[path[0]].submit(self._call, envelope)
+        else:
+            super(ProviderInbox, self).put(envelope, block, timeout)
+
+    def _call(self, envelope):
+        message = envelope.message
+
+        try:
+            func = functools.reduce(getattr, message.attr_path, self.backend)
+            result = func(*message.args, **message.kwargs)
+
+        except Exception:
+            if envelope.reply_to is None:
+                logger.exception(
+                    'Emby {} failed'.format('.'.join(message.attr_path))
+                )
+            else:
+                envelope.reply_to.set_exception()
+
+        else:
+            if envelope.reply_to is not None:
+                envelope.reply_to.set(result)
+
+    def stop(self):
+        for lane in self.lanes.values():
+            lane.shutdown(wait=False)
+
+
 class EmbyBackend(pykka.ThreadingActor, backend.Backend):
     uri_schemes = ['emby']
 
@@ -22,5 +101,98 @@ class EmbyBackend(pykka.ThreadingActor, backend.Backend):
 
         self.library = EmbyLibraryProvider(backend=self)
         self.playback = EmbyPlaybackProvider(audio=audio, backend=self)
-        self.playlist = None
-        self.remote = EmbyHandler(config)
+        self.playlists = EmbyPlaylistsProvider(backend=self)
+        self.federation = Federation([
+            Source(name, EmbyHandler(server_config))
+            for name, server_config in server_configs(config)
+        ])
+        self.remote = self.federation.primary.remote
+        self.workers = WorkerPool(config['emby'].get('workers') or 3)
+        self.stream_cache = None
+        self.events = []
+        self.reporter = None
+        self.memory = None
+        self.snapshot = LibrarySnapshot(self.federation, dump_path(config))
+        self.queues = QueueBuilder(self.federation,
+                                   config['emby'].get('mix_size') or 100)
+
+        if config['emby'].get('library_events'):
+            self.events = [
+                EmbyEventListener(source.remote, self._library_changed)
+                for source in self.federation.sources.values()
+            ]
+
+        if config['emby'].get('playback_reporting'):
+            self.reporter = PlaybackReporter(
+                self.remote,
+                os.path.join(
+                    str(mopidy_emby.Extension.get_data_dir(config)),
+                    'playback_reports.json'
+                )
+            )
+
+        if config['emby'].get('memory_budget'):
+            self.memory = MemoryGuard(
+                [source.remote for source in self.federation.sources.values()],
+                config['emby']['memory_budget']
+            )
+
+        profiler.configure(
+            config['emby'].get('profile_sample_rate') or 0.0,
+            config['emby'].get('profile_slowest') or 20
+        )
+
+        if config['emby'].get('stream_cache'):
+            self.stream_cache = StreamCache(
+                cache_path(config),
+                config['emby']['stream_cache_size'] * 1024 * 1024,
+                self.remote,
+                local_url(config)
+            )
+
+    def on_start(self):
+        # expired cache entries are refetched as background work
+        cache.executor = functools.partial(self.workers.submit, BACKGROUND)
+
+        # warm up the album list without holding up interactive calls
+        for source in self.federation.sources.values():
+            self.workers.submit(BACKGROUND, source.remote.refresh)
+
+        if self.snapshot.path:
+            self.workers.submit(BACKGROUND, self.snapshot.write)
+
+        for events in self.events:
+            events.start()
+
+        if self.reporter:
+            self.reporter.start()
+
+        if self.memory:
+            self.memory.start()
+
+    def on_stop(self):
+        for events in self.events:
+            events.stop()
+
+        self.snapshot.cancel()
+
+        if self.reporter:
+            self.reporter.stop()
+
+        if self.memory:
+            self.memory.stop()
+
+        cache.executor = None
+        self.actor_inbox.stop()
+        self.workers.stop()
+        self.federation.close()
+
+    def _library_changed(self):
+        self.snapshot.changed(
+            functools.partial(self.workers.submit, BACKGROUND)
+        )
+
+    # a static hook of pykka 4, the providers are only looked up when
+    # the first call comes in
+    def _create_actor_inbox(self):
+        return ProviderInbox(self)
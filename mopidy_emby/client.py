@@ -0,0 +1,158 @@
+from __future__ import unicode_literals
+
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mopidy_emby import workers
+from mopidy_emby.metrics import endpoint as metrics_endpoint
+from mopidy_emby.scheduler import LANES, RequestScheduler
+
+
+logger = logging.getLogger(__name__)
+
+
+class Retry(Exception):
+    """Raised by a request to be tried again after a pause.
+
+    :param delay: Seconds to wait before the next try
+    :type delay: float
+    """
+
+    def __init__(self, delay):
+        super(Retry, self).__init__(delay)
+        self.delay = delay
+
+
+class AsyncClient(object):
+    """Runs Emby API requests on an asyncio event loop in its own thread.
+
+    ``request`` is a blocking callable taking a url and the number of
+    earlier tries of it. The loop hands it to a pool of ``max_connections``
+    threads, a :class:`mopidy_emby.scheduler.RequestScheduler` decides
+    which waiting request runs next. A request raising :class:`Retry`
+    gives up its slot for the pause and queues up again afterwards.
+    Callers get a :class:`concurrent.futures.Future` and only block on
+    that. ``submit`` blocks while ``max_pending`` requests of the same
+    priority are waiting, so producers cant flood the loop.
+    """
+
+    def __init__(self, request, max_connections=4, max_pending=64,
+                 scheduler=None):
+        self.request = request
+        self.max_connections = max_connections
+        self.scheduler = scheduler or RequestScheduler(max_connections)
+
+        self.loop = None
+        self._executor = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = {
+            priority: threading.BoundedSemaphore(max_pending)
+            for priority in LANES
+        }
+
+    def start(self):
+        """Starts the event loop thread if it isnt running yet.
+
+        :returns: The event loop
+        :rtype: asyncio.AbstractEventLoop
+        """
+        with self._lock:
+            if self._thread is not None:
+                return self.loop
+
+            self.loop = asyncio.new_event_loop()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_connections,
+                thread_name_prefix='EmbyRequest'
+            )
+
+            started = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(started,),
+                name='EmbyAsyncClient'
+            )
+            self._thread.daemon = True
+            self._thread.start()
+            started.wait()
+
+            return self.loop
+
+    def _run(self, started):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(started.set)
+        self.loop.run_forever()
+
+    async def _request(self, url, priority):
+        endpoint = metrics_endpoint(url)
+        attempt = 0
+
+        while True:
+            await self.scheduler.acquire(endpoint, priority)
+            try:
+                return await self.loop.run_in_executor(
+                    self._executor, self.request, url, attempt
+                )
+            except Retry as retry:
+                delay = retry.delay
+            finally:
+                self.scheduler.release(endpoint, priority)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def submit(self, url, priority=None):
+        """Schedules a request.
+
+        :param url: Url
+        :type url: str
+        :param priority: Priority of the request, defaults to the one of
+            the running worker job
+        :type priority: int
+        :returns: Future of the response data
+        :rtype: concurrent.futures.Future
+        """
+        if priority is None:
+            priority = workers.current_priority()
+
+        self.start()
+        pending = self._pending[priority]
+        pending.acquire()
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._request(url, priority), self.loop
+        )
+        future.add_done_callback(lambda f: pending.release())
+
+        return future
+
+    def map(self, urls, priority=None):
+        """Requests several urls concurrently.
+
+        :param urls: Urls
+        :type urls: list
+        :param priority: Priority of the requests
+        :type priority: int
+        :returns: Response data in the order of ``urls``
+        :rtype: list
+        """
+        futures = [self.submit(url, priority) for url in urls]
+
+        return [future.result() for future in futures]
+
+    def stop(self):
+        """Stops the event loop and its threads.
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._executor.shutdown(wait=False)
+            self.loop.close()
+            self._thread = None
@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from collections import OrderedDict, namedtuple
+
+
+logger = logging.getLogger(__name__)
+
+
+Validated = namedtuple(
+    'Validated', ['etag', 'last_modified', 'data', 'size']
+)
+
+
+class NotModified(object):
+    """Stands in for a ``304`` response with the data of the earlier one.
+    """
+
+    status_code = 304
+    content = b''
+
+    def __init__(self, data):
+        self.data = data
+
+
+class ConditionalCache(object):
+    """Remembers validators and decoded data of responses per url.
+
+    Requests for an url seen before carry ``If-None-Match`` and
+    ``If-Modified-Since``. If the server answers ``304``, the data decoded
+    from the earlier response is used again, without downloading or
+    decoding anything. Only the ``size`` most recently used urls are kept,
+    with bodies of up to ``max_bytes`` together.
+
+    ``max_bytes`` bounds the size of the raw bodies as sent by the server,
+    not the memory taken by the kept data. Decoded JSON takes several times
+    as much, so both limits are kept small.
+
+    :param size: Number of urls to keep
+    :type size: int
+    :param max_bytes: Size of the raw response bodies
+    :type max_bytes: int
+    """
+
+    def __init__(self, size=64, max_bytes=2 * 1024 * 1024):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        """Returns the entry of an url.
+
+        :returns: Entry or None
+        :rtype: :class:`Validated`
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+
+            return entry
+
+    @staticmethod
+    def headers(entry):
+        """Returns the headers for a conditional request.
+
+        :param entry: Entry of the url or None
+        :type entry: :class:`Validated`
+        :rtype: dict
+        """
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    def store(self, url, r, data):
+        """Keeps the validators of a response together with its data.
+
+        Responses without validators drop what was kept for the url.
+
+        :param url: Requested url
+        :type url: str
+        :param r: Response
+        :type r: requests.Response
+        :param data: Decoded body
+        """
+        if r.status_code != 200:
+            return
+
+        etag = r.headers.get('ETag')
+        last_modified = r.headers.get('Last-Modified')
+        size = len(r.content)
+
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.bytes -= old.size
+
+            if (not etag and not last_modified) or size > self.max_bytes:
+                return
+
+            self._entries[url] = Validated(etag, last_modified, data, size)
+            self.bytes += size
+            while (len(self._entries) > self.size or
+                   self.bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
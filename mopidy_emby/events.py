@@ -0,0 +1,154 @@
+from __future__ import unicode_literals
+
+import asyncio
+import json
+import logging
+
+from tornado.websocket import websocket_connect
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmbyEventListener(object):
+    """Listens to library change events on the Emby websocket.
+
+    Runs on the event loop of the handlers :class:`AsyncClient`. Changed
+    items are handed to the handler, which drops or patches exactly the
+    affected cache entries. Messages are handled in the loops executor,
+    so the handler is free to make requests.
+
+    :param remote: Handler of the server
+    :type remote: :class:`mopidy_emby.remote.EmbyHandler`
+    :param on_change: Called after the library changed
+    :type on_change: callable
+    """
+
+    reconnect_delays = (1, 2, 5, 10, 30, 60)
+
+    def __init__(self, remote, on_change=None):
+        self.remote = remote
+        self.on_change = on_change
+        self.connection = None
+        self._stopped = False
+        self._future = None
+        self._keepalive = None
+
+    @property
+    def url(self):
+        base_url = self.remote.base_url
+        if base_url.startswith('https://'):
+            base_url = 'wss://' + base_url[len('https://'):]
+        else:
+            base_url = 'ws://' + base_url[len('http://'):]
+
+        return '{}/embywebsocket?api_key={}&deviceId=mopidy'.format(
+            base_url, self.remote.token
+        )
+
+    def start(self):
+        loop = self.remote.client.start()
+        self._future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    def stop(self):
+        self._stopped = True
+
+        if self._future is not None:
+            self._future.cancel()
+
+    async def run(self):
+        attempt = 0
+        loop = asyncio.get_event_loop()
+
+        while not self._stopped:
+            try:
+                self.connection = await websocket_connect(self.url)
+
+            except Exception as e:
+                delay = self.reconnect_delays[
+                    min(attempt, len(self.reconnect_delays) - 1)
+                ]
+                logger.info(
+                    'Emby websocket cant connect, retrying in {}s: {}'.format(
+                        delay, e
+                    )
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            logger.debug('Emby websocket connected')
+            attempt = 0
+            await loop.run_in_executor(None, self.remote.events_connected)
+
+            try:
+                while True:
+                    message = await self.connection.read_message()
+                    if message is None:
+                        break
+
+                    await loop.run_in_executor(None, self.handle, message)
+
+            finally:
+                if self._keepalive is not None:
+                    self._keepalive.cancel()
+                    self._keepalive = None
+
+                self.connection.close()
+                self.connection = None
+                logger.debug('Emby websocket disconnected')
+                await loop.run_in_executor(
+                    None, self.remote.events_disconnected
+                )
+
+    async def _send_keepalive(self, interval):
+        while self.connection is not None:
+            await asyncio.sleep(interval)
+            if self.connection is not None:
+                self.connection.write_message(
+                    json.dumps({'MessageType': 'KeepAlive'})
+                )
+
+    def handle(self, message):
+        """Dispatches a websocket message.
+
+        :param message: Raw message
+        :type message: str
+        """
+        try:
+            data = json.loads(message)
+        except ValueError:
+            logger.debug('Emby websocket sent garbage: {}'.format(message))
+            return
+
+        message_type = data.get('MessageType')
+        payload = data.get('Data') or {}
+        metrics.inc('emby_websocket_messages_total', type=message_type)
+
+        if message_type == 'LibraryChanged':
+            self.remote.apply_library_changes(
+                added=payload.get('ItemsAdded') or [],
+                updated=payload.get('ItemsUpdated') or [],
+                removed=payload.get('ItemsRemoved') or []
+            )
+            if self.on_change is not None:
+                self.on_change()
+
+        elif message_type == 'UserDataChanged':
+            self.remote.invalidate_items(
+                [i['ItemId'] for i in payload.get('UserDataList') or []]
+            )
+
+        elif message_type == 'ForceKeepAlive':
+            loop = self.remote.client.loop
+            # seconds the server waits for a keep alive, sometimes missing
+            timeout = data.get('Data') or 60
+            loop.call_soon_threadsafe(self._start_keepalive, timeout / 2.0)
+
+    def _start_keepalive(self, interval):
+        if self._keepalive is None and self.connection is not None:
+            self._keepalive = asyncio.ensure_future(
+                self._send_keepalive(interval)
+            )
@@ -0,0 +1,176 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import sqlite3
+import threading
+
+from collections import defaultdict
+
+
+GENRE = 'genre'
+YEAR = 'year'
+DECADE = 'decade'
+
+
+class FacetIndex(object):
+    """Inverted indexes from genres, years and decades to albums.
+
+    Built from the cached album list in one pass. Albums keep the order of
+    the list, so every entry comes sorted by name.
+
+    :param albums: Albums from Emby API
+    :type albums: list of dict
+    """
+
+    def __init__(self, albums):
+        self._albums = {
+            GENRE: defaultdict(list),
+            YEAR: defaultdict(list),
+            DECADE: defaultdict(list),
+        }
+        self._years = defaultdict(set)
+
+        for album in albums:
+            for genre in album.get('Genres') or []:
+                self._albums[GENRE][genre].append(album)
+
+            year = album.get('ProductionYear')
+            if year:
+                decade = '{:04d}'.format(year // 10 * 10)
+                year = '{:04d}'.format(year)
+                self._albums[YEAR][year].append(album)
+                self._albums[DECADE][decade].append(album)
+                self._years[decade].add(year)
+
+    def counts(self, facet, decade=None):
+        """Returns the number of albums per value of a facet.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param decade: Only count the years of this decade
+        :type decade: str
+        :returns: Album count per value
+        :rtype: dict
+        """
+        albums = self._albums[facet]
+        values = self._years.get(decade, ()) if decade else albums
+
+        return {value: len(albums[value]) for value in values}
+
+    def albums(self, facet, value):
+        """Returns the albums with a value of a facet.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param value: Genre name, year or decade like ``1990``
+        :type value: str
+        :returns: Albums from Emby API
+        :rtype: list of dict
+        """
+        return self._albums[facet].get(value, [])
+
+
+class DiskFacetIndex(object):
+    """:class:`FacetIndex` kept in an SQLite file.
+
+    The albums are stored as compact JSON next to their genres, years and
+    decades, so the index takes no memory apart from the connection. Only
+    the albums of the entry that is asked for get decoded. A new index
+    replaces the file once it is complete.
+
+    :param albums: Albums from Emby API
+    :type albums: list of dict
+    :param path: Database file
+    :type path: str
+    """
+
+    def __init__(self, albums, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        db = sqlite3.connect(tmp_path)
+        try:
+            self._build(db, albums)
+        finally:
+            db.close()
+
+        os.replace(tmp_path, path)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+
+    @staticmethod
+    def _build(db, albums):
+        db.execute(
+            'CREATE TABLE albums (position INTEGER PRIMARY KEY, data TEXT)'
+        )
+        db.execute('CREATE TABLE facets (facet TEXT, value TEXT, '
+                   'position INTEGER)')
+
+        db.executemany('INSERT INTO albums VALUES (?, ?)', (
+            (position, json.dumps(album, separators=(',', ':')))
+            for position, album in enumerate(albums)
+        ))
+
+        def rows():
+            for position, album in enumerate(albums):
+                for genre in album.get('Genres') or []:
+                    yield GENRE, genre, position
+
+                year = album.get('ProductionYear')
+                if year:
+                    yield YEAR, '{:04d}'.format(year), position
+                    yield DECADE, '{:04d}'.format(year // 10 * 10), position
+
+        db.executemany('INSERT INTO facets VALUES (?, ?, ?)', rows())
+        db.execute('CREATE INDEX facets_value ON facets (facet, value)')
+        db.commit()
+
+    def counts(self, facet, decade=None):
+        """Returns the number of albums per value of a facet.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param decade: Only count the years of this decade
+        :type decade: str
+        :returns: Album count per value
+        :rtype: dict
+        """
+        sql = 'SELECT value, COUNT(*) FROM facets WHERE facet = ?'
+        args = [facet]
+        if decade:
+            # like the uris of decades, anything else has no years
+            if not decade.isdigit() or int(decade) % 10:
+                return {}
+
+            sql += ' AND value BETWEEN ? AND ?'
+            args += [decade, '{:04d}'.format(int(decade) + 9)]
+
+        with self._lock:
+            return dict(self._db.execute(sql + ' GROUP BY value', args))
+
+    def albums(self, facet, value):
+        """Returns the albums with a value of a facet.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param value: Genre name, year or decade like ``1990``
+        :type value: str
+        :returns: Albums from Emby API
+        :rtype: list of dict
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT data FROM facets JOIN albums USING (position) '
+                'WHERE facet = ? AND value = ? ORDER BY position',
+                (facet, value)
+            ).fetchall()
+
+        return [json.loads(data) for data, in rows]
@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+import logging
+
+from mopidy import core
+
+import pykka
+
+from mopidy_emby.backend import EmbyBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmbyFrontend(pykka.ThreadingActor, core.CoreListener):
+    """Feeds Mopidy core events back into the Emby backend.
+    """
+
+    def __init__(self, config, core):
+        super(EmbyFrontend, self).__init__()
+
+        self.core = core
+        self.stream_cache = config['emby'].get('stream_cache')
+        self.playback_reporting = config['emby'].get('playback_reporting')
+        self._reporter = None
+
+    def _get_backend(self):
+        """Returns a proxy of the running Emby backend or None.
+        """
+        refs = pykka.ActorRegistry.get_by_class(EmbyBackend)
+
+        if refs:
+            return refs[0].proxy()
+
+    def _get_reporter(self):
+        """Returns the backends playback reporter or None.
+
+        The reporter itself is thread safe, calling it directly keeps
+        reports from waiting in the backends mailbox.
+        """
+        if not self.playback_reporting:
+            return None
+
+        if self._reporter is None:
+            backend = self._get_backend()
+            if backend is not None:
+                self._reporter = backend.reporter.get()
+
+        return self._reporter
+
+    def _report(self, event, tl_track, *args):
+        # only tracks of the first server are reported
+        parts = tl_track.track.uri.split(':')
+        if parts[:2] != ['emby', 'track'] or len(parts) != 3:
+            return
+
+        reporter = self._get_reporter()
+        if reporter is not None:
+            getattr(reporter, event)(tl_track.track.uri.split(':')[-1], *args)
+
+    def tracklist_changed(self):
+        if not self.stream_cache:
+            return
+
+        backend = self._get_backend()
+        if backend is None:
+            return
+
+        uris = [track.uri for track in self.core.tracklist.get_tracks().get()]
+        logger.debug('Emby pinning {} queued tracks'.format(len(uris)))
+
+        backend.playback.pin_tracks(uris)
+
+    def track_playback_started(self, tl_track):
+        self._report('started', tl_track)
+
+    def track_playback_paused(self, tl_track, time_position):
+        self._report('paused', tl_track, time_position)
+
+    def track_playback_resumed(self, tl_track, time_position):
+        self._report('resumed', tl_track, time_position)
+
+    def track_playback_ended(self, tl_track, time_position):
+        self._report('stopped', tl_track, time_position)
+
+    def seeked(self, time_position):
+        reporter = self._get_reporter()
+        if reporter is not None:
+            reporter.seeked(time_position)
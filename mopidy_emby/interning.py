@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+
+import logging
+
+from mopidy import models
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelInterner(object):
+    """Hands out one shared artist and album model per Emby item.
+
+    Tracks of the same album share their ``Album`` and ``Artist`` instances
+    instead of building, validating and hashing new ones for every track.
+    Entries are never evicted on their own, the handler clears them together
+    with its caches. Artists and albums are few compared to tracks.
+    """
+
+    def __init__(self):
+        self._artists = {}
+        self._albums = {}
+
+    def __len__(self):
+        return len(self._artists) + len(self._albums)
+
+    @staticmethod
+    def uri(kind, item_id):
+        if item_id:
+            return 'emby:{}:{}'.format(kind, item_id)
+
+    def artist(self, artist_id, name, musicbrainz_id=None):
+        """Returns the shared artist model.
+
+        :param artist_id: Emby artist ID
+        :type artist_id: str
+        :param name: Artist name
+        :type name: str
+        :param musicbrainz_id: MusicBrainz artist ID
+        :type musicbrainz_id: str
+        :returns: Artist
+        :rtype: mopidy.models.Artist
+        """
+        key = (artist_id, name, musicbrainz_id)
+        artist = self._artists.get(key)
+
+        if artist is None:
+            metrics.inc('emby_models_interned_total', model='artist')
+            artist = self._artists.setdefault(key, models.Artist(
+                uri=self.uri('artist', artist_id),
+                name=name,
+                musicbrainz_id=musicbrainz_id
+            ))
+
+        return artist
+
+    def album(self, album_id, name, artists, date=None, musicbrainz_id=None):
+        """Returns the shared album model.
+
+        :param album_id: Emby album ID
+        :type album_id: str
+        :param name: Album name
+        :type name: str
+        :param artists: Shared artist models from :meth:`artist`
+        :type artists: list
+        :param date: Release date or year
+        :type date: str
+        :param musicbrainz_id: MusicBrainz album ID
+        :type musicbrainz_id: str
+        :returns: Album
+        :rtype: mopidy.models.Album
+        """
+        key = (album_id, name, tuple(id(artist) for artist in artists),
+               date, musicbrainz_id)
+        album = self._albums.get(key)
+
+        if album is None:
+            metrics.inc('emby_models_interned_total', model='album')
+            album = self._albums.setdefault(key, models.Album(
+                uri=self.uri('album', album_id),
+                name=name,
+                artists=artists,
+                date=date,
+                musicbrainz_id=musicbrainz_id
+            ))
+
+        return album
+
+    def clear(self):
+        self._artists.clear()
+        self._albums.clear()
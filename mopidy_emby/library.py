@@ -2,7 +2,16 @@ from __future__ import unicode_literals
 
 import logging
 
+from concurrent.futures import TimeoutError
+
+from urllib.parse import quote, unquote
+
 from mopidy import backend, models
+
+from mopidy_emby import facets, mixes, snapshot, workers
+from mopidy_emby.profiling import profiler
+from mopidy_emby.uris import UriRouter
+
 from .classes import ARef, ATrack
 
 logger = logging.getLogger(__name__)
@@ -13,107 +22,343 @@ class EmbyLibraryProvider(backend.LibraryProvider):
     root_directory = ARef(type=ARef.PLAYLIST, uri='emby:directory:root',
                                           name='Emby', artwork="emby.media/favicon.ico")
 
+    # virtual directories listed above the artists, with the remote
+    # method returning their entries
+    shelves = [
+        (ARef(type=ARef.DIRECTORY, uri='emby:directory:latest',
+              name='Recently added'), 'get_latest'),
+        (ARef(type=ARef.DIRECTORY, uri='emby:directory:most_played',
+              name='Most played'), 'get_most_played'),
+    ]
+
+    # browsing by genre and by decade, then year
+    facets = [
+        ARef(type=ARef.DIRECTORY, uri='emby:directory:genres',
+             name='Genres'),
+        ARef(type=ARef.DIRECTORY, uri='emby:directory:decades',
+             name='Decades'),
+    ]
+
+    # albums per page of a genre or year
+    page_size = 500
+
+    # seconds to wait for an operation before giving up
+    timeouts = {
+        'get_distinct': 30,
+        'browse': 30,
+        'lookup': 30,
+        'search': 30,
+        'get_images': 10,
+        'snapshot': 600,
+    }
+
+    def __init__(self, backend):
+        super(EmbyLibraryProvider, self).__init__(backend)
+
+        self.browse_routes = UriRouter([
+            ('directory:root', self._browse_root),
+            ('directory:genres', self._browse_genres),
+            ('directory:decades', self._browse_decades),
+            ('directory:decade:*', self._browse_decade),
+            ('directory:genre:*', self._browse_facet_albums(facets.GENRE)),
+            ('directory:genre:*:*', self._browse_facet_albums(facets.GENRE)),
+            ('directory:year:*', self._browse_facet_albums(facets.YEAR)),
+            ('directory:year:*:*', self._browse_facet_albums(facets.YEAR)),
+            ('artist:*', self._browse_artist, True),
+            ('album:*', self._browse_album, True),
+        ] + [
+            (ref.uri[len('emby:'):], self._browse_shelf(method))
+            for ref, method in self.shelves
+        ])
+
+        self.lookup_routes = UriRouter([
+            ('library', self._snapshot),
+            ('shuffle', self._shuffle),
+            ('shuffle:album', self._random_album),
+            ('track:*', self._lookup_track, True, self._lookup_tracks),
+            ('album:*', self._lookup_album, True),
+            ('artist:*', self._lookup_artist, True),
+        ] + [
+            ('mix:{}:*'.format(kind), self._lookup_mix, True)
+            for kind in mixes.MIX_KINDS
+        ])
+
+        self.image_routes = UriRouter([
+            ('directory:root', self._root_images),
+        ] + [
+            ('{}:*'.format(kind), self._images(kind), True,
+             self._images_many(kind))
+            for kind in ('track', 'album', 'artist')
+        ])
+
+    def _run(self, priority, operation, func, *args, **kwargs):
+        """Runs an operation in the backends worker pool.
+
+        :raises concurrent.futures.TimeoutError: if the operation takes
+            longer than its timeout
+        """
+        target = args[0] if args else (
+            kwargs.get('uri') or kwargs.get('uris') or kwargs.get('query'))
+        func = profiler.wrap(operation, target, func)
+
+        try:
+            return self.backend.workers.run(
+                priority, self.timeouts[operation], func, *args, **kwargs
+            )
+
+        except TimeoutError:
+            logger.warning(
+                'Emby {} timed out after {}s'.format(
+                    operation, self.timeouts[operation]
+                )
+            )
+            raise
 
     def get_distinct(self, field, query=None):
+        return self._run(workers.INTERACTIVE, 'get_distinct',
+                         self._get_distinct, field, query)
+
+    def browse(self, uri):
+        return self._run(workers.INTERACTIVE, 'browse', self._browse, uri)
+
+    def lookup(self, uri=None, uris=None):
+        if uri == snapshot.URI:
+            return self._run(workers.INTERACTIVE, 'snapshot', self._snapshot)
+
+        if uri and ':track:' in uri and ':mix:' not in uri:
+            priority = workers.PLAYBACK
+        else:
+            priority = workers.INTERACTIVE
+
+        return self._run(priority, 'lookup', self._lookup, uri=uri, uris=uris)
+
+    def search(self, query=None, uris=None, exact=False):
+        return self._run(workers.INTERACTIVE, 'search',
+                         self._search, query=query, uris=uris, exact=exact)
+
+    def get_images(self, uris):
+        return self._run(workers.INTERACTIVE, 'get_images',
+                         self._get_images, uris)
+
+    def _get_distinct(self, field, query=None):
+        if field in ('album', 'artist'):
+            return merge(
+                self.backend.federation.fan_out(self._get_distinct_source,
+                                                field)
+            )
+
+    @staticmethod
+    def _get_distinct_source(remote, field):
         if field == 'album':
-            return self.backend.remote.get_albums_list()
+            return remote.get_albums_list()
         if field == 'artist':
-            return self.backend.remote.get_artists_list()
+            return remote.get_artists_list()
 
-    def browse(self, uri):
-        # artistlist
-        if uri == self.root_directory.uri:
-            logger.debug('Get Emby artist list')
-            return self.backend.remote.get_artists()
+    def _browse(self, uri):
+        return self.browse_routes.dispatch(self.backend.federation, uri, [])
 
-        # split uri
-        parts = uri.split(':')
+    def _browse_root(self):
+        logger.debug('Get Emby artist list')
+        return [ref for ref, _ in self.shelves] + self.facets + merge(
+            self.backend.federation.fan_out(
+                lambda remote: remote.get_artists()
+            ),
+            key=lambda ref: ref.name
+        )
 
-        # artists albums
-        # uri: emby:artist:<artist_id>
-        if uri.startswith('emby:artist:') and len(parts) == 3:
-            logger.debug('Get Emby album list')
-            artist_id = parts[-1]
+    def _browse_shelf(self, method):
+        def browse():
+            return merge(self.backend.federation.fan_out(
+                lambda remote: getattr(remote, method)()
+            ))
 
-            return self.backend.remote.get_albums(artist_id)
+        return browse
 
-        # tracklist
-        # uri: emby:album:<album_id>
-        if uri.startswith('emby:album:') and len(parts) == 3:
-            logger.debug('Get Emby track list')
-            album_id = parts[-1]
+    def _facet_counts(self, facet, decade=None):
+        counts = {}
+        for result in self.backend.federation.fan_out(
+                lambda remote: remote.get_facet_counts(facet, decade)):
+            for value, count in result.items():
+                counts[value] = counts.get(value, 0) + count
 
-            return self.backend.remote.get_tracks(album_id)
+        return sorted(counts.items())
 
-        return []
+    def _browse_genres(self):
+        return [
+            ARef.directory(
+                uri='emby:directory:genre:{}'.format(quote(genre, '')),
+                name='{} ({})'.format(genre, count))
+            for genre, count in self._facet_counts(facets.GENRE)
+        ]
 
-    def lookup(self, uri=None, uris=None):
+    def _browse_decades(self):
+        return [
+            ARef.directory(uri='emby:directory:decade:{}'.format(decade),
+                           name='{}s ({})'.format(decade, count))
+            for decade, count in self._facet_counts(facets.DECADE)
+        ]
+
+    def _browse_decade(self, decade):
+        return [
+            ARef.directory(uri='emby:directory:year:{}'.format(year),
+                           name='{} ({})'.format(year, count))
+            for year, count in self._facet_counts(facets.YEAR, decade)
+        ]
+
+    def _browse_facet_albums(self, facet):
+        # uri: emby:directory:<genre|year>:<value>[:<page>]
+        def browse(value, page='0'):
+            if not page.isdigit():
+                return []
+
+            page = int(page)
+            albums = merge(
+                self.backend.federation.fan_out(
+                    lambda remote: remote.get_facet_albums(
+                        facet, unquote(value))
+                ),
+                key=lambda ref: ref.name
+            )
+
+            start = page * self.page_size
+            refs = albums[start:start + self.page_size]
+            if len(albums) > start + self.page_size:
+                refs.append(ARef.directory(
+                    uri='emby:directory:{}:{}:{}'.format(
+                        facet, value, page + 1),
+                    name='More ({})'.format(
+                        len(albums) - start - self.page_size)
+                ))
+
+            return refs
+
+        return browse
+
+    @staticmethod
+    def _browse_artist(remote, artist_id):
+        logger.debug('Get Emby album list')
+        return remote.get_albums(artist_id)
+
+    @staticmethod
+    def _browse_album(remote, album_id):
+        logger.debug('Get Emby track list')
+        return remote.get_tracks(album_id)
+
+    def _snapshot(self):
+        return list(self.backend.snapshot.load())
+
+    def _shuffle(self):
+        return self.backend.queues.shuffle()
+
+    def _random_album(self):
+        return self.backend.queues.random_album()
+
+    def _lookup(self, uri=None, uris=None):
         logger.debug('Emby lookup: {}'.format(uri or uris))
+        federation = self.backend.federation
+
         if uri:
-            parts = uri.split(':')
+            return self.lookup_routes.dispatch(federation, uri, [])
 
-            if uri.startswith('emby:track:') and len(parts) == 3:
-                track_id = parts[-1]
-                tracks = [self.backend.remote.get_track(track_id)]
+        results = self.lookup_routes.dispatch_many(federation, uris)
 
-            elif uri.startswith('emby:album:') and len(parts) == 3:
-                album_id = parts[-1]
-                album_data = self.backend.remote.get_directory(album_id)
-                tracks = []
-                for t in album_data.get('Items'):
-                  tracks.append(self.backend.remote.get_track(t['Id']))
+        return {uri: results.get(uri, []) for uri in uris}
 
-                tracks = sorted(tracks, key=lambda k: k.track_no)
+    @staticmethod
+    def _lookup_track(remote, track_id):
+        return [remote.get_track(track_id)]
 
-            elif uri.startswith('emby:artist:') and len(parts) == 3:
-                artist_id = parts[-1]
+    @staticmethod
+    def _lookup_tracks(remote, args):
+        tracks = {
+            track.uri: track
+            for track in remote.get_tracks_by_ids([i for i, in args])
+        }
 
-                tracks = self.backend.remote.lookup_artist(artist_id)
-                
-            else:
-                logger.info('Unknown Emby lookup URI: {}'.format(uri))
-                tracks = []
-            return tracks
+        return [
+            [tracks[uri]] if uri in tracks else []
+            for uri in ('emby:track:{}'.format(i) for i, in args)
+        ]
 
-        else:
-            return {uri: self.lookup(uri=uri) for uri in uris}
+    @staticmethod
+    def _lookup_album(remote, album_id):
+        # comes sorted by disc and track number
+        return remote.get_album_tracks(album_id)
 
-    def search(self, query=None, uris=None, exact=False):
+    @staticmethod
+    def _lookup_artist(remote, artist_id):
+        return remote.lookup_artist(artist_id)
+
+    def _lookup_mix(self, remote, item_id):
+        # uri: emby:mix:<track|album|artist>:<id>
+        return self.backend.queues.instant_mix(remote, item_id)
+
+    def _search(self, query=None, uris=None, exact=False):
+        federation = self.backend.federation
         if 'album' in query:
           if query['album'][0] == '_____':
-             res = self.backend.remote.list_albums()
+             res = merge(
+                 federation.fan_out(lambda remote: remote.list_albums()),
+                 key=lambda album: album.name
+             )
              sresult = models.SearchResult(uri='', tracks=[], artists=[], albums=res)
              return sresult
         if 'artist' in query:
           if query['artist'][0] == '_____':
-             res = self.backend.remote.list_artists()
+             res = merge(
+                 federation.fan_out(lambda remote: remote.list_artists()),
+                 key=lambda artist: artist.name
+             )
              sresult = models.SearchResult(uri='', tracks=[], artists=res, albums=[])
              return sresult
-        search_res = self.backend.remote.search(query)
+        results = federation.fan_out(lambda remote: remote.search(query))
+        if len(results) == 1:
+            return results[0]
+
+        search_res = models.SearchResult(
+            uri='emby:search',
+            tracks=merge([r.tracks for r in results]),
+            artists=merge([r.artists for r in results]),
+            albums=merge([r.albums for r in results])
+        )
         return search_res
 
-    def get_images(self, uris):
-        result = dict()
-        for uri in uris:
-            parts = uri.split(':')
-            if uri.startswith('emby:directory:'):
-              dir_id = parts[-1]
-              if dir_id == 'root':
-                artwork_uri="http://emby.media/favicon.ico"
-                result[uri] = [models.Image(uri=artwork_uri)]
-            if uri.startswith('emby:track:') and len(parts) == 3:
-              track_id = parts[-1]
-              track = self.backend.remote.get_track(track_id)
-              artwork_uri = "http://" + track.artwork.replace("%1", "400").replace("%2","400")
-              result[uri] = [models.Image(uri=artwork_uri)]
-            if uri.startswith('emby:album:') and len(parts) == 3:
-              album_id = parts[-1]
-              album = self.backend.remote.create_album_id(album_id)
-              artwork_uri = "http://" + album.artwork.replace("%1", "400").replace("%2","400")
-              result[uri] = [models.Image(uri=artwork_uri)]
-            if uri.startswith('emby:artist:') and len(parts) == 3:
-              artist_id = parts[-1]
-              artist = self.backend.remote.create_artist_id(artist_id)
-              artwork_uri = "http://" + artist.artwork.replace("%1", "400").replace("%2","400")
-              result[uri] = [models.Image(uri=artwork_uri)]
-        return result
+    def _get_images(self, uris):
+        return self.image_routes.dispatch_many(self.backend.federation, uris)
+
+    def _root_images(self):
+        return [models.Image(uri='http://emby.media/favicon.ico')]
+
+    @staticmethod
+    def _images(kind):
+        def images(remote, item_id):
+            return remote.get_images(kind, item_id)
+
+        return images
+
+    @staticmethod
+    def _images_many(kind):
+        def images(remote, args):
+            return remote.get_images_many(kind, [i for i, in args])
+
+        return images
+
+
+def merge(results, key=None):
+    """Joins the lists returned by several Emby servers.
+
+    :param results: One list per server
+    :type results: list
+    :param key: Sort key for the joined list
+    :type key: function
+    :returns: Joined list
+    :rtype: list
+    """
+    if len(results) == 1:
+        return results[0]
+
+    merged = [i for result in results for i in result or []]
+    if key is not None:
+        merged.sort(key=key)
+
+    return merged
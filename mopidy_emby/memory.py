@@ -0,0 +1,137 @@
+from __future__ import unicode_literals
+
+import gc
+import logging
+import resource
+import threading
+
+from mopidy_emby.metrics import metrics
+from mopidy_emby.remote import EmbyHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+def rss():
+    """Returns the resident set size of the process in bytes.
+
+    Falls back to the peak size where there is no ``/proc``.
+
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryGuard(object):
+    """Keeps the process within a memory budget from its own thread.
+
+    Every ``interval`` seconds the resident size of the process and the
+    size of the caches are exported as metrics. Above the budget, the
+    cached items and listings of all handlers are dropped. Freed memory
+    rarely makes the resident size shrink, so while it stays above the
+    budget the caches are dropped again only once they regrew by half
+    of what the last trim dropped.
+
+    :param remotes: Handlers of all servers
+    :type remotes: list of :class:`mopidy_emby.remote.EmbyHandler`
+    :param budget: Memory budget in MB
+    :type budget: int
+    """
+
+    interval = 30
+
+    def __init__(self, remotes, budget):
+        self.remotes = remotes
+        self.budget = budget * 1024 * 1024
+
+        # cache entries to exceed before trimming again
+        self._rearm = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def report(self):
+        """Returns the current memory use and exports it as metrics.
+
+        :returns: Resident size and budget in bytes, entries per cache and
+            raw bytes of kept responses
+        :rtype: dict
+        """
+        caches = {
+            name: len(getattr(EmbyHandler, name).cache)
+            for name in sorted(set(
+                EmbyHandler.cached + EmbyHandler.shelves + EmbyHandler.bounded
+            ))
+        }
+        responses = sum(remote.conditional.bytes for remote in self.remotes)
+        report = {
+            'rss': rss(),
+            'budget': self.budget,
+            'caches': caches,
+            'responses': responses,
+        }
+
+        metrics.set('emby_memory_rss_bytes', report['rss'])
+        metrics.set('emby_memory_budget_bytes', self.budget)
+        metrics.set('emby_response_cache_bytes', responses)
+        for name, entries in caches.items():
+            metrics.set('emby_cache_entries', entries, function=name)
+
+        return report
+
+    def check(self):
+        """Drops cached items and listings if the budget is exceeded.
+
+        :returns: True if caches were dropped
+        :rtype: bool
+        """
+        report = self.report()
+        if report['rss'] <= self.budget:
+            self._rearm = None
+            return False
+
+        entries = sum(report['caches'].values())
+        if self._rearm is not None and entries <= self._rearm:
+            return False
+
+        logger.info(
+            'Emby uses {} MB of {} MB, dropping cached items'.format(
+                report['rss'] // 1024 // 1024, self.budget // 1024 // 1024
+            )
+        )
+        for remote in self.remotes:
+            remote.trim_caches()
+        gc.collect()
+        metrics.inc('emby_memory_trims_total')
+
+        left = sum(self.report()['caches'].values())
+        self._rearm = left + (entries - left) // 2
+
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name='EmbyMemoryGuard'
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning('Emby memory check failed: {}'.format(e))
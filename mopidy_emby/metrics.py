@@ -0,0 +1,215 @@
+from __future__ import unicode_literals
+
+import functools
+import logging
+import re
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+# GUIDs of older servers and numeric IDs of current ones
+ID_RE = re.compile(r'/([0-9a-f]{32}|\d+)(?=/|$)')
+
+
+def endpoint(url):
+    """Returns the endpoint of an Emby API url with IDs replaced.
+
+    :param url: Url
+    :type url: str
+    :returns: Endpoint, like ``/Users/{id}/Items``
+    :rtype: str
+    """
+    path = url.split('?', 1)[0]
+    if '://' in path:
+        path = '/' + path.split('://', 1)[1].partition('/')[2]
+
+    return ID_RE.sub('/{id}', path)
+
+
+class Histogram(object):
+    """Cumulative histogram with fixed buckets.
+    """
+
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+               5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics(object):
+    """Registry of counters, gauges and histograms.
+
+    Every metric has a name and optional labels. ``prometheus`` dumps all
+    of them in the Prometheus text format, ``snapshot`` as dict.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the seconds spent in the ``with`` block.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator observing the seconds spent in a function.
+
+        The function name is added as ``function`` label.
+        """
+        def decorator(func):
+            func_labels = dict(labels, function=func.__name__)
+
+            @functools.wraps(func)
+            def _timed(*args, **kwargs):
+                with self.timer(name, **func_labels):
+                    return func(*args, **kwargs)
+
+            return _timed
+
+        return decorator
+
+    def cache_hit_ratios(self):
+        """Returns the hit ratio of every cached function.
+        """
+        hits = {}
+        misses = {}
+        with self._lock:
+            for (name, labels), value in self.counters.items():
+                function = dict(labels).get('function')
+                if name == 'emby_cache_hits_total':
+                    hits[function] = value
+                elif name == 'emby_cache_misses_total':
+                    misses[function] = value
+
+        return dict(
+            (function, hits.get(function, 0) / float(
+                hits.get(function, 0) + misses.get(function, 0)))
+            for function in set(hits) | set(misses)
+        )
+
+    def snapshot(self):
+        """Returns all metrics as dict.
+        """
+        def labeled(name, labels, value):
+            return {'name': name, 'labels': dict(labels), 'value': value}
+
+        with self._lock:
+            counters = [labeled(n, l, v)
+                        for (n, l), v in sorted(self.counters.items())]
+            gauges = [labeled(n, l, v)
+                      for (n, l), v in sorted(self.gauges.items())]
+            histograms = [
+                labeled(n, l, {
+                    'count': h.count,
+                    'sum': h.sum,
+                    'buckets': dict(zip(h.buckets, h.counts)),
+                })
+                for (n, l), h in sorted(self.histograms.items())
+            ]
+
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+            'cache_hit_ratios': self.cache_hit_ratios(),
+        }
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        labels = tuple(labels) + tuple(extra)
+        if not labels:
+            return ''
+
+        return '{{{}}}'.format(','.join(
+            '{}="{}"'.format(k, str(v).replace('\\', '\\\\')
+                             .replace('"', '\\"'))
+            for k, v in labels
+        ))
+
+    def prometheus(self):
+        """Returns all metrics in the Prometheus text format.
+        """
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, kind))
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, 'counter')
+                lines.append('{}{} {}'.format(
+                    name, self._labels(labels), value))
+
+            for (name, labels), value in sorted(self.gauges.items()):
+                header(name, 'gauge')
+                lines.append('{}{} {}'.format(
+                    name, self._labels(labels), value))
+
+            for (name, labels), h in sorted(self.histograms.items()):
+                header(name, 'histogram')
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append('{}_bucket{} {}'.format(
+                        name, self._labels(labels, [('le', bound)]), count))
+                lines.append('{}_bucket{} {}'.format(
+                    name, self._labels(labels, [('le', '+Inf')]), h.count))
+                lines.append('{}_sum{} {}'.format(
+                    name, self._labels(labels), h.sum))
+                lines.append('{}_count{} {}'.format(
+                    name, self._labels(labels), h.count))
+
+        return '\n'.join(lines) + '\n'
+
+
+# registry shared by the whole extension
+metrics = Metrics()
@@ -0,0 +1,163 @@
+from __future__ import unicode_literals
+
+import heapq
+import logging
+import random
+
+from collections import Counter
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# lookup of these uris builds a new queue every time
+SHUFFLE = 'emby:shuffle'
+RANDOM_ALBUM = 'emby:shuffle:album'
+
+# emby:mix:<track|album|artist>:<id> is an instant mix of the item
+MIX_KINDS = ('track', 'album', 'artist')
+
+
+def weighted_sample(items, size, weight=None, rng=random):
+    """Picks up to ``size`` items without replacement.
+
+    Every item gets the key ``u ** (1 / weight)`` for a random ``u``, the
+    items with the largest keys are taken. Items are looked at once and
+    only ``size`` of them are kept at a time.
+
+    :param items: Items to pick from
+    :param size: Number of items to pick
+    :param weight: Function returning the weight of an item, all items
+        weigh the same without it
+    :param rng: Random number generator
+    :returns: Picked items in random order
+    :rtype: list
+    """
+    def keyed():
+        for index, item in enumerate(items):
+            item_weight = weight(item) if weight else 1.0
+            if item_weight > 0:
+                yield rng.random() ** (1.0 / item_weight), index, item
+
+    return [item for _, _, item in heapq.nlargest(size, keyed())]
+
+
+def unique(tracks):
+    """Drops repeated tracks, keeping the first one.
+
+    Tracks count as the same if they share an uri, or a name and artists,
+    as the same song often is on an album and a compilation.
+
+    :param tracks: Tracks
+    :type tracks: list of mopidy.models.Track
+    :returns: tracks
+    :rtype: list of mopidy.models.Track
+    """
+    seen = set()
+    result = []
+
+    for track in tracks:
+        song = (
+            (track.name or '').lower(),
+            frozenset(artist.name for artist in track.artists)
+        )
+        if track.uri in seen or song in seen:
+            continue
+
+        seen.update((track.uri, song))
+        result.append(track)
+
+    return result
+
+
+class QueueBuilder(object):
+    """Builds queues of tracks in one call.
+
+    :param federation: Servers to pick from
+    :type federation: :class:`mopidy_emby.federation.Federation`
+    :param size: Maximum number of tracks of a queue
+    :type size: int
+    """
+
+    # random tracks to ask for per queue slot, to have some to drop
+    candidates = 2
+
+    def __init__(self, federation, size=100, rng=None):
+        self.federation = federation
+        self.size = size
+        self.rng = rng or random.Random()
+
+    def _sources(self):
+        return [
+            source for source in self.federation.sources.values()
+            if source.healthy or len(self.federation.sources) == 1
+        ]
+
+    def shuffle(self):
+        """Returns random tracks from all servers.
+
+        The servers hand out random candidates, picking from them is
+        weighted so no album takes up more than its share of the queue.
+
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        tracks = unique([
+            track
+            for result in self.federation.fan_out(
+                lambda remote: remote.get_random_tracks(
+                    self.size * self.candidates)
+            )
+            for track in result
+        ])
+        albums = Counter(track.album.uri for track in tracks if track.album)
+
+        def weight(track):
+            if track.album and track.album.uri:
+                return 1.0 / albums[track.album.uri]
+            return 1.0
+
+        metrics.inc('emby_queues_total', kind='shuffle')
+
+        return weighted_sample(tracks, self.size, weight, self.rng)
+
+    def random_album(self):
+        """Returns the tracks of a random album.
+
+        The album is picked from the cached album lists, so only its
+        tracks are fetched.
+
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        albums = [
+            (source, album)
+            for source in self._sources()
+            for album in source.remote.get_music_albums()
+        ]
+        if not albums:
+            return []
+
+        source, album = self.rng.choice(albums)
+        logger.debug('Emby random album: {}'.format(album.get('Name')))
+        metrics.inc('emby_queues_total', kind='album')
+
+        return self.federation.qualify(
+            source, source.remote.get_album_tracks(album['Id'])[:self.size]
+        )
+
+    def instant_mix(self, remote, item_id):
+        """Returns tracks similar to an item.
+
+        :param remote: Server of the item
+        :type remote: :class:`mopidy_emby.remote.EmbyHandler`
+        :param item_id: ID of a track, album or artist
+        :type item_id: str
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        metrics.inc('emby_queues_total', kind='mix')
+
+        return unique(remote.get_instant_mix(item_id, self.size))[:self.size]
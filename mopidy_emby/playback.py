@@ -2,25 +2,96 @@ from __future__ import unicode_literals
 
 import logging
 
+from concurrent.futures import TimeoutError
+
 from mopidy import backend
 
+from mopidy_emby import workers
+from mopidy_emby.uris import UriRouter
+
 
 logger = logging.getLogger(__name__)
 
 
 class EmbyPlaybackProvider(backend.PlaybackProvider):
 
+    # seconds to wait for a streaming url
+    timeout = 10
+
+    def __init__(self, audio, backend):
+        super(EmbyPlaybackProvider, self).__init__(audio, backend)
+
+        self.routes = UriRouter([
+            ('track:*', self._stream_url, True),
+        ])
+
+        # track being changed to, the stream cache takes its version from
+        # there instead of asking the server
+        self._track = None
+
+    def change_track(self, track):
+        self._track = track
+        try:
+            return super(EmbyPlaybackProvider, self).change_track(track)
+        finally:
+            self._track = None
+
     def translate_uri(self, uri):
-        if uri.startswith('emby:track:') and len(uri.split(':')) == 3:
-            id = uri.split(':')[-1]
+        try:
+            return self.backend.workers.run(
+                workers.PLAYBACK, self.timeout, self._translate_uri, uri
+            )
 
-            track_url = self.backend.remote.api_url(
-                '/Audio/{}/stream?static=true'.format(id)
+        except TimeoutError:
+            logger.warning(
+                'Emby translate_uri timed out after {}s'.format(self.timeout)
             )
+            raise
+
+    def _translate_uri(self, uri):
+        return self.routes.dispatch(self.backend.federation, uri)
 
-            logger.debug('Emby track streaming url: {}'.format(track_url))
+    def _stream_url(self, remote, id):
+        track_url = remote.api_url(
+            '/Audio/{}/stream?static=true'.format(id)
+        )
 
-            return track_url
+        # only the first server streams through the cache
+        stream_cache = self.backend.stream_cache
+        if stream_cache and remote is self.backend.remote:
+            track = self._track
+            if track is None or track.uri != 'emby:track:{}'.format(id):
+                track = remote.get_track(id)
 
-        else:
-            return None
+            version = stream_cache.track_version(track)
+            cached_url = stream_cache.get(id, version)
+
+            if cached_url:
+                logger.debug('Emby cached track: {}'.format(cached_url))
+
+                return cached_url
+
+            # play along with the download instead of fetching twice, from
+            # the server if the download didnt start
+            local_url = stream_cache.fetch(id, version, track_url)
+            if local_url:
+                logger.debug('Emby track downloading: {}'.format(local_url))
+
+                return local_url
+
+        logger.debug('Emby track streaming url: {}'.format(track_url))
+
+        return track_url
+
+    def pin_tracks(self, uris):
+        """Keeps the stream cache from evicting the given tracks.
+
+        :param uris: Track uris
+        :type uris: list
+        """
+        if self.backend.stream_cache:
+            self.backend.stream_cache.pin(
+                uri.split(':')[-1]
+                for uri in uris
+                if uri.startswith('emby:track:')
+            )
@@ -0,0 +1,121 @@
+from __future__ import unicode_literals
+
+import logging
+
+from concurrent.futures import TimeoutError
+
+from mopidy import backend, models
+
+from mopidy_emby import workers
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmbyPlaylistsProvider(backend.PlaylistsProvider):
+    """Read-only access to the Emby playlists of the user.
+
+    The playlist list is cached. Playlist contents are only fetched when
+    asked for, page by page, and tracks are built straight from the page
+    data, so a playlist costs one request per ``playlist_page_size``
+    entries.
+    """
+
+    # seconds to wait for an operation before giving up
+    timeout = 30
+
+    def _run(self, func, *args):
+        try:
+            return self.backend.workers.run(
+                workers.INTERACTIVE, self.timeout, func, *args
+            )
+
+        except TimeoutError:
+            logger.warning(
+                'Emby playlists timed out after {}s'.format(self.timeout)
+            )
+            raise
+
+    @staticmethod
+    def _playlist_id(uri):
+        parts = uri.split(':')
+
+        if uri.startswith('emby:playlist:') and len(parts) == 3:
+            return parts[-1]
+
+    def as_list(self):
+        return self._run(self._as_list)
+
+    def get_items(self, uri):
+        return self._run(self._get_items, uri)
+
+    def lookup(self, uri):
+        return self._run(self._lookup, uri)
+
+    def refresh(self):
+        for source in self.backend.federation.sources.values():
+            source.remote.invalidate_playlists()
+
+    def create(self, name):
+        logger.info('Emby playlists cant be created from Mopidy')
+
+    def delete(self, uri):
+        logger.info('Emby playlists cant be deleted from Mopidy')
+
+        return False
+
+    def save(self, playlist):
+        logger.info('Emby playlists cant be changed from Mopidy')
+
+    def _as_list(self):
+        return [
+            ref
+            for refs in self.backend.federation.fan_out(self._as_list_source)
+            for ref in refs
+        ]
+
+    @staticmethod
+    def _as_list_source(remote):
+        return [
+            models.Ref.playlist(
+                uri='emby:playlist:{}'.format(playlist['Id']),
+                name=playlist.get('Name')
+            )
+            for playlist in remote.get_playlists()
+        ]
+
+    def _get_items(self, uri):
+        return self.backend.federation.call(uri, self._get_items_source)
+
+    def _get_items_source(self, remote, uri):
+        playlist_id = self._playlist_id(uri)
+        if playlist_id is None:
+            return None
+
+        return [
+            remote.create_track_ref(item)
+            for item in remote.iter_playlist_items(playlist_id)
+            if item.get('Type') == 'Audio'
+        ]
+
+    def _lookup(self, uri):
+        return self.backend.federation.call(uri, self._lookup_source)
+
+    def _lookup_source(self, remote, uri):
+        playlist_id = self._playlist_id(uri)
+        if playlist_id is None:
+            return None
+
+        playlist = remote.get_playlist(playlist_id)
+        if playlist is None:
+            return None
+
+        return models.Playlist(
+            uri=uri,
+            name=playlist.get('Name'),
+            tracks=[
+                remote.create_track(item)
+                for item in remote.iter_playlist_items(playlist_id)
+                if item.get('Type') == 'Audio'
+            ]
+        )
@@ -0,0 +1,232 @@
+from __future__ import unicode_literals
+
+import functools
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class Profile(object):
+    """Time breakdown of a single library provider call.
+
+    Phases nest, time spent in an inner phase is not counted for the outer
+    one. Whatever isnt covered by a phase ends up as ``other``. Work handed
+    to other threads is profiled in branches, see :meth:`join`.
+    """
+
+    def __init__(self, operation, target):
+        self.operation = operation
+        self.target = target
+        self.phases = defaultdict(float)
+        self.started = time.time()
+        self.duration = None
+        self._stack = []
+        # branches finish on other threads
+        self._branches = []
+        self._lock = threading.Lock()
+
+    def enter(self, name):
+        now = time.time()
+        if self._stack:
+            parent = self._stack[-1]
+            self.phases[parent[0]] += now - parent[1]
+
+        self._stack.append([name, now])
+
+    def exit(self):
+        now = time.time()
+        name, started = self._stack.pop()
+        self.phases[name] += now - started
+
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def add_branch(self, branch):
+        with self._lock:
+            self._branches.append(branch)
+
+    def join(self):
+        """Takes over the phases of the slowest finished branch.
+
+        Branches run in parallel while this profile waits for them, so the
+        slowest one is what the wait was spent on.
+        """
+        with self._lock:
+            branches, self._branches = self._branches, []
+
+        if not branches:
+            return
+
+        slowest = max(branches, key=lambda branch: branch.duration)
+        moved = 0.0
+        for name, spent in slowest.phases.items():
+            if name != 'other':
+                self.phases[name] += spent
+                moved += spent
+
+        # not spent in the open phase
+        if self._stack:
+            self._stack[-1][1] += moved
+
+    def finish(self):
+        self.duration = time.time() - self.started
+        self.phases['other'] = max(
+            self.duration - sum(self.phases.values()), 0.0
+        )
+
+    def as_dict(self):
+        return {
+            'operation': self.operation,
+            'target': self.target,
+            'started': self.started,
+            'duration': self.duration,
+            'phases': dict(self.phases),
+        }
+
+
+class Profiler(object):
+    """Opt-in sampling profiler for library provider calls.
+
+    A ``sample_rate`` share of all calls is profiled, the ``slowest``
+    profiles are kept. Code marks its phases with :meth:`phase`, which is
+    almost free for calls that arent sampled.
+    """
+
+    def __init__(self, sample_rate=0.0, slowest=20):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self.configure(sample_rate, slowest)
+
+    def configure(self, sample_rate, slowest=20):
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.keep = slowest
+            self._slowest = []
+
+    @property
+    def current(self):
+        return getattr(self._local, 'profile', None)
+
+    @contextmanager
+    def phase(self, name):
+        """Attributes the time spent in the ``with`` block to a phase.
+        """
+        profile = self.current
+        if profile is None:
+            yield
+            return
+
+        profile.enter(name)
+        try:
+            yield
+        finally:
+            profile.exit()
+
+    def phased(self, name):
+        """Decorator attributing the time spent in a function to a phase.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def _phased(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+
+            return _phased
+
+        return decorator
+
+    def wrap(self, operation, target, func):
+        """Returns ``func`` profiled if this call gets sampled.
+
+        :param operation: Name of the operation
+        :param target: URIs or query of the call
+        :param func: Callable to run
+        :type operation: str
+        :returns: Callable
+        """
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return func
+
+        @functools.wraps(func)
+        def _profiled(*args, **kwargs):
+            profile = self._local.profile = Profile(operation, target)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.profile = None
+                profile.finish()
+                self._record(profile)
+
+        return _profiled
+
+    def carry(self, func):
+        """Returns ``func`` profiled in a branch of the current profile.
+
+        For work handed to other threads, the calling thread takes over the
+        phases with :meth:`join` once it waited for them.
+
+        :param func: Callable to run on another thread
+        :returns: Callable
+        """
+        parent = self.current
+        if parent is None:
+            return func
+
+        @functools.wraps(func)
+        def _carried(*args, **kwargs):
+            branch = self._local.profile = Profile(
+                parent.operation, parent.target
+            )
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.profile = None
+                branch.finish()
+                parent.add_branch(branch)
+
+        return _carried
+
+    def join(self):
+        """Takes over the phases of work carried to other threads.
+        """
+        profile = self.current
+        if profile is not None:
+            profile.join()
+
+    def _record(self, profile):
+        logger.debug(
+            'Emby {} {} took {:.3f}s'.format(
+                profile.operation, profile.target, profile.duration
+            )
+        )
+        entry = (profile.duration, next(self._counter), profile)
+
+        with self._lock:
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self):
+        """Returns the kept profiles, slowest first.
+
+        :rtype: list of dict
+        """
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+
+        return [profile.as_dict() for _, _, profile in entries]
+
+
+# profiler shared by the whole extension
+profiler = Profiler()
@@ -0,0 +1,119 @@
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+
+class Query(object):
+    """Declares what an Emby items query should return.
+
+    Sorting, type filters and the optional fields are left to the server,
+    so responses come back in order and only carry what the models need.
+    User data is off by default, images are limited to the primary and
+    backdrop tags the artwork resolver looks at.
+
+    :param types: Item types to include
+    :param sort_by: Sort fields, most significant first
+    :param fields: Optional fields to add to the default ones
+    :param recursive: Search the whole tree below the parent
+    :param images: Include image tags
+    :param user_data: Include play counts and favorites
+    :param descending: Sort in descending order
+    """
+
+    image_types = ('Primary', 'Backdrop')
+
+    def __init__(self, types=(), sort_by=(), fields=(), recursive=False,
+                 images=True, user_data=False, descending=False):
+        self.types = tuple(types)
+        self.sort_by = tuple(sort_by)
+        self.fields = tuple(fields)
+        self.recursive = recursive
+        self.images = images
+        self.user_data = user_data
+        self.descending = descending
+
+    def params(self, **extra):
+        """Returns the query parameters.
+
+        :param extra: Further parameters like ``ParentId``
+        :returns: Parameters in a stable order
+        :rtype: collections.OrderedDict
+        """
+        params = OrderedDict()
+
+        if self.recursive:
+            params['Recursive'] = 'true'
+
+        if self.types:
+            params['IncludeItemTypes'] = ','.join(self.types)
+
+        if self.sort_by:
+            params['SortBy'] = ','.join(self.sort_by)
+            params['SortOrder'] = \
+                'Descending' if self.descending else 'Ascending'
+
+        if self.fields:
+            params['Fields'] = ','.join(self.fields)
+
+        params['EnableImages'] = 'true' if self.images else 'false'
+        if self.images:
+            params['EnableImageTypes'] = ','.join(self.image_types)
+            params['ImageTypeLimit'] = 1
+
+        params['EnableUserData'] = 'true' if self.user_data else 'false'
+
+        for key in sorted(extra):
+            params[key] = extra[key]
+
+        return params
+
+
+# what a full track model is built from, next to the default fields
+TRACK_FIELDS = ('DateCreated', 'DateModified', 'Genres', 'MediaSources',
+                'ParentId', 'ProviderIds', 'SortName')
+
+# children of a folder: tracks in disc and track order, anything else by name
+CHILDREN = Query(sort_by=('ParentIndexNumber', 'IndexNumber', 'SortName'))
+
+# tracks of an album in disc and track order, built like any other track
+ALBUM_TRACKS = Query(types=('Audio',),
+                     sort_by=('ParentIndexNumber', 'IndexNumber', 'SortName'),
+                     fields=TRACK_FIELDS)
+
+# items of one type below a library, by name
+ITEM_TYPE = Query(sort_by=('SortName',), fields=('Genres', 'SortName'),
+                  recursive=True)
+
+# items by id, with what cache patching needs
+ITEMS = Query(fields=('Genres', 'SortName', 'ParentId'))
+
+# tracks by id, in the order the server likes
+TRACKS = Query(fields=TRACK_FIELDS)
+
+# all tracks below a library, album by album
+ALL_TRACKS = Query(
+    types=('Audio',),
+    sort_by=('AlbumArtist', 'Album', 'ParentIndexNumber', 'IndexNumber'),
+    fields=TRACK_FIELDS,
+    recursive=True
+)
+
+# random tracks below a library
+RANDOM_TRACKS = Query(types=('Audio',), sort_by=('Random',),
+                      fields=TRACK_FIELDS, recursive=True)
+
+# tracks similar to an item, in the servers order
+MIX = Query(fields=TRACK_FIELDS)
+
+# newest albums first, for /Users/{id}/Items/Latest
+LATEST = Query(types=('Audio',), fields=('DateCreated',))
+
+# played tracks, most often played first, ties are sorted by name on our
+# side as the sort order applies to all fields
+MOST_PLAYED = Query(types=('Audio',), sort_by=('PlayCount',),
+                    recursive=True, user_data=True, descending=True)
+
+PLAYLISTS = Query(types=('Playlist',), sort_by=('SortName',), recursive=True)
+
+# playlist entries keep the playlist order, built like any other track
+PLAYLIST_ITEMS = Query(fields=TRACK_FIELDS)
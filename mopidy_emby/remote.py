@@ -1,20 +1,35 @@
 from __future__ import unicode_literals
 
+import calendar
+import datetime
 import hashlib
-
+import heapq
 import logging
+import os
+import threading
 
 from collections import OrderedDict, defaultdict
 
 from urllib.parse import urlencode, quote
-from urllib.parse import parse_qs, urljoin, urlsplit, urlunsplit
 
 from mopidy import httpclient, models
 
 import requests
 
+from urllib3.util.request import ACCEPT_ENCODING
+
 import mopidy_emby
 
+from mopidy_emby import query
+from mopidy_emby.artwork import ArtworkResolver
+from mopidy_emby.auth import CredentialStore
+from mopidy_emby.client import AsyncClient, Retry
+from mopidy_emby.conditional import ConditionalCache, NotModified
+from mopidy_emby.facets import DiskFacetIndex, FacetIndex
+from mopidy_emby.interning import ModelInterner
+from mopidy_emby.metrics import endpoint as metrics_endpoint, metrics
+from mopidy_emby.profiling import profiler
+from mopidy_emby.scheduler import RequestScheduler
 from mopidy_emby.utils import cache
 
 from .classes import AAlbum, AArtist, ATrack, ARef
@@ -23,24 +38,178 @@ logger = logging.getLogger(__name__)
 
 
 class EmbyHandler(object):
+
+    # cache lifetime with library change events
+    event_cache_ttl = 7 * 24 * 3600
+
+    # seconds browse and search results are served after expiring, while
+    # they get refetched in the background
+    stale_cache_ttl = 24 * 3600
+
+    # cached methods that hold single items or listings, their number of
+    # entries is capped with a memory budget
+    bounded = ('get_directory', 'get_album_items', 'get_item', 'get_track',
+               'get_playlist_page', 'get_search_results')
+    cache_entries_per_mb = 4
+
+    # albums per request for the album lists, None fetches them at once
+    item_page_size = None
+
+    # seconds to wait before the first retry, doubled on every next one
+    retry_delay = 0.25
+    max_retry_delay = 8
+    max_retries = 5
+
     def __init__(self, config):
         self.hostname = config['emby']['hostname']
         self.port = config['emby']['port']
         self.username = config['emby']['username']
         self.password = config['emby']['password']
         self.proxy = config['proxy']
-        self.user_id = config['emby'].get('user_id', False)
+        self._user_id = config['emby'].get('user_id', False)
+        self.libraries = config['emby'].get('libraries') or []
+        self.base_url = self._base_url()
+        max_connections = config['emby'].get('max_connections') or 4
+        self.client = AsyncClient(
+            self._request,
+            max_connections=max_connections,
+            scheduler=RequestScheduler(
+                max_connections,
+                max_per_endpoint=config['emby'].get(
+                    'max_connections_per_endpoint'),
+                rate=config['emby'].get('requests_per_second'),
+            )
+        )
+        self._local = threading.local()
+        self.conditional = ConditionalCache()
+        self.interner = ModelInterner()
+        self._facets = None
+        self._facets_source = None
+        self._facets_lock = threading.Lock()
+        self.index_path = None
+        self.artwork = ArtworkResolver(
+            self.hostname,
+            self.port,
+            self.base_url,
+            [int(i) for i in config['emby'].get('image_sizes') or [400]]
+        )
+
+        self._auth_lock = threading.Lock()
+        self._connected = False
+        self._token = None
+        self._headers = None
+        self.credentials = None
+        if config.get('core', {}).get('data_dir'):
+            self.credentials = CredentialStore(os.path.join(
+                str(mopidy_emby.Extension.get_data_dir(config)),
+                'credentials.json'
+            ))
+
+        if config['emby'].get('memory_budget'):
+            self.limit_memory(config['emby']['memory_budget'])
+
+            if config.get('core', {}).get('cache_dir'):
+                self.index_path = os.path.join(
+                    str(mopidy_emby.Extension.get_cache_dir(config)),
+                    'facets-{}.sqlite3'.format(hashlib.sha1(
+                        self.base_url.encode('utf-8')).hexdigest()[:12])
+                )
 
-        # create authentication headers
+        # authenticated on first use, so a server that cant be reached
+        # doesnt keep the others from starting
         self.auth_data = self._password_data()
-        self.user_id = self.user_id or self._get_user()[0]['Id']
-        self.headers = self._create_headers()
 
-        self.token =  config['emby']['password']
+    @property
+    def user_id(self):
+        self.connect()
+        return self._user_id
+
+    @property
+    def token(self):
+        self.connect()
+        return self._token
+
+    @token.setter
+    def token(self, token):
+        self._token = token
+
+    @property
+    def headers(self):
+        self.connect()
+        return self._headers
+
+    def connect(self):
+        """Creates the authentication headers, reusing a stored token.
+
+        Runs on first use of the user id, token or headers and again on the
+        next use if the server couldnt be reached.
+        """
+        if self._connected:
+            return
+
+        with self._auth_lock:
+            if self._connected:
+                return
+
+            if not self._load_credentials():
+                self._user_id = self._user_id or self._get_user()[0]['Id']
+                self.authenticate()
+
+            self._headers = self._create_headers(token=self._token)
+            self._connected = True
+
+    def _credentials_key(self):
+        return CredentialStore.key(self.base_url, self.username)
+
+    def _load_credentials(self):
+        """Takes user id and token from the credential store.
 
-#self._get_token()
+        :returns: True if there were stored credentials
+        :rtype: bool
+        """
+        if self.credentials is None:
+            return False
+
+        credentials = self.credentials.load(self._credentials_key())
+        if credentials is None:
+            return False
+
+        logger.debug('Emby reusing stored access token')
+        self._user_id = self._user_id or credentials['user_id']
+        self._token = credentials['token']
+
+        return True
+
+    def authenticate(self):
+        """Gets a new access token and stores it.
+        """
+        self._headers = self._create_headers()
+        self._token = self._get_token()
+
+        # an api key used as password is never written to disk
+        if (self.credentials is not None and self._token and
+                self._token != self.password):
+            self.credentials.save(
+                self._credentials_key(), self._user_id, self._token
+            )
+
+    def reauthenticate(self, token):
+        """Replaces a token the server rejected.
+
+        Requests failing at the same time all pass the token they used,
+        only the first one authenticates again.
 
-        self.headers = self._create_headers(token=self.token)
+        :param token: Rejected token
+        :type token: str
+        """
+        with self._auth_lock:
+            if token != self._token:
+                return
+
+            logger.info('Emby rejected the access token, authenticating')
+            metrics.inc('emby_reauthentications_total')
+            self.authenticate()
+            self._headers = self._create_headers(token=self._token)
 
     def _get_user(self):
         """Return user dict from server or None if there is no user.
@@ -58,7 +227,17 @@ class EmbyHandler(object):
         """Return token for a user.
         """
         url = self.api_url('/Users/AuthenticateByName')
-        r = requests.post(url, headers=self.headers, data=self.auth_data)
+        r = requests.post(
+            url,
+            headers=self._headers,
+            data=dict(self.auth_data, pw=self.password)
+        )
+
+        if r.status_code == 401:
+            # older setups use an api key as password
+            logger.info('Emby login failed, using password as api key')
+            return self.password
+
         return r.json().get('AccessToken')
 
     def _password_data(self):
@@ -83,12 +262,12 @@ class EmbyHandler(object):
             'Device="mopidy", '
             'DeviceId="mopidy", '
             'Version="0.0.0"'
-        ).format(user_id=self.user_id)
+        ).format(user_id=self._user_id)
 
         headers['x-emby-authorization'] = authorization
 
         if token:
-            headers['x-emby-token'] = self.token
+            headers['x-mediabrowser-token'] = token
 
         return headers
 
@@ -102,82 +281,287 @@ class EmbyHandler(object):
 
         session = requests.Session()
         session.proxies.update({'http': proxy, 'https': proxy})
-        session.headers.update({'user-agent': full_user_agent})
+        # gzip and deflate, brotli too if it is installed
+        session.headers.update({
+            'user-agent': full_user_agent,
+            'accept-encoding': ACCEPT_ENCODING,
+        })
 
         return session
 
-    def r_get(self, url):
-        logger.debug(url)
-        counter = 0
-        session = self._get_session()
+    def _thread_session(self):
+        """Returns a session for the current thread.
+
+        Sessions keep their connections open, so every request thread of
+        the client reuses its own.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._get_session()
+
         session.headers.update(self.headers)
-        while counter <= 5:
 
-            try:
-                r = session.get(url)
-                rv = r.json()
+        return session
+
+    def _retry_after(self, counter, r=None):
+        """Returns the seconds to wait before the next try.
+
+        Uses the ``Retry-After`` header of a response if it has one.
+        """
+        try:
+            return min(float(r.headers['Retry-After']), self.max_retry_delay)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return min(self.retry_delay * 2 ** counter, self.max_retry_delay)
+
+    def _request(self, url, attempt=0):
+        """Makes one try of a request.
+
+        :param url: Url
+        :type url: str
+        :param attempt: Number of earlier tries
+        :type attempt: int
+        :raises mopidy_emby.client.Retry: if the server is busy or cant be
+            reached and there are tries left
+        """
+        logger.debug(url)
+        reauthenticated = False
+        session = self._thread_session()
+        labels = {'endpoint': metrics_endpoint(url)}
 
-                logger.debug(str(rv))
+        # revalidate what was fetched before
+        entry = self.conditional.get(url)
+        headers = self.conditional.headers(entry)
+        while True:
 
-                return rv
+            try:
+                token = self.token
+                with metrics.timer('emby_request_seconds', **labels):
+                    if headers:
+                        r = session.get(url, headers=headers)
+                    else:
+                        r = session.get(url)
 
             except Exception as e:
+                metrics.inc('emby_request_errors_total', **labels)
                 logger.info(
                     'Emby connection on try {} with problem: {}'.format(
-                        counter, e
+                        attempt, e
                     )
                 )
-                counter += 1
+                if attempt < self.max_retries:
+                    raise Retry(self._retry_after(attempt))
 
-        raise Exception('Cant connect to Emby API')
+                raise Exception('Cant connect to Emby API')
 
-    def api_url(self, endpoint):
-        """Returns a joined url.
+            metrics.inc('emby_requests_total',
+                        status=r.status_code, **labels)
+            metrics.inc('emby_response_bytes_total',
+                        len(r.content), **labels)
+
+            if r.status_code == 401 and not reauthenticated:
+                reauthenticated = True
+                self.reauthenticate(token)
+                session.headers.update(self.headers)
+                continue
+
+            if r.status_code == 304 and entry is not None:
+                return NotModified(entry.data)
+
+            # the server is busy, give it some time
+            if r.status_code in (429, 503) and attempt < self.max_retries:
+                metrics.inc('emby_request_retries_total', **labels)
+                raise Retry(self._retry_after(attempt, r))
+
+            return r
+
+    @profiler.phased('json')
+    def _decode(self, r, url=None):
+        """Returns the decoded JSON body of a response.
+
+        Responses to a conditional request reuse the data of the earlier
+        one, responses with validators are kept for the next request to
+        ``url``.
+        """
+        if isinstance(r, NotModified):
+            return r.data
+
+        try:
+            rv = r.json()
+        except ValueError as e:
+            raise Exception('Emby API sent no valid JSON: {}'.format(e))
+
+        logger.debug(str(rv))
+
+        if url is not None:
+            self.conditional.store(url, r, rv)
+
+        return rv
+
+    def r_get(self, url):
+        with profiler.phase('network'):
+            r = self.client.submit(url).result()
+
+        return self._decode(r, url)
+
+    def r_get_many(self, urls):
+        """Gets several urls concurrently.
+
+        :param urls: Urls
+        :type urls: list
+        :returns: Response data in the order of ``urls``
+        :rtype: list
+        """
+        with profiler.phase('network'):
+            responses = self.client.map(urls)
+
+        return [self._decode(r, url) for r, url in zip(responses, urls)]
+
+    def close(self):
+        """Stops the request threads.
+        """
+        self.client.stop()
+
+    def limit_memory(self, budget):
+        """Keeps the library data of the handler within a memory budget.
+
+        Caches of single items, listings and artwork urls keep only their
+        most recently used entries, album lists and exports are fetched in
+        smaller pages and the facet index goes to disk if there is a cache
+        directory.
+
+        :param budget: Memory budget in MB
+        :type budget: int
+        """
+        entries = max(budget * self.cache_entries_per_mb, 64)
+        for name in self.bounded:
+            getattr(EmbyHandler, name).cache.max_entries = entries
+        self.artwork.max_entries = entries
+
+        # raw bodies, their decoded data takes several times as much
+        self.conditional.max_bytes = budget * 1024 * 1024 // 64
+        self.item_page_size = 500
+        self.export_page_size = 200
+
+    def trim_caches(self):
+        """Drops the cached items, listings and artwork urls of this handler.
+
+        Album lists stay, they are needed for nearly everything.
+        """
+        for name in self.bounded:
+            cached = getattr(EmbyHandler, name).cache
+            for args, _ in cached.entries():
+                if args[0] is self:
+                    cached.invalidate(*args)
+
+        self.conditional.clear()
+        self.interner.clear()
+        self.artwork.clear()
+
+    def r_stream(self, url):
+        """Returns a streaming response for a url.
+
+        :param url: Url to stream from
+        :type url: str
+        :returns: Response
+        :rtype: requests.Response
+        """
+        session = self._get_session()
+        session.headers.update(self.headers)
+
+        return session.get(url, stream=True)
+
+    def r_post(self, url, data):
+        """Posts JSON data to a url.
+
+        Unlike ``r_get`` this doesnt retry, so callers can decide whether
+        to try again later.
+
+        :param url: Url
+        :type url: str
+        :param data: Data to post as JSON
+        :type data: dict
+        :returns: Response
+        :rtype: requests.Response
+        """
+        session = self._thread_session()
+        labels = {'endpoint': metrics_endpoint(url)}
+
+        for attempt in range(2):
+            token = self.token
+            with metrics.timer('emby_request_seconds', **labels):
+                r = session.post(url, json=data, timeout=10)
+
+            metrics.inc('emby_requests_total', status=r.status_code, **labels)
+            if r.status_code != 401 or attempt:
+                break
+
+            self.reauthenticate(token)
+            session.headers.update(self.headers)
+
+        r.raise_for_status()
+
+        return r
 
-        Takes host, port and endpoint and generates a valid emby API url.
+    def _base_url(self):
+        """Returns scheme, hostname and port of the Emby server.
         """
         # check if http or https is defined as host and create hostname
-        hostname_list = [self.hostname]
-        if self.hostname.startswith('http://') or \
-                self.hostname.startswith('https://'):
-            hostname = ''.join(hostname_list)
-        else:
-            hostname_list.insert(0, 'http://')
-            hostname = ''.join(hostname_list)
+        hostname = self.hostname
+        if not hostname.startswith(('http://', 'https://')):
+            hostname = 'http://' + hostname
 
-        joined = urljoin(
-            '{hostname}:{port}'.format(
-                hostname=hostname,
-                port=self.port
-            ),
-            endpoint
-        )
+        return '{}:{}'.format(hostname, self.port)
 
-        scheme, netloc, path, query_string, fragment = urlsplit(joined)
-        query_params = parse_qs(query_string)
+    def api_url(self, endpoint, params=None):
+        """Returns a joined url.
 
-        query_params['format'] = ['json']
-        new_query_string = urlencode(query_params, doseq=True)
+        Takes the precomputed base url and an endpoint and generates a valid
+        emby API url. Additional query parameters can be passed as dict.
 
-        return urlunsplit((scheme, netloc, path, new_query_string, fragment))
+        :param endpoint: Endpoint, may contain a query string
+        :param params: Additional query parameters
+        :type endpoint: str
+        :type params: dict
+        :returns: Url
+        :rtype: str
+        """
+        url = self.base_url + endpoint
 
-    def get_music_root(self):
+        if params:
+            separator = '&' if '?' in url else '?'
+            url = separator.join((url, urlencode(params)))
+
+        if '?' in url:
+            return url + '&format=json'
+
+        return url + '?format=json'
+
+    @cache(stale=stale_cache_ttl)
+    def get_music_roots(self):
+        """Returns the IDs of the music libraries.
+
+        Only libraries named in the ``libraries`` setting are used, all
+        of them if it is empty.
+
+        :returns: Library IDs
+        :rtype: list
+        """
         url = self.api_url(
             '/Users/{}/Views'.format(self.user_id)
         )
 
         data = self.r_get(url)
 
-        id = [i['Id']
-              for i in data['Items']
-              if 'CollectionType' in i.keys()
-              if i['CollectionType'] == 'music']
+        ids = [i['Id']
+               for i in data['Items']
+               if i.get('CollectionType') == 'music'
+               if not self.libraries or i.get('Name') in self.libraries]
 
-        if id:
+        if ids:
             logging.debug(
-                'Emby: Found music root dir with ID: {}'.format(id[0])
+                'Emby: Found music root dirs with IDs: {}'.format(ids)
             )
-            return id[0]
+            return ids
 
         else:
             logging.debug(
@@ -189,33 +573,102 @@ class EmbyHandler(object):
             )
             raise Exception('Emby: Cant find music root directory')
 
+    def get_music_root(self):
+        return self.get_music_roots()[0]
+
+    def get_music_albums(self):
+        """Returns the albums of all music libraries.
+
+        :returns: Albums from Emby API
+        :rtype: list of dict
+        """
+        music_roots = self.get_music_roots()
+        if len(music_roots) == 1:
+            return self.get_item_type(music_roots[0], 'MusicAlbum')['Items']
+
+        # every library comes sorted already
+        return list(heapq.merge(
+            *[self.get_item_type(music_root, 'MusicAlbum')['Items']
+              for music_root in music_roots],
+            key=lambda album: album.get('SortName') or album['Name']
+        ))
+
+    def refresh(self):
+        """Fetches the music roots and album lists into the cache and
+        builds the facet index.
+        """
+        self.get_facets()
+
+    def get_facets(self):
+        """Returns the facet index of the cached album lists.
+
+        The index is rebuilt once the album lists got fetched again or
+        patched after library changes.
+
+        :returns: Facet index
+        :rtype: :class:`mopidy_emby.facets.FacetIndex`
+        """
+        album_lists = [
+            self.get_item_type(music_root, 'MusicAlbum')['Items']
+            for music_root in self.get_music_roots()
+        ]
+
+        with self._facets_lock:
+            source = self._facets_source
+            if source is None or len(source) != len(album_lists) or any(
+                    a is not b for a, b in zip(source, album_lists)):
+                if self.index_path:
+                    self._facets = DiskFacetIndex(
+                        self.get_music_albums(), self.index_path)
+                else:
+                    self._facets = FacetIndex(self.get_music_albums())
+                self._facets_source = album_lists
+
+            return self._facets
+
+    def get_facet_counts(self, facet, decade=None):
+        """Returns the number of albums per genre, year or decade.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param decade: Only count the years of this decade
+        :type decade: str
+        :returns: Album count per value
+        :rtype: dict
+        """
+        return self.get_facets().counts(facet, decade)
+
+    def get_facet_albums(self, facet, value):
+        """Returns refs of the albums with a genre, year or decade.
+
+        :param facet: ``genre``, ``year`` or ``decade``
+        :type facet: str
+        :param value: Genre name, year or decade
+        :type value: str
+        :rtype: list of mopidy.models.Ref
+        """
+        return [
+            self.create_album_ref(album)
+            for album in self.get_facets().albums(facet, value)
+        ]
+
     def get_artists(self):
-        music_root = self.get_music_root()
-        albums = sorted(
-            self.get_item_type(music_root,'MusicAlbum')['Items'],
-            key=lambda k: k['Name']
-        )
+        albums = self.get_music_albums()
         res_artists  = []
         artist_names = []
-        for album in albums:
-          artists = []
-          artwork = ""
-          if 'Primary' in album['ImageTags']:
-            image_tag = album['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-          else:
-            logger.error(album)
-          for artist in album['AlbumArtists']:
-            if artist['Name'] not in artist_names:
-              res_artists.append(ARef(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork ))
-              artist_names.append( artist['Name'] )
+        with metrics.timer('emby_processing_seconds', function='get_artists'):
+          for album in albums:
+            artwork = self.artwork.template(album)
+            for artist in album['AlbumArtists']:
+              if artist['Name'] not in artist_names:
+                res_artists.append(ARef(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork ))
+                artist_names.append( artist['Name'] )
 
         return res_artists
 
 
     def get_albums_list(self):
-       music_root = self.get_music_root()
-       albums = self.get_item_type(music_root,'MusicAlbum')['Items']
+       albums = self.get_music_albums()
        return [
           album['Name']
           for album in albums
@@ -223,8 +676,11 @@ class EmbyHandler(object):
        ]
 
     def get_artists_list(self):
-       music_root = self.get_music_root()
-       artists = self.get_directory(music_root)['Items']
+       artists = [
+          artist
+          for music_root in self.get_music_roots()
+          for artist in self.get_directory(music_root)['Items']
+       ]
        return [
           artist['Name']
           for artist in artists
@@ -232,101 +688,132 @@ class EmbyHandler(object):
        ]
 
     def get_albums(self, artist_id):
-        music_root = self.get_music_root()
-        albums = self.get_item_type(music_root,'MusicAlbum')['Items']
+        albums = self.get_music_albums()
         res_albums = []
-        for album in albums:
-          artists = []
-          skip = True
-          for artist in album['ArtistItems']:
-              if artist['Id'] == artist_id:
-                 skip = False
-                 break
-          if skip:
-            continue
-          artwork = ""
-          if 'Primary' not in album['ImageTags']:
-            if 'ParentBackdropImageTags' in album:
-               artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'][0])
-          else:
-            image_tag = album['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-
-          res_albums.append(ARef(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artwork=artwork ))
+        with metrics.timer('emby_processing_seconds', function='get_albums'):
+          for album in albums:
+            skip = True
+            for artist in album['ArtistItems']:
+                if artist['Id'] == artist_id:
+                   skip = False
+                   break
+            if skip:
+              continue
+            artwork = self.artwork.template(album)
+
+            res_albums.append(ARef(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artwork=artwork ))
         return res_albums
 
-
-        albums = sorted(
-            self.get_directory(artist_id)['Items'],
-            key=lambda k: k['Name']
-        )
-        return [
-            models.Ref.album(
-                uri='emby:album:{}'.format(i['Id']),
-                name=i['Name']
-            )
-            for i in albums
-            if i
-        ]
-
     def list_albums(self):
-        music_root = self.get_music_root()
-        albums = sorted(
-            self.get_item_type(music_root,'MusicAlbum')['Items'],
-            key=lambda k: k['Name']
-        )
+        albums = self.get_music_albums()
         res_albums  = []
-        for album in albums:
-          artists = []
-          artwork = ""
-          if 'Primary' not in album['ImageTags']:
-            if 'ParentBackdropImageTags' in album:
-               artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'][0])
-          else:
-            image_tag = album['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-          for artist in album['AlbumArtists']:
-            artists.append(models.Artist(uri="emby:artist:{}".format(artist['Id']),name=artist['Name']))
-          res_albums.append(AAlbum(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artists=artists,artwork=artwork ))
+        with metrics.timer('emby_processing_seconds', function='list_albums'):
+          for album in albums:
+            artwork = self.artwork.template(album)
+            artists = self._intern_artists(album['AlbumArtists'])
+            res_albums.append(AAlbum(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artists=artists,artwork=artwork ))
         return res_albums
 
     def list_artists(self):
-        music_root = self.get_music_root()
-        albums = sorted(
-            self.get_item_type(music_root,'MusicAlbum')['Items'],
-            key=lambda k: k['Name']
-        )
+        albums = self.get_music_albums()
         res_artists  = []
-        for album in albums:
-          artists = []
-          artwork = ""
-          if 'Primary' in album['ImageTags']:
-            image_tag = album['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-          else:
-            logger.error(album)
-          for artist in album['AlbumArtists']:
-            found = False
-            for artist_e in res_artists:
-              if artist_e.name == artist['Name']:
-                found = True
-                break
-            if not found:
-              res_artists.append(AArtist(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork ))
+        with metrics.timer('emby_processing_seconds', function='list_artists'):
+          for album in albums:
+            artwork = self.artwork.template(album)
+            for artist in album['AlbumArtists']:
+              found = False
+              for artist_e in res_artists:
+                if artist_e.name == artist['Name']:
+                  found = True
+                  break
+              if not found:
+                res_artists.append(AArtist(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork ))
 
         return res_artists
 
     def get_tracks(self, album_id):
-        tracks = sorted(
-            self.get_directory(album_id)['Items'],
-            key=lambda k: k['IndexNumber']
-        )
+        tracks = self.get_directory(album_id)['Items']
         res_tracks = []
-        for track in tracks:
-          res_tracks.append(self.create_track_ref(track) )
+        with metrics.timer('emby_processing_seconds', function='get_tracks'):
+          for track in tracks:
+            res_tracks.append(self.create_track_ref(track) )
         return res_tracks
 
-    @cache()
+    # entries per shelf, shelves are cached shortly as plays change them
+    shelf_size = 50
+    shelf_cache_ttl = 300
+
+    @cache(ctl=float('inf'), ttl=shelf_cache_ttl, stale=stale_cache_ttl)
+    def get_latest_albums(self):
+        """Get the most recently added albums.
+
+        :returns: Albums from Emby API, newest first
+        :rtype: list of dict
+        """
+        albums = []
+        for music_root in self.get_music_roots():
+            items = self.r_get(
+                self.api_url(
+                    '/Users/{}/Items/Latest'.format(self.user_id),
+                    query.LATEST.params(ParentId=music_root,
+                                        GroupItems='true',
+                                        Limit=self.shelf_size)
+                )
+            )
+            albums.extend(i for i in items if i.get('Type') == 'MusicAlbum')
+
+        albums.sort(key=lambda album: album.get('DateCreated') or '',
+                    reverse=True)
+
+        return albums[:self.shelf_size]
+
+    @cache(ctl=float('inf'), ttl=shelf_cache_ttl, stale=stale_cache_ttl)
+    def get_most_played_tracks(self):
+        """Get the most often played tracks.
+
+        :returns: Tracks from Emby API, most played first
+        :rtype: list of dict
+        """
+        tracks = []
+        for music_root in self.get_music_roots():
+            tracks.extend(self.r_get(
+                self.api_url(
+                    '/Users/{}/Items'.format(self.user_id),
+                    query.MOST_PLAYED.params(ParentId=music_root,
+                                             Filters='IsPlayed',
+                                             Limit=self.shelf_size)
+                )
+            )['Items'])
+
+        def most_played(track):
+            play_count = (track.get('UserData') or {}).get('PlayCount', 0)
+            return -play_count, track.get('SortName') or track['Name'].lower()
+
+        tracks.sort(key=most_played)
+
+        return tracks[:self.shelf_size]
+
+    def get_latest(self):
+        """Returns refs of the most recently added albums.
+
+        :rtype: list of mopidy.models.Ref
+        """
+        return [
+            self.create_album_ref(album)
+            for album in self.get_latest_albums()
+        ]
+
+    def get_most_played(self):
+        """Returns refs of the most often played tracks.
+
+        :rtype: list of mopidy.models.Ref
+        """
+        return [
+            self.create_track_ref(track)
+            for track in self.get_most_played_tracks()
+        ]
+
+    @cache(stale=stale_cache_ttl)
     def get_directory(self, id):
         """Get directory from Emby API.
 
@@ -337,14 +824,28 @@ class EmbyHandler(object):
         """
         return self.r_get(
             self.api_url(
-                '/Users/{}/Items?ParentId={}&SortOrder=Ascending'.format(
-                    self.user_id,
-                    id
-                )
+                '/Users/{}/Items'.format(self.user_id),
+                query.CHILDREN.params(ParentId=id)
             )
         )
 
-    @cache()
+    @cache(stale=stale_cache_ttl)
+    def get_album_items(self, album_id):
+        """Get the tracks of an album with all fields of a track.
+
+        :param album_id: Album ID
+        :type album_id: str
+        :returns: Directory
+        :rtype: dict
+        """
+        return self.r_get(
+            self.api_url(
+                '/Users/{}/Items'.format(self.user_id),
+                query.ALBUM_TRACKS.params(ParentId=album_id)
+            )
+        )
+
+    @cache(stale=stale_cache_ttl)
     def get_item_type(self, parent_id, t):
         """Get directory from Emby API.
 
@@ -353,15 +854,35 @@ class EmbyHandler(object):
         :returns Directory
         :rtype: dict
         """
-        return self.r_get(
-            self.api_url(
-                '/Users/{}/Items?Recursive=true&SortOrder=Ascending&ParentId={}&IncludeItemTypes={}'.format(
-                    self.user_id,
-                    parent_id,
-                    t
+        if not self.item_page_size:
+            return self.r_get(
+                self.api_url(
+                    '/Users/{}/Items'.format(self.user_id),
+                    query.ITEM_TYPE.params(
+                        ParentId=parent_id, IncludeItemTypes=t)
                 )
             )
-        )
+
+        # one page at a time, so a large response never is in memory at once
+        items = []
+        while True:
+            page = self.r_get(
+                self.api_url(
+                    '/Users/{}/Items'.format(self.user_id),
+                    query.ITEM_TYPE.params(
+                        ParentId=parent_id,
+                        IncludeItemTypes=t,
+                        StartIndex=len(items),
+                        Limit=self.item_page_size
+                    )
+                )
+            )
+            page_items = page.get('Items') or []
+            items.extend(page_items)
+
+            total = page.get('TotalRecordCount', 0)
+            if not page_items or len(items) >= total:
+                return {'Items': items, 'TotalRecordCount': total}
 
     @cache()
     def get_item(self, id):
@@ -382,6 +903,162 @@ class EmbyHandler(object):
 
         return data
 
+    # cached methods that hold library data
+    cached = ('get_directory', 'get_album_items', 'get_item_type',
+              'get_item', 'get_track', 'get_playlists', 'get_playlist_page',
+              'get_music_roots')
+
+    # cached methods that keep their short lifetime while connected
+    shelves = ('get_latest_albums', 'get_most_played_tracks')
+
+    def _caches(self):
+        return [getattr(EmbyHandler, name).cache for name in self.cached]
+
+    # IDs per request, to keep urls short
+    ids_per_request = 100
+
+    def _get_by_ids(self, item_query, item_ids):
+        """Get items by ID, with concurrent requests for long ID lists.
+        """
+        urls = [
+            self.api_url(
+                '/Users/{}/Items'.format(self.user_id),
+                item_query.params(Ids=','.join(
+                    item_ids[i:i + self.ids_per_request]))
+            )
+            for i in range(0, len(item_ids), self.ids_per_request)
+        ]
+
+        if len(urls) == 1:
+            return self.r_get(urls[0])['Items']
+
+        return [item for page in self.r_get_many(urls)
+                for item in page['Items']]
+
+    def get_items(self, item_ids):
+        """Get several items with as few requests as possible.
+
+        :param item_ids: Item IDs
+        :type item_ids: list
+        :returns: Items
+        :rtype: list of dict
+        """
+        if not item_ids:
+            return []
+
+        return self._get_by_ids(query.ITEMS, list(item_ids))
+
+    def clear_caches(self):
+        """Drops all cached library data of this handler.
+        """
+        for name in self.cached + self.shelves:
+            cached = getattr(EmbyHandler, name).cache
+            for args, _ in cached.entries():
+                if args[0] is self:
+                    cached.invalidate(*args)
+
+        self.interner.clear()
+
+    def invalidate_items(self, item_ids):
+        """Drops cached data of single items.
+
+        :param item_ids: Item IDs
+        :type item_ids: list
+        """
+        for item_id in item_ids:
+            for cached in self._caches():
+                cached.invalidate(self, item_id)
+
+    def apply_library_changes(self, added, updated, removed):
+        """Updates the caches after the library changed on the server.
+
+        Cached single items and directory listings containing changed
+        items are dropped. Cached item type listings are patched in place
+        with the current data of the changed items.
+
+        :param added: IDs of added items
+        :param updated: IDs of updated items
+        :param removed: IDs of removed items
+        :type added: list
+        :type updated: list
+        :type removed: list
+        """
+        changed = set(added) | set(updated) | set(removed)
+        if not changed:
+            return
+
+        logger.debug(
+            'Emby library changed: {} added, {} updated, {} removed'.format(
+                len(added), len(updated), len(removed)
+            )
+        )
+
+        self.invalidate_items(changed)
+        items = self.get_items(list(added) + list(updated))
+        parents = set(item.get('ParentId') for item in items)
+
+        # playlist changes come in as updates of the playlist item
+        self.invalidate_playlists(changed)
+
+        if added:
+            EmbyHandler.get_latest_albums.cache.invalidate(self)
+
+        for name in ('get_directory', 'get_album_items'):
+            directory = getattr(EmbyHandler, name).cache
+            for args, value in directory.entries():
+                if args[0] is not self:
+                    continue
+
+                if args[1] in parents or any(
+                        i['Id'] in changed for i in value['Items']):
+                    directory.invalidate(*args)
+
+        get_item_type = EmbyHandler.get_item_type.cache
+        for args, value in get_item_type.entries():
+            if args[0] is not self:
+                continue
+
+            patched = [i for i in value['Items'] if i['Id'] not in changed]
+            for item in items:
+                if item.get('Type') == args[2]:
+                    self._insert_sorted(patched, item)
+            get_item_type.patch(args, dict(
+                value, Items=patched, TotalRecordCount=len(patched)
+            ))
+
+    @staticmethod
+    def _insert_sorted(items, item):
+        """Inserts an item into a list sorted by ``SortName``.
+        """
+        def sort_name(i):
+            return i.get('SortName') or i['Name'].lower()
+
+        key = sort_name(item)
+        for index, other in enumerate(items):
+            if sort_name(other) > key:
+                items.insert(index, item)
+                return
+
+        items.append(item)
+
+    def events_connected(self):
+        """Keeps cached data for long, the websocket reports changes.
+
+        Changes that happened while there was no connection are unknown,
+        so all cached data is dropped.
+        """
+        self.clear_caches()
+        for cached in self._caches():
+            cached.lifetimes[self] = (float('inf'), self.event_cache_ttl)
+
+    def events_disconnected(self):
+        """Falls back to the default cache lifetime.
+        """
+        for cached in self._caches():
+            cached.lifetimes.pop(self, None)
+
+    @metrics.timed('emby_processing_seconds')
+    @profiler.phased('model')
     def create_track(self, track):
         """Create track from Emby API track dict.
 
@@ -390,17 +1067,10 @@ class EmbyHandler(object):
         :returns: Track
         :rtype: mopidy.models.Track
         """
-        # TODO: add more metadata
-        artwork = ""
-        if 'Primary' not in track['ImageTags']:
-          if 'AlbumPrimaryImageTag' in track:
-            if track['AlbumPrimaryImageTag'] != '':
-                artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['AlbumId'],track['AlbumPrimaryImageTag'])
-          if 'ParentBackdropImageTags' in track:
-               artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['ParentBackdropItemId'],track['ParentBackdropImageTags'][0])
-        else:
-            image_tag = track['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['Id'],image_tag)
+        artwork = self.artwork.template(track)
+        provider_ids = track.get('ProviderIds') or {}
+        artists = self.create_artists(track)
+        genres = track.get('Genres')
 
         return ATrack(
             uri='emby:track:{}'.format(
@@ -408,13 +1078,22 @@ class EmbyHandler(object):
             ),
             name=track.get('Name'),
             track_no=track.get('IndexNumber'),
-            genre=track.get('Genre'),
-            artists=self.create_artists(track),
+            disc_no=track.get('ParentIndexNumber'),
+            date=self.release_date(track),
+            genre=genres[0] if genres else track.get('Genre'),
+            artists=artists,
             album=self.create_album(track),
+            composers=self.create_composers(track),
+            bitrate=self.bitrate(track),
+            last_modified=self.timestamp(
+                track.get('DateModified') or track.get('DateCreated')
+            ),
+            musicbrainz_id=provider_ids.get('MusicBrainzTrack'),
             artwork=artwork,
             length=int(self.ticks_to_milliseconds(track['RunTimeTicks']))
         )
 
+    @profiler.phased('model')
     def create_track_ref(self, track):
         """Create track from Emby API track dict.
 
@@ -424,16 +1103,7 @@ class EmbyHandler(object):
         :rtype: mopidy.models.Track
         """
         # TODO: add more metadata
-        artwork = ""
-        if 'Primary' not in track['ImageTags']:
-          if 'AlbumPrimaryImageTag' in track:
-            if track['AlbumPrimaryImageTag'] != '':
-                artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['AlbumId'],track['AlbumPrimaryImageTag'])
-          if 'ParentBackdropImageTags' in track:
-               artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['ParentBackdropItemId'],track['ParentBackdropImageTags'][0])
-        else:
-            image_tag = track['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,track['Id'],image_tag)
+        artwork = self.artwork.template(track)
 
         return ARef(
             uri='emby:track:{}'.format(
@@ -444,60 +1114,144 @@ class EmbyHandler(object):
             artwork=artwork
         )
 
+    def create_album_ref(self, album):
+        """Create album ref from Emby API album dict.
+
+        :param album: Album from Emby API
+        :type album: dict
+        :returns: Ref
+        :rtype: mopidy.models.Ref
+        """
+        return ARef(
+            uri='emby:album:{}'.format(album['Id']),
+            type=ARef.ALBUM,
+            name=album.get('Name'),
+            artwork=self.artwork.template(album)
+        )
+
+    def find_album(self, album_id):
+        """Returns the album dict for an album ID or None.
+
+        :param album_id: Album ID
+        :type album_id: str
+        :returns: Album from Emby API
+        :rtype: dict
+        """
+        albums = self.get_music_albums()
+        with metrics.timer('emby_processing_seconds', function='find_album'):
+            for album in albums:
+                if album['Id'] == album_id:
+                    return album
+
+        return None
+
+    def find_artist_album(self, artist_id):
+        """Returns the first album dict of an album artist or None.
+
+        :param artist_id: Artist ID
+        :type artist_id: str
+        :returns: Album from Emby API
+        :rtype: dict
+        """
+        albums = self.get_music_albums()
+        with metrics.timer('emby_processing_seconds',
+                           function='find_artist_album'):
+            for album in albums:
+                for artist in album['AlbumArtists']:
+                    if artist['Id'] == artist_id:
+                        return album
+
+        return None
+
+    def get_images(self, kind, item_id):
+        """Returns the artwork of a track, album or artist in all sizes.
+
+        :param kind: One of ``track``, ``album`` or ``artist``
+        :param item_id: Item ID
+        :type kind: str
+        :type item_id: str
+        :returns: Images
+        :rtype: list of mopidy.models.Image
+        """
+        if kind == 'track':
+            item = self.get_item(item_id)
+        elif kind == 'album':
+            item = self.find_album(item_id)
+        elif kind == 'artist':
+            item = self.find_artist_album(item_id)
+        else:
+            item = None
+
+        if not item:
+            return []
+
+        return self.artwork.images(item)
+
+    def get_images_many(self, kind, item_ids):
+        """Returns the artwork of many tracks, albums or artists.
+
+        Tracks are fetched together, albums and artists are looked up in
+        the album list once.
+
+        :param kind: One of ``track``, ``album`` or ``artist``
+        :param item_ids: Item IDs
+        :type kind: str
+        :type item_ids: list
+        :returns: Images per ID, in the order of the IDs
+        :rtype: list of lists of mopidy.models.Image
+        """
+        if kind == 'track':
+            items = {i['Id']: i for i in self.get_items(item_ids)}
+        elif kind == 'album':
+            items = {a['Id']: a for a in self.get_music_albums()}
+        elif kind == 'artist':
+            items = {}
+            for album in self.get_music_albums():
+                for artist in album['AlbumArtists']:
+                    items.setdefault(artist['Id'], album)
+        else:
+            items = {}
+
+        return [
+            self.artwork.images(items[item_id]) if item_id in items else []
+            for item_id in item_ids
+        ]
+
     def create_album_id(self, album_id):
-          music_root = self.get_music_root()
-          albums = self.get_item_type(music_root,'MusicAlbum')['Items']
-          for album in albums:
-            if album['Id'] == album_id:
-              if 'Primary' not in album['ImageTags']:
-                if 'ParentBackdropImageTags' in album:
-                   artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'])
-              else:
-                image_tag = album['ImageTags']['Primary']
-                artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-              artists = []
-              for artist in album['AlbumArtists']:
-                artists.append(models.Artist(uri="emby:artist:{}".format(artist['Id']),name=artist['Name']))
+          album = self.find_album(album_id)
+          if album:
+              artwork = self.artwork.template(album)
+              artists = self._intern_artists(album['AlbumArtists'])
               return AAlbum(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artists=artists,artwork=artwork )
           return None
 
     def create_artist_id(self, artist_id):
-        music_root = self.get_music_root()
-        albums = self.get_item_type(music_root,'MusicAlbum')['Items']
+        album = self.find_artist_album(artist_id)
         res_artist = None
-        for album in albums:
+        if album:
           for artist in album['AlbumArtists']:
             if artist["Id"] == artist_id:
-              artwork = ""
-              if 'Primary' not in album['ImageTags']:
-                if 'ParentBackdropImageTags' in album:
-                   artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'])
-              else:
-                image_tag = album['ImageTags']['Primary']
-                artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
+              artwork = self.artwork.template(album)
               res_artist = AArtist(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork )
         return res_artist
 
     def create_artist_name(self, artist_name):
-        music_root = self.get_music_root()
-        albums = self.get_item_type(music_root,'MusicAlbum')['Items']
+        albums = self.get_music_albums()
         res_artist = None
         res_albums = []
-        for album in albums:
-          for artist in album['AlbumArtists']:
-            if artist["Name"] == artist_name:
-              if 'Primary' not in album['ImageTags']:
-                if 'ParentBackdropImageTags' in album:
-                   artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'])
-              else:
-                image_tag = album['ImageTags']['Primary']
-                artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-              res_albums.append(AAlbum(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artwork = artwork))
-              if res_artist == None:
-                res_artist = AArtist(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork )
+        with metrics.timer('emby_processing_seconds',
+                           function='create_artist_name'):
+          for album in albums:
+            for artist in album['AlbumArtists']:
+              if artist["Name"] == artist_name:
+                artwork = self.artwork.template(album)
+                res_albums.append(AAlbum(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artwork = artwork))
+                if res_artist == None:
+                  res_artist = AArtist(uri='emby:artist:{}'.format(artist['Id']), name=artist['Name'], artwork=artwork )
         return res_artist, res_albums
 
 
+    @profiler.phased('model')
     def create_album(self, track):
         """Create album object from track.
 
@@ -506,11 +1260,25 @@ class EmbyHandler(object):
         :returns: Album
         :rtype: mopidy.models.Album
         """
-        return models.Album(
-            name=track.get('Album'),
-            artists=self.create_artists(track)
+        provider_ids = track.get('ProviderIds') or {}
+        album_artists = track.get('AlbumArtists')
+
+        if album_artists:
+            artists = self._intern_artists(
+                album_artists, provider_ids.get('MusicBrainzAlbumArtist')
+            )
+        else:
+            artists = self.create_artists(track)
+
+        return self.interner.album(
+            track.get('AlbumId'),
+            track.get('Album'),
+            artists,
+            date=self.release_date(track),
+            musicbrainz_id=provider_ids.get('MusicBrainzAlbum')
         )
 
+    @profiler.phased('model')
     def create_artists(self, track):
         """Create artist object from track.
 
@@ -519,12 +1287,38 @@ class EmbyHandler(object):
         :returns: List of artists
         :rtype: list of mopidy.models.Artist
         """
-        
+        provider_ids = track.get('ProviderIds') or {}
+
+        return self._intern_artists(
+            track['ArtistItems'], provider_ids.get('MusicBrainzArtist')
+        )
+
+    def create_composers(self, track):
+        """Create composer objects from track.
+
+        Newer servers list them in ``Composers``, older ones as people of
+        type ``Composer``.
+
+        :param track: Track
+        :type track: dict
+        :returns: List of composers
+        :rtype: list of mopidy.models.Artist
+        """
+        composers = track.get('Composers') or [
+            person for person in track.get('People') or []
+            if person.get('Type') == 'Composer'
+        ]
+
+        return self._intern_artists(composers)
+
+    def _intern_artists(self, items, musicbrainz_id=None):
+        # a single MusicBrainz ID can only be matched to a single artist
+        if len(items) != 1:
+            musicbrainz_id = None
+
         return [
-            models.Artist(
-                name=artist['Name']
-            )
-            for artist in track['ArtistItems']
+            self.interner.artist(item.get('Id'), item['Name'], musicbrainz_id)
+            for item in items
         ]
 
     @cache()
@@ -540,6 +1334,201 @@ class EmbyHandler(object):
 
         return self.create_track(track)
 
+    def get_tracks_by_ids(self, track_ids):
+        """Get several tracks with as few requests as possible.
+
+        :param track_ids: IDs of Emby tracks
+        :type track_ids: list
+        :returns: tracks in the order of the IDs
+        :rtype: list of mopidy.models.Track
+        """
+        if not track_ids:
+            return []
+
+        items = {
+            item['Id']: item
+            for item in self._get_by_ids(query.TRACKS, list(track_ids))
+        }
+
+        return [
+            self.create_track(items[track_id])
+            for track_id in track_ids if track_id in items
+        ]
+
+    def get_album_tracks(self, album_id):
+        """Get the tracks of an album in disc and track order.
+
+        :param album_id: Album ID
+        :type album_id: str
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        return [
+            self.create_track(item)
+            for item in self.get_album_items(album_id)['Items']
+        ]
+
+    def get_instant_mix(self, item_id, limit):
+        """Get tracks similar to an item.
+
+        :param item_id: ID of a track, album or artist
+        :param limit: Maximum number of tracks
+        :type item_id: str
+        :type limit: int
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        items = self.r_get(
+            self.api_url(
+                '/Items/{}/InstantMix'.format(item_id),
+                query.MIX.params(UserId=self.user_id, Limit=limit)
+            )
+        )['Items']
+
+        return [
+            self.create_track(item)
+            for item in items if item.get('Type') == 'Audio'
+        ]
+
+    def get_random_tracks(self, limit):
+        """Get random tracks, up to ``limit`` of every music library.
+
+        :param limit: Maximum number of tracks per library
+        :type limit: int
+        :returns: tracks
+        :rtype: list of mopidy.models.Track
+        """
+        return [
+            self.create_track(item)
+            for music_root in self.get_music_roots()
+            for item in self.r_get(
+                self.api_url(
+                    '/Users/{}/Items'.format(self.user_id),
+                    query.RANDOM_TRACKS.params(ParentId=music_root,
+                                               Limit=limit)
+                )
+            )['Items']
+        ]
+
+    # tracks per library export request
+    export_page_size = 1000
+
+    def iter_all_tracks(self):
+        """Yields every track of the music libraries, a page at a time.
+
+        Nothing is cached, only one page is held at once.
+
+        :returns: tracks
+        :rtype: generator of mopidy.models.Track
+        """
+        for music_root in self.get_music_roots():
+            start = 0
+
+            while True:
+                page = self.r_get(
+                    self.api_url(
+                        '/Users/{}/Items'.format(self.user_id),
+                        query.ALL_TRACKS.params(
+                            ParentId=music_root,
+                            StartIndex=start,
+                            Limit=self.export_page_size
+                        )
+                    )
+                )
+                items = page.get('Items') or []
+
+                for item in items:
+                    yield self.create_track(item)
+
+                start += len(items)
+                if not items or start >= page.get('TotalRecordCount', 0):
+                    break
+
+    # entries per playlist request
+    playlist_page_size = 500
+
+    @cache()
+    def get_playlists(self):
+        """Get the playlists of the user.
+
+        :returns: Playlists from Emby API
+        :rtype: list of dict
+        """
+        return self.r_get(
+            self.api_url(
+                '/Users/{}/Items'.format(self.user_id),
+                query.PLAYLISTS.params()
+            )
+        )['Items']
+
+    def get_playlist(self, playlist_id):
+        """Returns the playlist dict for a playlist ID or None.
+
+        :param playlist_id: Playlist ID
+        :type playlist_id: str
+        :returns: Playlist from Emby API
+        :rtype: dict
+        """
+        for playlist in self.get_playlists():
+            if playlist['Id'] == playlist_id:
+                return playlist
+
+    @cache()
+    def get_playlist_page(self, playlist_id, start):
+        """Get one page of playlist entries.
+
+        :param playlist_id: Playlist ID
+        :param start: Index of the first entry
+        :type playlist_id: str
+        :type start: int
+        :returns: Page with ``Items`` and ``TotalRecordCount``
+        :rtype: dict
+        """
+        return self.r_get(
+            self.api_url(
+                '/Playlists/{}/Items'.format(playlist_id),
+                query.PLAYLIST_ITEMS.params(
+                    UserId=self.user_id,
+                    StartIndex=start,
+                    Limit=self.playlist_page_size
+                )
+            )
+        )
+
+    def iter_playlist_items(self, playlist_id):
+        """Yields the entries of a playlist, fetching pages as needed.
+
+        :param playlist_id: Playlist ID
+        :type playlist_id: str
+        :returns: Items from Emby API
+        :rtype: generator of dict
+        """
+        start = 0
+        while True:
+            page = self.get_playlist_page(playlist_id, start)
+            items = page['Items']
+
+            for item in items:
+                yield item
+
+            start += len(items)
+            if not items or start >= page.get('TotalRecordCount', start):
+                return
+
+    def invalidate_playlists(self, playlist_ids=None):
+        """Drops cached playlists.
+
+        :param playlist_ids: Only drop the contents of these playlists
+        :type playlist_ids: list
+        """
+        EmbyHandler.get_playlists.cache.invalidate(self)
+
+        get_playlist_page = EmbyHandler.get_playlist_page.cache
+        for args, _ in get_playlist_page.entries():
+            if args[0] is self and (
+                    playlist_ids is None or args[1] in playlist_ids):
+                get_playlist_page.invalidate(*args)
+
     def _get_search(self, itemtype, term):
         """Gets search data from Emby API.
 
@@ -570,7 +1559,7 @@ class EmbyHandler(object):
                 )
             )
         )
-        res_tracks = []
+        track_ids = []
         res_artists = []
         res_albums = []
         for result in data.get('SearchHints'):
@@ -581,10 +1570,10 @@ class EmbyHandler(object):
            if result['Type'] == 'MusicAlbum':
               res_albums.append(self.create_album_id(result['Id']))
            if result['Type'] == 'Audio':
-              res_tracks.append(self.get_track(result['Id']))
+              track_ids.append(result['Id'])
+        res_tracks = self.get_tracks_by_ids(track_ids)
         return res_tracks, res_artists, res_albums
 
-    @cache()
     def search(self, query):
         """Search Emby for a term.
 
@@ -593,7 +1582,23 @@ class EmbyHandler(object):
         :returns: Search results
         :rtype: mopidy.models.SearchResult
         """
-        logger.debug('Searching in Emby for {}'.format(query))
+        # the query is a dict, the cache needs hashable arguments
+        terms = tuple(sorted(
+            (itemtype, tuple(values)) for itemtype, values in query.items()
+        ))
+
+        return self.get_search_results(terms)
+
+    @cache(stale=stale_cache_ttl)
+    def get_search_results(self, terms):
+        """Search Emby for the terms of a normalized query.
+
+        :param terms: ``(itemtype, terms)`` pairs sorted by itemtype
+        :type terms: tuple
+        :returns: Search results
+        :rtype: mopidy.models.SearchResult
+        """
+        logger.debug('Searching in Emby for {}'.format(terms))
 
         # something to store the results in
         data = []
@@ -601,7 +1606,7 @@ class EmbyHandler(object):
         albums = []
         artists = []
 
-        for itemtype, term in query.items():
+        for itemtype, term in terms:
 
             for item in term:
                 ntracks,nartists,nalbums = self._get_search(itemtype, item)
@@ -624,31 +1629,78 @@ class EmbyHandler(object):
         :returns: List of tracks
         :rtype: list
         """
-        music_root = self.get_music_root()
-        albums = self.get_item_type(music_root,'MusicAlbum')['Items']
+        albums = self.get_music_albums()
         res_albums = []
-        for album in albums:
-          artists = []
-          skip = True
-          for artist in album['ArtistItems']:
-              if artist['Id'] == artist_id:
-                 skip = False
-                 break
-          if skip:
-            continue
-          artwork = ""
-          if 'Primary' not in album['ImageTags']:
-            if 'ParentBackdropImageTags' in album:
-               artwork = "{}:{}/emby/Items/{}/Images/Backdrop?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['ParentBackdropItemId'],album['ParentBackdropImageTags'][0])
-          else:
-            image_tag = album['ImageTags']['Primary']
-            artwork = "{}:{}/emby/Items/{}/Images/Primary?maxHeight=%1&maxWidth=%2&tag={}".format(self.hostname,self.port,album['Id'],image_tag)
-          for artist in album['AlbumArtists']:
-            artists.append(models.Artist(uri="emby:artist:{}".format(artist['Id']),name=artist['Name']))
-          res_albums.append(ATrack(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artists=artists,artwork=artwork ))
+        with metrics.timer('emby_processing_seconds',
+                           function='lookup_artist'):
+          for album in albums:
+            skip = True
+            for artist in album['ArtistItems']:
+                if artist['Id'] == artist_id:
+                   skip = False
+                   break
+            if skip:
+              continue
+            artwork = self.artwork.template(album)
+            artists = self._intern_artists(album['AlbumArtists'])
+            res_albums.append(ATrack(uri='emby:album:{}'.format(album['Id']), name=album['Name'], artists=artists,artwork=artwork ))
         return res_albums
 
 
+    @staticmethod
+    def release_date(item):
+        """Returns the release date of an item in Mopidy's format.
+
+        :param item: Item from Emby API
+        :type item: dict
+        :returns: ``YYYY-MM-DD``, ``YYYY`` or None
+        :rtype: str
+        """
+        if item.get('PremiereDate'):
+            return item['PremiereDate'][:10]
+
+        if item.get('ProductionYear'):
+            return '{:04d}'.format(item['ProductionYear'])
+
+    @staticmethod
+    def bitrate(item):
+        """Returns the bitrate of an item in kbit/s.
+
+        The audio stream is asked first, the container bitrate also
+        counts embedded cover art.
+
+        :param item: Item from Emby API
+        :type item: dict
+        :returns: Bitrate or None
+        :rtype: int
+        """
+        for source in item.get('MediaSources') or []:
+            for stream in source.get('MediaStreams') or []:
+                if stream.get('Type') == 'Audio' and stream.get('BitRate'):
+                    return stream['BitRate'] // 1000
+
+            if source.get('Bitrate'):
+                return source['Bitrate'] // 1000
+
+    @staticmethod
+    def timestamp(value):
+        """Converts an Emby date to milliseconds since the epoch.
+
+        :param value: Date like ``2016-11-25T11:09:03.0000000Z``
+        :type value: str
+        :returns: Milliseconds or None
+        :rtype: int
+        """
+        if not value:
+            return None
+
+        try:
+            date = datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            return None
+
+        return calendar.timegm(date.timetuple()) * 1000
+
     @staticmethod
     def ticks_to_milliseconds(ticks):
         """Converts Emby track length ticks to milliseconds.
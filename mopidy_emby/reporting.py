@@ -0,0 +1,229 @@
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import threading
+import time
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+PLAYING = '/Sessions/Playing'
+PROGRESS = '/Sessions/Playing/Progress'
+STOPPED = '/Sessions/Playing/Stopped'
+
+
+def ticks(position):
+    """Converts a position in milliseconds to Emby ticks.
+    """
+    return int(position) * 10000
+
+
+class PlaybackReporter(object):
+    """Reports playback to Emby from its own thread.
+
+    Playback events only update some state under a lock and return, so
+    nothing waits on the network. Every ``interval`` seconds the pending
+    start and stop reports are sent in order, followed by a single progress
+    report with the extrapolated position of the current track. Progress is
+    never queued, a newer one just replaces it.
+
+    Start and stop reports that cant be delivered are written to ``path``
+    and sent again with the next batch, also after a restart. At most
+    ``max_queued`` of them are kept.
+    """
+
+    interval = 10
+    max_queued = 500
+
+    def __init__(self, remote, path):
+        self.remote = remote
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._progress = None
+        self._current = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self._queue = [tuple(i) for i in json.load(f)]
+        except (IOError, ValueError):
+            return
+
+        logger.debug(
+            'Emby {} playback reports left from last run'.format(
+                len(self._queue)
+            )
+        )
+
+    def _save(self):
+        with self._lock:
+            queue = list(self._queue)
+
+        if not queue:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(queue, f)
+        os.rename(self.path + '.tmp', self.path)
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name='EmbyPlaybackReporter'
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the reporter thread after a last try to send everything.
+        """
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def _position(self):
+        """Returns the current position in milliseconds.
+        """
+        current = self._current
+        if current['since'] is None:
+            return current['position']
+
+        return current['position'] + (time.time() - current['since']) * 1000
+
+    def _set_current(self, item_id, position, paused):
+        self._current = {
+            'item_id': item_id,
+            'position': position,
+            'since': None if paused else time.time(),
+        }
+
+    def _info(self, event_name=None):
+        info = {
+            'ItemId': self._current['item_id'],
+            'PositionTicks': ticks(self._position()),
+            'IsPaused': self._current['since'] is None,
+            'CanSeek': True,
+            'PlayMethod': 'DirectStream',
+        }
+
+        if event_name:
+            info['EventName'] = event_name
+
+        return info
+
+    def started(self, item_id, position=0):
+        with self._lock:
+            self._set_current(item_id, position, paused=False)
+            self._queue.append((PLAYING, self._info()))
+            self._progress = None
+
+    def paused(self, item_id, position):
+        with self._lock:
+            self._set_current(item_id, position, paused=True)
+            self._progress = self._info('Pause')
+
+    def resumed(self, item_id, position):
+        with self._lock:
+            self._set_current(item_id, position, paused=False)
+            self._progress = self._info('Unpause')
+
+    def seeked(self, position):
+        with self._lock:
+            if self._current is None:
+                return
+
+            self._set_current(
+                self._current['item_id'],
+                position,
+                paused=self._current['since'] is None
+            )
+            self._progress = self._info('TimeUpdate')
+
+    def stopped(self, item_id, position):
+        with self._lock:
+            self._queue.append((STOPPED, {
+                'ItemId': item_id,
+                'PositionTicks': ticks(position),
+            }))
+            self._current = None
+            self._progress = None
+
+    def _batch(self):
+        """Takes the pending reports out of the queue.
+        """
+        with self._lock:
+            batch = self._queue
+            self._queue = []
+
+            progress = self._progress
+            if progress is None and self._current is not None:
+                progress = self._info('TimeUpdate')
+            self._progress = None
+
+        if progress is not None:
+            batch.append((PROGRESS, progress))
+
+        return batch
+
+    def flush(self):
+        """Sends all pending reports.
+
+        :returns: True if everything was delivered
+        :rtype: bool
+        """
+        batch = self._batch()
+        queued = [i for i in batch if i[0] != PROGRESS]
+        sent = 0
+
+        try:
+            for endpoint, info in batch:
+                self.remote.r_post(self.remote.api_url(endpoint), info)
+                metrics.inc('emby_playback_reports_total', endpoint=endpoint)
+                sent += 1
+
+        except Exception as e:
+            failed = [i for i in batch[sent:] if i[0] != PROGRESS]
+            logger.info(
+                'Emby cant report playback, {} reports queued: {}'.format(
+                    len(failed), e
+                )
+            )
+
+            with self._lock:
+                self._queue[:0] = failed
+                del self._queue[:-self.max_queued]
+
+            self._save()
+
+            return False
+
+        if queued:
+            self._save()
+
+        return True
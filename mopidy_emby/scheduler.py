@@ -0,0 +1,187 @@
+from __future__ import unicode_literals
+
+import asyncio
+import itertools
+import logging
+import time
+
+from collections import Counter
+
+from mopidy_emby.metrics import metrics
+from mopidy_emby.workers import BACKGROUND, INTERACTIVE, PLAYBACK
+
+
+logger = logging.getLogger(__name__)
+
+
+LANES = {
+    PLAYBACK: 'playback',
+    INTERACTIVE: 'interactive',
+    BACKGROUND: 'background',
+}
+
+
+class TokenBucket(object):
+    """Allows ``rate`` requests per second on average.
+
+    The bucket holds up to ``burst`` tokens and refills continuously, every
+    request takes one.
+
+    :param rate: Requests per second
+    :type rate: float
+    :param burst: Size of the bucket, defaults to one second worth
+    :type burst: int
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = burst or max(int(rate), 1)
+        self.tokens = float(self.burst)
+        self.clock = clock
+        self._last = clock()
+
+    def take(self):
+        """Takes a token if there is one.
+
+        :returns: 0 if a token was taken, else seconds until the next one
+        :rtype: float
+        """
+        now = self.clock()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self._last) * self.rate
+        )
+        self._last = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+
+class RequestScheduler(object):
+    """Hands out connection slots to requests by priority.
+
+    At most ``max_connections`` requests run at once, ``max_per_endpoint``
+    of them against the same endpoint, so one slow endpoint cant take all
+    slots. With a ``rate`` requests are started through a
+    :class:`TokenBucket`. Waiting requests are started in order of
+    priority and then arrival, background requests never hold the last
+    slot, so playback and browsing always get through.
+
+    Only used from the event loop of :class:`mopidy_emby.client.AsyncClient`.
+
+    :param max_connections: Requests running at once
+    :type max_connections: int
+    :param max_per_endpoint: Requests running at once per endpoint,
+        defaults to all but one slot
+    :type max_per_endpoint: int
+    :param rate: Requests per second or None for no limit
+    :type rate: float
+    :param burst: Requests above the rate at once
+    :type burst: int
+    """
+
+    def __init__(self, max_connections=4, max_per_endpoint=None, rate=None,
+                 burst=None):
+        self.max_connections = max_connections
+        self.max_per_endpoint = (
+            max_per_endpoint or max(max_connections - 1, 1)
+        )
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+        self._waiting = []
+        self._counter = itertools.count()
+        self._running = Counter()
+        self._active = 0
+        self._background = 0
+        self._timer = None
+
+    @property
+    def queue_depth(self):
+        return len(self._waiting)
+
+    def _report_depth(self):
+        depths = Counter(entry[0] for entry in self._waiting)
+        for priority, lane in LANES.items():
+            metrics.set('emby_request_queue_depth', depths[priority],
+                        lane=lane)
+
+    def _runnable(self, entry):
+        priority, _, endpoint, _, _ = entry
+
+        if self._running[endpoint] >= self.max_per_endpoint:
+            return False
+
+        return (priority < BACKGROUND or self.max_connections == 1 or
+                self._background < self.max_connections - 1)
+
+    def _dispatch(self):
+        self._waiting = [e for e in self._waiting if not e[3].cancelled()]
+
+        while self._active < self.max_connections:
+            runnable = [e for e in self._waiting if self._runnable(e)]
+            if not runnable:
+                break
+
+            if self.bucket is not None:
+                wait = self.bucket.take()
+                if wait:
+                    if self._timer is None:
+                        self._timer = asyncio.get_event_loop().call_later(
+                            wait, self._wake
+                        )
+                    break
+
+            entry = min(runnable)
+            self._waiting.remove(entry)
+            priority, _, endpoint, future, queued = entry
+
+            self._active += 1
+            self._running[endpoint] += 1
+            if priority >= BACKGROUND:
+                self._background += 1
+
+            metrics.observe('emby_request_wait_seconds',
+                            time.time() - queued, lane=LANES[priority])
+            future.set_result(None)
+
+        self._report_depth()
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, endpoint, priority=INTERACTIVE):
+        """Waits for a slot.
+
+        :param endpoint: Endpoint of the request
+        :type endpoint: str
+        :param priority: One of ``PLAYBACK``, ``INTERACTIVE`` or
+            ``BACKGROUND``
+        :type priority: int
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._waiting.append(
+            (priority, next(self._counter), endpoint, future, time.time())
+        )
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(endpoint, priority)
+            raise
+
+    def release(self, endpoint, priority=INTERACTIVE):
+        """Frees the slot of a finished request.
+        """
+        self._active -= 1
+        self._running[endpoint] -= 1
+        if not self._running[endpoint]:
+            del self._running[endpoint]
+        if priority >= BACKGROUND:
+            self._background -= 1
+
+        self._dispatch()
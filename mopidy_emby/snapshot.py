@@ -0,0 +1,186 @@
+from __future__ import unicode_literals
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+from mopidy.models import ModelJSONEncoder, model_json_decoder
+
+import mopidy_emby
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# lookup of this uri returns the whole library
+URI = 'emby:library'
+
+
+def dump_path(config):
+    """Returns the path of the dump file, None if it is disabled.
+
+    :param config: Mopidy config
+    :type config: dict
+    :rtype: str
+    """
+    if config.get('emby', {}).get('library_snapshot'):
+        return os.path.join(
+            str(mopidy_emby.Extension.get_data_dir(config)),
+            'library.jsonl.gz'
+        )
+
+
+class LibrarySnapshot(object):
+    """Exports the whole library as fully hydrated tracks.
+
+    Tracks are fetched page by page from all healthy servers and handed
+    out as they come, so the library is never held in memory as a whole.
+    With a ``path`` the export is also written to a gzipped file with one
+    JSON encoded track per line, later exports are then read from there
+    without asking the servers. Readers only ever see the last complete
+    dump. After library changes a new dump is written ``refresh_delay``
+    seconds later, together with all changes coming in meanwhile.
+
+    :param federation: Servers to export
+    :type federation: :class:`mopidy_emby.federation.Federation`
+    :param path: Dump file or None
+    :type path: str
+    """
+
+    refresh_delay = 300
+
+    def __init__(self, federation, path=None):
+        self.federation = federation
+        self.path = path
+        self._lock = threading.Lock()
+        self._timer_lock = threading.Lock()
+        self._timer = None
+
+    def tracks(self):
+        """Yields the tracks of all servers.
+
+        A server that fails is marked unhealthy and the export goes on with
+        the next one. With only one server its errors are raised.
+
+        :returns: tracks with server qualified uris
+        :rtype: generator of mopidy.models.Track
+        """
+        sources = list(self.federation.sources.values())
+
+        for source in sources:
+            if len(sources) > 1 and not source.healthy:
+                continue
+
+            try:
+                for track in source.remote.iter_all_tracks():
+                    yield self.federation.qualify(source, track)
+            except Exception as e:
+                if len(sources) == 1:
+                    raise
+
+                logger.warning(
+                    'Emby server {} failed: {}'.format(source.label, e)
+                )
+                source.failed(e)
+
+    def exists(self):
+        return bool(self.path) and os.path.isfile(self.path)
+
+    def read(self):
+        """Yields the tracks of the dump file.
+
+        :returns: tracks
+        :rtype: generator of mopidy.models.Track
+        """
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line, object_hook=model_json_decoder)
+
+    def load(self):
+        """Yields the tracks of the dump file if there is one.
+
+        :returns: tracks
+        :rtype: generator of mopidy.models.Track
+        """
+        if self.exists():
+            return self.read()
+
+        return self.tracks()
+
+    def write(self):
+        """Writes a fresh dump file.
+
+        The old dump is replaced only once the new one is complete.
+
+        :returns: Number of tracks written
+        :rtype: int
+        """
+        if not self.path:
+            return 0
+
+        with self._lock:
+            start = time.time()
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            count = 0
+            tmp_path = self.path + '.tmp'
+            try:
+                with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                    for track in self.tracks():
+                        f.write(json.dumps(track, cls=ModelJSONEncoder))
+                        f.write('\n')
+                        count += 1
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+            os.rename(tmp_path, self.path)
+
+        metrics.set('emby_snapshot_tracks', count)
+        logger.info(
+            'Emby library snapshot: {} tracks in {:.1f}s'.format(
+                count, time.time() - start
+            )
+        )
+
+        return count
+
+    def changed(self, submit):
+        """Writes a new dump a while after the library changed.
+
+        :param submit: Runs a callable as background work
+        :type submit: callable
+        """
+        if not self.path:
+            return
+
+        with self._timer_lock:
+            if self._timer is not None:
+                return
+
+            self._timer = threading.Timer(
+                self.refresh_delay, self._refresh, [submit]
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _refresh(self, submit):
+        with self._timer_lock:
+            self._timer = None
+
+        submit(self.write)
+
+    def cancel(self):
+        """Drops a pending refresh.
+        """
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
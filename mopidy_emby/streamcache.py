@@ -0,0 +1,366 @@
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+from collections import OrderedDict
+
+from pathlib import Path
+
+import mopidy_emby
+
+
+logger = logging.getLogger(__name__)
+
+
+# file names of cached tracks, item id and version
+NAME = re.compile(r'^[0-9A-Za-z]+\.[0-9a-f]+$')
+
+
+def cache_path(config):
+    """Returns the directory of the stream cache, None if it is disabled.
+
+    :param config: Mopidy config
+    :type config: dict
+    :rtype: str
+    """
+    if config.get('emby', {}).get('stream_cache'):
+        return os.path.join(
+            str(mopidy_emby.Extension.get_cache_dir(config)), 'streams'
+        )
+
+
+def local_url(config):
+    """Returns the url of the stream route of Mopidy-HTTP or None.
+
+    :param config: Mopidy config
+    :type config: dict
+    :rtype: str
+    """
+    http = config.get('http') or {}
+    if not http.get('enabled'):
+        return None
+
+    hostname = http.get('hostname')
+    if not hostname or hostname in ('::', '0.0.0.0'):
+        hostname = '127.0.0.1'
+    elif ':' in hostname:
+        hostname = '[{}]'.format(hostname)
+
+    return 'http://{}:{}/emby/stream/'.format(hostname, http.get('port'))
+
+
+class StreamCache(object):
+    """Read-through on-disk cache for fully streamed tracks.
+
+    Files are keyed by the Emby item id and a version derived from the
+    track, so a replaced file on the server is fetched again. The least
+    recently played files get evicted as soon as the cache grows over
+    ``max_size`` bytes. Pinned items are never evicted.
+
+    With a ``local_url`` a track that isnt cached yet is played along with
+    its download through the stream route of Mopidy-HTTP, see
+    :meth:`follow`, instead of being fetched twice. Only downloads the
+    server answered are followed.
+    """
+
+    chunk_size = 64 * 1024
+
+    # seconds between looks at a file that is being downloaded
+    poll_interval = 0.1
+
+    # seconds to wait for a download to start before playing from the
+    # server instead
+    start_timeout = 5
+
+    def __init__(self, path, max_size, remote, local_url=None):
+        self.path = path
+        self.max_size = max_size
+        self.remote = remote
+        self.local_url = local_url
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pinned = set()
+        # names being downloaded, their event is set once data arrives
+        self._fetching = {}
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        self._load()
+
+    @staticmethod
+    def track_version(track):
+        """Returns a short version string for a track.
+
+        A file replaced on the server changes the modification date,
+        length or bitrate of the track.
+
+        :param track: Track
+        :type track: mopidy.models.Track
+        :returns: Version
+        :rtype: str
+        """
+        tag = '{}:{}:{}'.format(
+            track.last_modified, track.length, track.bitrate
+        )
+
+        return hashlib.sha1(tag.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def _filename(item_id, version):
+        return '{}.{}'.format(item_id, version)
+
+    def _load(self):
+        """Picks up files from an earlier run, oldest first.
+        """
+        files = []
+        for name in os.listdir(self.path):
+            full_path = os.path.join(self.path, name)
+
+            if name.endswith('.part'):
+                os.remove(full_path)
+                continue
+
+            stat = os.stat(full_path)
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+        logger.debug(
+            'Emby stream cache: {} files, {} bytes'.format(
+                len(self._entries), self._size
+            )
+        )
+
+    def get(self, item_id, version):
+        """Returns a local uri for a cached track or None.
+
+        :param item_id: Emby item ID
+        :param version: Item version from :meth:`track_version`
+        :type item_id: str
+        :type version: str
+        :returns: File uri
+        :rtype: str
+        """
+        name = self._filename(item_id, version)
+        full_path = os.path.join(self.path, name)
+
+        with self._lock:
+            if name not in self._entries:
+                return None
+
+            try:
+                os.utime(full_path, None)
+            except OSError:
+                self._size -= self._entries.pop(name)
+                return None
+
+            self._entries.move_to_end(name)
+
+        return Path(full_path).as_uri()
+
+    def fetch(self, item_id, version, url):
+        """Downloads a track into the cache in the background.
+
+        :param item_id: Emby item ID
+        :param version: Item version from :meth:`track_version`
+        :param url: Streaming url
+        :type item_id: str
+        :type version: str
+        :type url: str
+        :returns: Url playing along with the download, None if there is no
+            local url or the download didnt start
+        :rtype: str
+        """
+        name = self._filename(item_id, version)
+
+        with self._lock:
+            started = self._fetching.get(name)
+            if name not in self._entries and started is None:
+                started = self._fetching[name] = threading.Event()
+
+                thread = threading.Thread(
+                    target=self._download,
+                    args=(item_id, name, url),
+                    name='EmbyStreamCache'
+                )
+                thread.daemon = True
+                thread.start()
+
+        if not self.local_url:
+            return None
+
+        if started is not None and not started.wait(self.start_timeout):
+            logger.info(
+                'Emby stream cache: download of {} didnt start'.format(
+                    item_id
+                )
+            )
+            return None
+
+        # failed downloads are neither stored nor fetching anymore
+        with self._lock:
+            if name in self._entries or name in self._fetching:
+                return self.local_url + name
+
+    @classmethod
+    def follow(cls, path, name, timeout=30):
+        """Yields the chunks of a cached file, also while it is downloaded.
+
+        Ends once the download is complete. Ends early if it fails or
+        nothing arrives for ``timeout`` seconds.
+
+        :param path: Directory of the cache
+        :param name: File name from :meth:`fetch`
+        :param timeout: Seconds to wait for data
+        :type path: str
+        :type name: str
+        :type timeout: float
+        :rtype: generator of bytes
+        """
+        if not NAME.match(name):
+            return
+
+        full_path = os.path.join(path, name)
+        part_path = full_path + '.part'
+        f = None
+        waited = 0
+
+        while f is None:
+            for candidate in (full_path, part_path):
+                try:
+                    f = open(candidate, 'rb')
+                    break
+                except (IOError, OSError):
+                    pass
+            else:
+                if waited >= timeout:
+                    return
+                time.sleep(cls.poll_interval)
+                waited += cls.poll_interval
+
+        with f:
+            waited = 0
+            while True:
+                chunk = f.read(cls.chunk_size)
+                if chunk:
+                    waited = 0
+                    yield chunk
+                    continue
+
+                # the part file is renamed when complete, removed on errors
+                if not os.path.exists(part_path):
+                    chunk = f.read()
+                    if chunk:
+                        yield chunk
+                    return
+
+                if waited >= timeout:
+                    return
+                time.sleep(cls.poll_interval)
+                waited += cls.poll_interval
+
+    def _download(self, item_id, name, url):
+        full_path = os.path.join(self.path, name)
+        part_path = full_path + '.part'
+        size = 0
+
+        try:
+            r = self.remote.r_stream(url)
+            r.raise_for_status()
+
+            with open(part_path, 'wb') as f:
+                self._started(name)
+                for chunk in r.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    # visible at once to a player following the download
+                    f.flush()
+                    size += len(chunk)
+
+            expected = r.headers.get('content-length')
+            if expected is not None and int(expected) != size:
+                raise Exception(
+                    'got {} of {} bytes'.format(size, expected)
+                )
+
+            os.rename(part_path, full_path)
+
+        except Exception as e:
+            logger.info(
+                'Emby stream cache: cant cache {}: {}'.format(item_id, e)
+            )
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+            # wakes up fetch, which finds the download gone
+            with self._lock:
+                started = self._fetching.pop(name, None)
+            if started is not None:
+                started.set()
+
+            return
+
+        with self._lock:
+            self._fetching.pop(name, None)
+
+            # older versions of the same item are useless now
+            prefix = '{}.'.format(item_id)
+            for old in [i for i in self._entries if i.startswith(prefix)]:
+                self._remove(old)
+
+            self._entries[name] = size
+            self._size += size
+            self._evict()
+
+        logger.debug('Emby stream cache: stored {}'.format(name))
+
+    def _started(self, name):
+        """Wakes up :meth:`fetch` waiting for a download to start.
+        """
+        with self._lock:
+            started = self._fetching.get(name)
+
+        if started is not None:
+            started.set()
+
+    def _remove(self, name):
+        self._size -= self._entries.pop(name)
+        try:
+            os.remove(os.path.join(self.path, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Removes least recently used unpinned files until the quota fits.
+        """
+        for name in list(self._entries):
+            if self._size <= self.max_size:
+                break
+
+            if name.split('.')[0] in self._pinned:
+                continue
+
+            logger.debug('Emby stream cache: evicting {}'.format(name))
+            self._remove(name)
+
+    def pin(self, item_ids):
+        """Protects items from eviction, replacing the former pins.
+
+        :param item_ids: Emby item IDs
+        :type item_ids: iterable
+        """
+        with self._lock:
+            self._pinned = set(item_ids)
+
+    @property
+    def size(self):
+        return self._size
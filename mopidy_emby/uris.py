@@ -0,0 +1,164 @@
+from __future__ import unicode_literals
+
+import logging
+
+from collections import OrderedDict, namedtuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# matches any single part of an uri
+ANY = '*'
+
+Route = namedtuple('Route', ['source', 'handler', 'args', 'uri'])
+
+_Handler = namedtuple('_Handler', ['func', 'per_source', 'batch'])
+
+
+class UriRouter(object):
+    """Dispatch table from ``emby:`` uris to their handlers.
+
+    Patterns are the parts of an uri after ``emby:``, with ``*`` for a
+    value, like ``track:*`` or ``directory:genre:*:*``. They are compiled
+    into a tree of parts, an uri is matched by walking it once, a literal
+    part wins over ``*``. Uris that match no pattern are rejected here, so
+    handlers get their values without parsing anything.
+
+    Handlers registered ``per_source`` are called with the remote of the
+    server the uri belongs to, their results get qualified uris. Others
+    only match unqualified uris. A ``batch`` handler takes the remote and
+    the values of many uris and returns one result per uri.
+
+    :param routes: Tuples of pattern, handler and optional keyword
+        arguments for :meth:`add`
+    :type routes: list
+    """
+
+    def __init__(self, routes=()):
+        self._tree = {}
+
+        for route in routes:
+            self.add(*route)
+
+    def add(self, pattern, func, per_source=False, batch=None):
+        """Registers a handler for an uri pattern.
+
+        :param pattern: Pattern like ``album:*``
+        :type pattern: str
+        :param func: Handler, called with the values of ``*`` parts
+        :param per_source: Call ``func`` with the remote first
+        :type per_source: bool
+        :param batch: Handler for many uris of one server, called with the
+            remote and a list of value tuples
+        """
+        node = self._tree
+        for part in pattern.split(':'):
+            node = node.setdefault(part, {})
+
+        node[None] = _Handler(func, per_source, batch)
+
+    def _walk(self, parts):
+        node = self._tree
+        args = []
+
+        for part in parts:
+            child = node.get(part)
+            if child is None:
+                child = node.get(ANY)
+                if child is None:
+                    return None, ()
+                args.append(part)
+            node = child
+
+        return node.get(None), tuple(args)
+
+    def match(self, federation, uri):
+        """Finds the handler and server of an uri.
+
+        :param federation: Known servers
+        :type federation: :class:`mopidy_emby.federation.Federation`
+        :param uri: Uri
+        :type uri: str
+        :returns: Route or None if the uri is invalid
+        :rtype: :class:`Route`
+        """
+        parts = uri.split(':') if uri else ()
+        if len(parts) < 2 or parts[0] != 'emby':
+            return None
+
+        source = None
+        local = parts[1:]
+        if len(parts) > 2 and parts[1] not in self._tree \
+                and parts[1] in federation.sources:
+            source = federation.sources[parts[1]]
+            local = parts[2:]
+
+        handler, args = self._walk(local)
+        if handler is None or (source is not None and not handler.per_source):
+            return None
+
+        if source is None:
+            source = federation.primary
+
+        return Route(source, handler, args, 'emby:' + ':'.join(local))
+
+    @staticmethod
+    def _call(federation, route):
+        handler = route.handler
+        if not handler.per_source:
+            return handler.func(*route.args)
+
+        return federation.qualify(
+            route.source, handler.func(route.source.remote, *route.args)
+        )
+
+    def dispatch(self, federation, uri, default=None):
+        """Calls the handler of an uri.
+
+        :returns: Result of the handler, ``default`` for invalid uris
+        """
+        route = self.match(federation, uri)
+        if route is None:
+            logger.info('Unknown Emby URI: {}'.format(uri))
+            return default
+
+        return self._call(federation, route)
+
+    def dispatch_many(self, federation, uris):
+        """Calls the handlers of many uris.
+
+        Uris of one server with a batch handler are handled with one call,
+        single ones still go to the plain handler.
+
+        :returns: Results by uri, invalid uris are left out
+        :rtype: dict
+        """
+        results = OrderedDict()
+        batches = OrderedDict()
+
+        for uri in uris:
+            route = self.match(federation, uri)
+            if route is None:
+                logger.info('Unknown Emby URI: {}'.format(uri))
+                continue
+
+            if route.handler.batch is None:
+                results[uri] = self._call(federation, route)
+            else:
+                key = (route.source.name, route.handler.batch)
+                batches.setdefault(key, (route.source, []))[1].append(
+                    (uri, route))
+
+        for (_, batch), (source, routes) in batches.items():
+            if len(routes) == 1:
+                uri, route = routes[0]
+                results[uri] = self._call(federation, route)
+                continue
+
+            values = batch(source.remote, [route.args for _, route in routes])
+            for (uri, _), value in zip(routes, values):
+                results[uri] = federation.qualify(source, value)
+
+        return OrderedDict((uri, results[uri]) for uri in uris
+                           if uri in results)
@@ -1,8 +1,14 @@
 from __future__ import unicode_literals
 
 import logging
+import threading
 import time
 
+from collections import OrderedDict
+
+from mopidy_emby import workers
+from mopidy_emby.metrics import metrics
+
 
 logger = logging.getLogger(__name__)
 
@@ -10,32 +16,136 @@ logger = logging.getLogger(__name__)
 class cache(object):
     # stolen from mopidy-soundcloud <3
 
-    def __init__(self, ctl=8, ttl=3600):
-        self.cache = {}
+    # runs background refreshes, called with a function. A thread of its
+    # own is started for every refresh without it
+    executor = None
+
+    def __init__(self, ctl=8, ttl=3600, stale=None, max_entries=None):
+        self.cache = OrderedDict()
         self.ctl = ctl
         self.ttl = ttl
+        self.stale = stale
+        # least recently used entries get dropped above this number
+        self.max_entries = max_entries
+        # (ctl, ttl) for the calls of one owner, the first argument
+        self.lifetimes = {}
         self._call_count = 1
+        self._refreshing = set()
+        self._lock = threading.Lock()
 
     def __call__(self, func):
         def _memoized(*args):
             self.func = func
             now = time.time()
             try:
-                value, last_update = self.cache[args]
+                entry = self.cache[args]
+                value, last_update = entry
                 age = now - last_update
-                if self._call_count >= self.ctl or age > self.ttl:
+                ctl, ttl = self.lifetimes.get(args[0], (self.ctl, self.ttl))
+                if self._call_count >= ctl or age > ttl:
                     self._call_count = 1
-                    raise AttributeError
+                    if not self.stale or age > ttl + self.stale:
+                        raise AttributeError
 
-                self._call_count += 1
+                    # serve the expired value while it gets refetched
+                    metrics.inc('emby_cache_stale_total',
+                                function=func.__name__)
+                    self._revalidate(func, args, entry)
+                else:
+                    self._call_count += 1
+
+                if self.max_entries:
+                    self.cache.move_to_end(args)
+
+                metrics.inc('emby_cache_hits_total', function=func.__name__)
                 return value
 
             except (KeyError, AttributeError):
+                metrics.inc('emby_cache_misses_total', function=func.__name__)
                 value = self.func(*args)
-                self.cache[args] = (value, now)
+                self._store(args, value, now)
                 return value
 
             except TypeError:
                 return self.func(*args)
 
+        _memoized.cache = self
+
         return _memoized
+
+    def _revalidate(self, func, args, entry):
+        """Refetches an expired entry in the background, once at a time.
+
+        The new value is only stored if the entry wasnt invalidated or
+        patched meanwhile.
+        """
+        with self._lock:
+            if args in self._refreshing:
+                return
+            self._refreshing.add(args)
+
+        def refresh():
+            try:
+                start = time.time()
+                value = func(*args)
+                if self.cache.get(args) is entry:
+                    self._store(args, value, start)
+            except Exception as e:
+                metrics.inc('emby_cache_refresh_errors_total',
+                            function=func.__name__)
+                logger.warning(
+                    'Emby cache refresh of {} failed: {}'.format(
+                        func.__name__, e
+                    )
+                )
+            finally:
+                with self._lock:
+                    self._refreshing.discard(args)
+
+        if cache.executor is not None:
+            cache.executor(refresh)
+            return
+
+        def run():
+            with workers.running_as(workers.BACKGROUND):
+                refresh()
+
+        thread = threading.Thread(target=run, name='EmbyCacheRefresh')
+        thread.daemon = True
+        thread.start()
+
+    def _store(self, args, value, last_update):
+        self.cache[args] = (value, last_update)
+
+        if self.max_entries:
+            with self._lock:
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+                    metrics.inc('emby_cache_evictions_total',
+                                function=self.func.__name__)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def invalidate(self, *args):
+        """Drops the entry for a set of arguments.
+        """
+        self.cache.pop(args, None)
+
+    def clear(self):
+        self.cache.clear()
+
+    def entries(self):
+        """Returns a list of ``(args, value)`` tuples of all entries.
+        """
+        return [(args, value) for args, (value, _) in list(self.cache.items())]
+
+    def patch(self, args, value):
+        """Replaces the value of an entry, keeping its age.
+        """
+        try:
+            _, last_update = self.cache[args]
+        except KeyError:
+            return
+
+        self.cache[args] = (value, last_update)
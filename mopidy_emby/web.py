@@ -0,0 +1,164 @@
+from __future__ import unicode_literals
+
+import gzip
+import itertools
+import json
+import logging
+
+from mopidy.models import ModelJSONEncoder
+
+import pykka
+
+import tornado.ioloop
+import tornado.web
+
+from mopidy_emby import snapshot
+from mopidy_emby.backend import EmbyBackend
+from mopidy_emby.metrics import metrics
+from mopidy_emby.profiling import profiler
+from mopidy_emby.streamcache import StreamCache, cache_path
+
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Serves the extension metrics.
+
+    Prometheus text format by default, JSON with ``?format=json``.
+    """
+
+    def get(self):
+        if self.get_argument('format', None) == 'json':
+            self.write(metrics.snapshot())
+        else:
+            self.set_header('Content-Type', 'text/plain; version=0.0.4')
+            self.write(metrics.prometheus())
+
+
+class ProfileHandler(tornado.web.RequestHandler):
+    """Serves the slowest profiled library calls as JSON.
+    """
+
+    def get(self):
+        self.write({
+            'sample_rate': profiler.sample_rate,
+            'slowest': profiler.slowest(),
+        })
+
+
+class SnapshotHandler(tornado.web.RequestHandler):
+    """Streams the whole library, one JSON encoded track per line.
+
+    The dump file is sent as it is if there is one, else the servers are
+    exported page by page. Both are read outside of the io loop.
+    """
+
+    chunk_size = 64 * 1024
+    batch_size = 500
+
+    def initialize(self, path, get_snapshot):
+        self.path = path
+        self.get_snapshot = get_snapshot
+
+    async def get(self):
+        loop = tornado.ioloop.IOLoop.current()
+        f = None
+        if self.path:
+            try:
+                f = await loop.run_in_executor(None, gzip.open, self.path)
+            except (IOError, OSError):
+                # not written yet
+                pass
+
+        if f is None:
+            return await self._export(loop)
+
+        self.set_header('Content-Type', 'application/x-ndjson')
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    None, f.read, self.chunk_size
+                )
+                if not chunk:
+                    break
+
+                self.write(chunk)
+                await self.flush()
+
+        finally:
+            f.close()
+
+    async def _export(self, loop):
+        exporter = await loop.run_in_executor(None, self.get_snapshot)
+        if exporter is None:
+            raise tornado.web.HTTPError(503)
+
+        tracks = exporter.tracks()
+        self.set_header('Content-Type', 'application/x-ndjson')
+
+        while True:
+            batch = await loop.run_in_executor(
+                None, list, itertools.islice(tracks, self.batch_size)
+            )
+            if not batch:
+                break
+
+            self.write(''.join(
+                json.dumps(track, cls=ModelJSONEncoder) + '\n'
+                for track in batch
+            ))
+            await self.flush()
+
+
+def get_snapshot():
+    """Returns the library snapshot of the running backend or None.
+
+    Waits for the backend actor, so it is called outside of the io loop.
+    """
+    refs = pykka.ActorRegistry.get_by_class(EmbyBackend)
+    if not refs:
+        return None
+
+    try:
+        return refs[0].proxy().snapshot.get(timeout=10)
+    except (pykka.ActorDeadError, pykka.Timeout):
+        return None
+
+
+class StreamHandler(tornado.web.RequestHandler):
+    """Plays a track along with its download into the stream cache.
+    """
+
+    def initialize(self, path):
+        self.path = path
+
+    async def get(self, name):
+        if not self.path:
+            raise tornado.web.HTTPError(404)
+
+        loop = tornado.ioloop.IOLoop.current()
+        chunks = StreamCache.follow(self.path, name)
+
+        # the file is read outside of the io loop
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            raise tornado.web.HTTPError(404)
+
+        self.set_header('Content-Type', 'application/octet-stream')
+        while chunk is not None:
+            self.write(chunk)
+            await self.flush()
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+
+
+def factory(config, core):
+    return [
+        ('/metrics', MetricsHandler),
+        ('/profile', ProfileHandler),
+        ('/snapshot', SnapshotHandler, {
+            'path': snapshot.dump_path(config),
+            'get_snapshot': get_snapshot,
+        }),
+        ('/stream/([^/]+)', StreamHandler, {'path': cache_path(config)}),
+    ]
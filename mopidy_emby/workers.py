@@ -0,0 +1,183 @@
+from __future__ import unicode_literals
+
+import contextlib
+import heapq
+import itertools
+import logging
+import threading
+
+from concurrent.futures import Future, TimeoutError
+
+from mopidy_emby.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# priorities, lower runs first
+PLAYBACK = 0
+INTERACTIVE = 1
+BACKGROUND = 2
+
+_local = threading.local()
+
+
+def current_priority():
+    """Returns the priority of the job running in this thread.
+
+    Requests made by a job inherit its priority, code outside of jobs
+    counts as ``INTERACTIVE``.
+
+    :rtype: int
+    """
+    return getattr(_local, 'priority', INTERACTIVE)
+
+
+@contextlib.contextmanager
+def running_as(priority):
+    """Runs a block with the priority of a job, also in other threads.
+    """
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class WorkerPool(object):
+    """Thread pool running jobs by priority.
+
+    Queued jobs run in order of priority and then submission. Background
+    jobs never occupy more than ``workers - 1`` threads, so there is always
+    a thread free for playback and interactive jobs.
+    """
+
+    def __init__(self, workers=3):
+        self.workers = max(workers, 2)
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._background = 0
+        self._stopped = False
+        self._threads = []
+
+    def _start(self):
+        if self._threads:
+            return
+
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                name='EmbyWorker-{}'.format(i)
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self):
+        """Pops the next runnable job, waiting for one if needed.
+        """
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return None
+
+                if self._heap:
+                    priority = self._heap[0][0]
+                    if (priority < BACKGROUND or
+                            self._background < self.workers - 1):
+                        if priority >= BACKGROUND:
+                            self._background += 1
+
+                        job = heapq.heappop(self._heap)
+                        metrics.set('emby_worker_queue_depth',
+                                    len(self._heap))
+
+                        return job
+
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            priority, _, future, func, args, kwargs = job
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    with running_as(priority):
+                        result = func(*args, **kwargs)
+                    future.set_result(result)
+                except BaseException as e:
+                    future.set_exception(e)
+
+            if priority >= BACKGROUND:
+                with self._condition:
+                    self._background -= 1
+                    self._condition.notify()
+
+    def submit(self, priority, func, *args, **kwargs):
+        """Queues a job.
+
+        :param priority: One of ``PLAYBACK``, ``INTERACTIVE`` or
+            ``BACKGROUND``
+        :param func: Callable to run
+        :type priority: int
+        :returns: Future of the result
+        :rtype: concurrent.futures.Future
+        """
+        future = Future()
+
+        with self._condition:
+            if self._stopped:
+                raise Exception('Emby worker pool is stopped')
+
+            self._start()
+            heapq.heappush(
+                self._heap,
+                (priority, next(self._counter), future, func, args, kwargs)
+            )
+            metrics.set('emby_worker_queue_depth', len(self._heap))
+            self._condition.notify()
+
+        return future
+
+    def run(self, priority, timeout, func, *args, **kwargs):
+        """Runs a job and waits for its result.
+
+        :param priority: Job priority
+        :param timeout: Seconds to wait
+        :param func: Callable to run
+        :type priority: int
+        :type timeout: float
+        :returns: Result of ``func``
+        :raises concurrent.futures.TimeoutError: if it takes too long
+        """
+        future = self.submit(priority, func, *args, **kwargs)
+
+        try:
+            return future.result(timeout)
+
+        except TimeoutError:
+            # nobody waits for the result anymore, a job still queued is
+            # dropped instead of occupying a worker later
+            future.cancel()
+            raise
+
+    @property
+    def queue_depth(self):
+        return len(self._heap)
+
+    def stop(self):
+        """Stops the workers, queued jobs get cancelled.
+        """
+        with self._condition:
+            self._stopped = True
+            for job in self._heap:
+                job[2].cancel()
+            self._heap = []
+            self._condition.notify_all()
@@ -26,9 +26,12 @@ setup(
     install_requires=[
         'setuptools',
         'Mopidy >= 1.0',
-        'Pykka >= 1.1',
+        'Pykka >= 4.0, < 5',
         'requests >= 2.0',
     ],
+    extras_require={
+        'brotli': ['brotli'],
+    },
     entry_points={
         'mopidy.ext': [
             'emby = mopidy_emby:Extension',
@@ -6,6 +6,9 @@ import pytest
 
 import mopidy_emby
 
+from mopidy_emby.federation import Federation, Source
+from mopidy_emby.workers import WorkerPool
+
 
 @pytest.fixture
 def config():
@@ -30,6 +33,7 @@ def emby_client(config, mocker):
     mocker.patch('mopidy_emby.remote.EmbyHandler._get_user',
                  return_value=[{'Id': 'mock'}])
     mocker.patch('mopidy_emby.remote.EmbyHandler._password_data')
+    mocker.patch('mopidy_emby.remote.EmbyHandler.retry_delay', 0)
 
     return mopidy_emby.remote.EmbyHandler(config)
 
@@ -37,8 +41,13 @@ def emby_client(config, mocker):
 @pytest.fixture
 def backend_mock():
     backend_mock = mock.Mock(autospec=mopidy_emby.backend.EmbyBackend)
+    backend_mock.stream_cache = None
+    backend_mock.workers = WorkerPool(2)
+    backend_mock.federation = Federation([Source(None, backend_mock.remote)])
+
+    yield backend_mock
 
-    return backend_mock
+    backend_mock.workers.stop()
 
 
 @pytest.fixture
@@ -67,6 +76,12 @@ def libraryprovider(backend_mock):
         ),
         length=2411620000 / 10000
     )
+    backend_mock.remote.get_tracks_by_ids.return_value = [
+        backend_mock.remote.get_track.return_value
+    ]
+    backend_mock.remote.get_album_tracks.return_value = [
+        backend_mock.remote.get_track.return_value
+    ]
     backend_mock.remote.get_directory.return_value = {
         'Items': [
             {
@@ -82,6 +97,7 @@ def libraryprovider(backend_mock):
 @pytest.fixture
 def playbackprovider(backend_mock, emby_client):
     backend_mock.remote = emby_client
+    backend_mock.federation = Federation([Source(None, emby_client)])
 
     return mopidy_emby.backend.EmbyPlaybackProvider(audio=mock.Mock(),
                                                     backend=backend_mock)
@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+
+import json
+
+from mopidy.models import Image
+
+import pytest
+
+from mopidy_emby.artwork import ArtworkResolver
+
+
+@pytest.fixture
+def resolver():
+    return ArtworkResolver('foo.bar', 443, 'https://foo.bar:443', [100, 400])
+
+
+@pytest.mark.parametrize('item,expected', [
+    (
+        {'Id': '1', 'ImageTags': {'Primary': 'a'}},
+        ('1', 'Primary', 'a')
+    ),
+    (
+        {'Id': '1', 'ImageTags': {}, 'AlbumId': '2',
+         'AlbumPrimaryImageTag': 'b', 'ParentBackdropItemId': '3',
+         'ParentBackdropImageTags': ['c']},
+        ('2', 'Primary', 'b')
+    ),
+    (
+        {'Id': '1', 'ImageTags': {}, 'AlbumPrimaryImageTag': '',
+         'ParentBackdropItemId': '3', 'ParentBackdropImageTags': ['c']},
+        ('3', 'Backdrop', 'c')
+    ),
+    (
+        {'Id': '1', 'ImageTags': {}, 'ParentBackdropImageTags': []},
+        None
+    ),
+])
+def test_source(item, expected):
+    assert ArtworkResolver.source(item) == expected
+
+
+def test_template(resolver):
+    with open('tests/data/track0.json', 'r') as f:
+        track = json.load(f)
+
+    assert resolver.template(track) == (
+        'foo.bar:443/emby/Items/18e5a9871e6a4a2294d5af998457ca16'
+        '/Images/Primary?maxHeight=%1&maxWidth=%2'
+        '&tag=' + track['ImageTags']['Primary']
+    )
+
+
+def test_template_without_image(resolver):
+    assert resolver.template({'Id': '1', 'ImageTags': {}}) == ''
+
+
+def test_url_is_cached(resolver):
+    item = {'Id': '1', 'ImageTags': {'Primary': 'a'}}
+
+    url = resolver.url(item, 100)
+
+    assert url == ('https://foo.bar:443/emby/Items/1/Images/Primary'
+                   '?maxHeight=100&maxWidth=100&tag=a')
+    assert resolver.url(item, 100) is url
+
+
+def test_max_entries(resolver):
+    resolver.max_entries = 2
+    items = [{'Id': str(i), 'ImageTags': {'Primary': 'a'}} for i in range(3)]
+
+    for item in items:
+        resolver.template(item)
+        resolver.url(item, 100)
+
+    assert list(resolver._templates) == [
+        ('1', 'Primary', 'a'), ('2', 'Primary', 'a')]
+    assert list(resolver._urls) == [
+        ('1', 'Primary', 'a', 100), ('2', 'Primary', 'a', 100)]
+
+    resolver.clear()
+
+    assert not resolver._templates
+    assert not resolver._urls
+
+
+def test_url_unconfigured_size(resolver):
+    item = {'Id': '1', 'ImageTags': {'Primary': 'a'}}
+
+    assert resolver.url(item, 50) == (
+        'https://foo.bar:443/emby/Items/1/Images/Primary'
+        '?maxHeight=50&maxWidth=50&tag=a'
+    )
+
+
+def test_images(resolver):
+    item = {'Id': '1', 'ImageTags': {'Primary': 'a'}}
+
+    assert resolver.images(item) == [
+        Image(uri=('https://foo.bar:443/emby/Items/1/Images/Primary'
+                   '?maxHeight=400&maxWidth=400&tag=a'),
+              width=400, height=400),
+        Image(uri=('https://foo.bar:443/emby/Items/1/Images/Primary'
+                   '?maxHeight=100&maxWidth=100&tag=a'),
+              width=100, height=100),
+    ]
+
+
+def test_images_without_image(resolver):
+    assert resolver.images({'Id': '1', 'ImageTags': {}}) == []
@@ -0,0 +1,38 @@
+from __future__ import unicode_literals
+
+import os
+import stat
+
+from mopidy_emby.auth import CredentialStore
+
+
+def test_save_and_load(tmpdir):
+    store = CredentialStore(str(tmpdir.join('emby', 'credentials.json')))
+    key = CredentialStore.key('https://foo.bar:443', 'embyuser')
+
+    assert store.load(key) is None
+
+    store.save(key, 'user', 'token')
+
+    assert CredentialStore(store.path).load(key) == {
+        'user_id': 'user', 'token': 'token'
+    }
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+
+
+def test_forget(tmpdir):
+    store = CredentialStore(str(tmpdir.join('credentials.json')))
+    store.save('a', 'user', 'token')
+    store.save('b', 'user', 'token')
+
+    store.forget('a')
+
+    assert store.load('a') is None
+    assert store.load('b') is not None
+
+
+def test_load_garbage(tmpdir):
+    path = tmpdir.join('credentials.json')
+    path.write('garbage')
+
+    assert CredentialStore(str(path)).load('a') is None
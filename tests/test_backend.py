@@ -1,9 +1,17 @@
 from __future__ import unicode_literals
 
+import threading
+
 import mock
 
-from mopidy_emby import library, playback
+import pykka
+
+import pytest
+
+from mopidy_emby import library, playback, playlists, snapshot
 from mopidy_emby.backend import EmbyBackend
+from mopidy_emby.remote import EmbyHandler
+from mopidy_emby.workers import WorkerPool
 
 
 @mock.patch('mopidy_emby.backend.EmbyHandler', autospec=True)
@@ -14,4 +22,80 @@ def test_backend(embyhander_mock, config):
 
     assert isinstance(backend.library, library.EmbyLibraryProvider)
     assert isinstance(backend.playback, playback.EmbyPlaybackProvider)
-    assert backend.playlist is None
+    assert isinstance(backend.playlists, playlists.EmbyPlaylistsProvider)
+    assert isinstance(backend.workers, WorkerPool)
+    assert isinstance(backend.snapshot, snapshot.LibrarySnapshot)
+    assert backend.snapshot.path is None
+
+
+def test_unreachable_server(config, mocker):
+    def get_user(remote):
+        if remote.hostname == 'http://office.local':
+            raise Exception('Cant connect to Emby API')
+
+        return [{'Id': 'user'}]
+
+    mocker.patch.object(EmbyHandler, '_get_user', autospec=True,
+                        side_effect=get_user)
+    mocker.patch.object(EmbyHandler, '_get_token', return_value='token')
+    config['emby']['servers'] = ['office=http://office.local']
+
+    backend = EmbyBackend(config, mock.Mock())
+
+    try:
+        assert backend.federation.fan_out(
+            lambda remote: remote.user_id) == ['user']
+        assert not backend.federation.sources['office'].healthy
+    finally:
+        backend.workers.stop()
+        backend.federation.close()
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler', autospec=True)
+def test_hung_browse_does_not_delay_translate_uri(embyhander_mock, config):
+    release = threading.Event()
+    ref = EmbyBackend.start(config, mock.Mock())
+    backend = ref.proxy()
+
+    try:
+        remote = backend.remote.get()
+        remote.get_artists.side_effect = lambda: release.wait(5)
+        remote.api_url.side_effect = lambda path: 'https://foo.bar' + path
+
+        browsing = backend.library.browse('emby:directory:root')
+
+        assert backend.playback.translate_uri('emby:track:1').get(
+            timeout=1
+        ) == 'https://foo.bar/Audio/1/stream?static=true'
+
+        # still waiting for the artists
+        with pytest.raises(pykka.Timeout):
+            browsing.get(timeout=0)
+
+    finally:
+        release.set()
+        ref.stop()
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler', autospec=True)
+def test_provider_calls_through_proxy(embyhander_mock, config):
+    ref = EmbyBackend.start(config, mock.Mock())
+    backend = ref.proxy()
+
+    try:
+        remote = backend.remote.get()
+        remote.api_url.side_effect = Exception('down')
+
+        # errors of provider calls reach the caller
+        with pytest.raises(Exception) as execinfo:
+            backend.playback.translate_uri('emby:track:1').get(timeout=1)
+
+        assert 'down' in str(execinfo.value)
+
+        # everything else is still handled by the actor
+        assert backend.uri_schemes.get(timeout=1) == ['emby']
+
+    finally:
+        ref.stop()
+
+    assert not ref.is_alive()
@@ -0,0 +1,126 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import mock
+
+import pytest
+
+from mopidy_emby import workers
+from mopidy_emby.client import AsyncClient, Retry
+from mopidy_emby.scheduler import RequestScheduler
+from mopidy_emby.workers import WorkerPool
+
+
+@pytest.fixture
+def client():
+    client = AsyncClient(lambda url, attempt: url.upper(), max_connections=2)
+
+    yield client
+
+    client.stop()
+
+
+def test_submit(client):
+    assert client.submit('foo').result(timeout=1) == 'FOO'
+
+
+def test_map_keeps_order(client):
+    assert client.map(['a', 'b', 'c']) == ['A', 'B', 'C']
+
+
+def test_submit_exception(client):
+    def request(url, attempt):
+        raise Exception('Cant connect to Emby API')
+
+    client.request = request
+
+    with pytest.raises(Exception) as execinfo:
+        client.submit('foo').result(timeout=1)
+
+    assert 'Cant connect to Emby API' in str(execinfo.value)
+
+
+def test_max_connections():
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def request(url, attempt):
+        with lock:
+            running.append(url)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(url)
+
+        return url
+
+    client = AsyncClient(request, max_connections=2, max_pending=3)
+    try:
+        assert client.map([str(i) for i in range(8)]) == \
+            [str(i) for i in range(8)]
+    finally:
+        client.stop()
+
+    assert max(peak) == 2
+
+
+def test_runs_concurrently():
+    client = AsyncClient(lambda url, attempt: time.sleep(0.1),
+                         max_connections=4)
+    try:
+        start = time.time()
+        client.map(['a', 'b', 'c', 'd'])
+        elapsed = time.time() - start
+    finally:
+        client.stop()
+
+    assert elapsed < 0.3
+
+
+def test_stop_without_start():
+    AsyncClient(lambda url, attempt: url).stop()
+
+
+def test_submit_uses_job_priority():
+    scheduler = mock.Mock(wraps=RequestScheduler(2))
+    client = AsyncClient(lambda url, attempt: url, scheduler=scheduler)
+    pool = WorkerPool(2)
+    try:
+        pool.run(workers.BACKGROUND, 1, lambda: client.submit('a').result())
+        client.submit('b', workers.PLAYBACK).result(timeout=1)
+    finally:
+        pool.stop()
+        client.stop()
+
+    assert [c[0] for c in scheduler.acquire.call_args_list] == [
+        ('a', workers.BACKGROUND), ('b', workers.PLAYBACK),
+    ]
+
+
+def test_retry_gives_up_the_slot():
+    started = []
+
+    def request(url, attempt):
+        started.append(url + str(attempt))
+        if url == 'a' and not attempt:
+            raise Retry(0.1)
+
+        return url
+
+    scheduler = mock.Mock(wraps=RequestScheduler(1))
+    client = AsyncClient(request, scheduler=scheduler)
+    try:
+        a = client.submit('a')
+        time.sleep(0.05)
+        assert client.submit('b').result(timeout=1) == 'b'
+        assert a.result(timeout=1) == 'a'
+    finally:
+        client.stop()
+
+    assert started == ['a0', 'b0', 'a1']
+    # the retry waits for a slot and token like any other request
+    assert [c[0][0] for c in scheduler.acquire.call_args_list] == \
+        ['a', 'b', 'a']
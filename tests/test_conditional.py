@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+
+import mock
+
+from mopidy_emby.conditional import ConditionalCache
+
+
+def response(content=b'{}', status_code=200, **headers):
+    return mock.Mock(status_code=status_code, content=content,
+                     headers=headers)
+
+
+def test_headers():
+    cache = ConditionalCache()
+    cache.store('http://a', response(**{
+        'ETag': '"1"', 'Last-Modified': 'Sat, 01 Jan 2022 00:00:00 GMT',
+    }), {'Items': []})
+
+    assert cache.headers(cache.get('http://a')) == {
+        'If-None-Match': '"1"',
+        'If-Modified-Since': 'Sat, 01 Jan 2022 00:00:00 GMT',
+    }
+    assert cache.get('http://a').data == {'Items': []}
+    assert cache.headers(cache.get('http://b')) == {}
+
+
+def test_store_without_validators_drops_entry():
+    cache = ConditionalCache()
+    cache.store('http://a', response(ETag='"1"'), 1)
+    cache.store('http://a', response(), 2)
+    cache.store('http://b', response(status_code=500, ETag='"1"'), 3)
+
+    assert len(cache) == 0
+    assert cache.bytes == 0
+
+
+def test_evicts_least_recently_used():
+    cache = ConditionalCache(size=2, max_bytes=10)
+    cache.store('http://a', response(b'1234', ETag='a'), 'a')
+    cache.store('http://b', response(b'1234', ETag='b'), 'b')
+    cache.get('http://a')
+    cache.store('http://c', response(b'1234', ETag='c'), 'c')
+
+    assert cache.get('http://b') is None
+    assert cache.get('http://a').data == 'a'
+    assert cache.bytes == 8
+
+    # too large to be kept at all
+    cache.store('http://d', response(b'x' * 11, ETag='d'), 'd')
+
+    assert cache.get('http://d') is None
+    assert len(cache) == 2
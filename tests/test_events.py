@@ -0,0 +1,140 @@
+from __future__ import unicode_literals
+
+import asyncio
+import json
+
+import mock
+
+import pytest
+
+import tornado.testing
+import tornado.web
+import tornado.websocket
+
+from mopidy_emby.events import EmbyEventListener
+
+
+LIBRARY_CHANGED = {
+    'MessageType': 'LibraryChanged',
+    'Data': {
+        'FoldersAddedTo': [],
+        'FoldersRemovedFrom': [],
+        'ItemsAdded': ['1'],
+        'ItemsUpdated': ['2'],
+        'ItemsRemoved': ['3'],
+    }
+}
+
+USER_DATA_CHANGED = {
+    'MessageType': 'UserDataChanged',
+    'Data': {
+        'UserId': 'mock',
+        'UserDataList': [{'ItemId': '4', 'PlayCount': 1}],
+    }
+}
+
+
+@pytest.fixture
+def remote():
+    return mock.Mock(base_url='https://foo.bar:443', token='token')
+
+
+@pytest.mark.parametrize('base_url,expected', [
+    ('https://foo.bar:443',
+     'wss://foo.bar:443/embywebsocket?api_key=token&deviceId=mopidy'),
+    ('http://foo.bar:8096',
+     'ws://foo.bar:8096/embywebsocket?api_key=token&deviceId=mopidy'),
+])
+def test_url(base_url, expected, remote):
+    remote.base_url = base_url
+
+    assert EmbyEventListener(remote).url == expected
+
+
+def test_handle_library_changed(remote):
+    EmbyEventListener(remote).handle(json.dumps(LIBRARY_CHANGED))
+
+    remote.apply_library_changes.assert_called_once_with(
+        added=['1'], updated=['2'], removed=['3']
+    )
+
+
+def test_handle_library_changed_notifies(remote):
+    on_change = mock.Mock()
+
+    EmbyEventListener(remote, on_change).handle(json.dumps(LIBRARY_CHANGED))
+    EmbyEventListener(remote, on_change).handle(json.dumps(USER_DATA_CHANGED))
+
+    on_change.assert_called_once_with()
+
+
+def test_handle_user_data_changed(remote):
+    EmbyEventListener(remote).handle(json.dumps(USER_DATA_CHANGED))
+
+    remote.invalidate_items.assert_called_once_with(['4'])
+
+
+@pytest.mark.parametrize('data,interval', [
+    ({'MessageType': 'ForceKeepAlive', 'Data': 30}, 15),
+    ({'MessageType': 'ForceKeepAlive'}, 30),
+])
+def test_handle_force_keepalive(data, interval, remote):
+    listener = EmbyEventListener(remote)
+    listener.handle(json.dumps(data))
+
+    remote.client.loop.call_soon_threadsafe.assert_called_once_with(
+        listener._start_keepalive, interval
+    )
+
+
+@pytest.mark.parametrize('message', [
+    'garbage',
+    json.dumps({'MessageType': 'Play', 'Data': {}}),
+])
+def test_handle_ignores(message, remote):
+    EmbyEventListener(remote).handle(message)
+
+    assert not remote.apply_library_changes.called
+    assert not remote.invalidate_items.called
+
+
+class FakeEmbySocket(tornado.websocket.WebSocketHandler):
+
+    def open(self):
+        if self.get_argument('api_key') != 'token':
+            self.close()
+            return
+
+        self.write_message(json.dumps(LIBRARY_CHANGED))
+        self.write_message(json.dumps(USER_DATA_CHANGED))
+
+
+class EventListenerTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([
+            ('/embywebsocket', FakeEmbySocket),
+        ])
+
+    @tornado.testing.gen_test
+    async def test_run(self):
+        remote = mock.Mock(
+            base_url='http://127.0.0.1:{}'.format(self.get_http_port()),
+            token='token'
+        )
+        listener = EmbyEventListener(remote)
+        task = asyncio.ensure_future(listener.run())
+
+        for i in range(200):
+            if remote.invalidate_items.called:
+                break
+            await asyncio.sleep(0.01)
+
+        listener.stop()
+        task.cancel()
+
+        remote.events_connected.assert_called_once_with()
+        remote.apply_library_changes.assert_called_once_with(
+            added=['1'], updated=['2'], removed=['3']
+        )
+        remote.invalidate_items.assert_called_once_with(['4'])
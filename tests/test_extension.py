@@ -21,3 +21,14 @@ def test_get_config_schema():
     assert 'password' in schema
     assert 'hostname' in schema
     assert 'port' in schema
+    assert 'image_sizes' in schema
+    assert 'servers' in schema
+    assert 'libraries' in schema
+    assert 'max_connections_per_endpoint' in schema
+    assert 'requests_per_second' in schema
+    assert 'library_events' in schema
+    assert 'library_snapshot' in schema
+    assert 'playback_reporting' in schema
+    assert 'stream_cache' in schema
+    assert 'stream_cache_size' in schema
+    assert 'memory_budget' in schema
@@ -0,0 +1,46 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from mopidy_emby.facets import DiskFacetIndex, FacetIndex
+
+
+ALBUMS = [
+    {'Id': '1', 'Genres': ['Rock', 'Pop'], 'ProductionYear': 1994},
+    {'Id': '2', 'Genres': ['Rock'], 'ProductionYear': 1999},
+    {'Id': '3', 'Genres': [], 'ProductionYear': 2001},
+    {'Id': '4'},
+]
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def index(request, tmp_path):
+    if request.param == 'disk':
+        return DiskFacetIndex(ALBUMS, str(tmp_path / 'facets.sqlite3'))
+
+    return FacetIndex(ALBUMS)
+
+
+def test_counts(index):
+    assert index.counts('genre') == {'Rock': 2, 'Pop': 1}
+    assert index.counts('decade') == {'1990': 2, '2000': 1}
+    assert index.counts('year') == {'1994': 1, '1999': 1, '2001': 1}
+    assert index.counts('year', '1990') == {'1994': 1, '1999': 1}
+    assert index.counts('year', '1980') == {}
+    assert index.counts('year', '1995') == {}
+    assert index.counts('year', 'foo') == {}
+
+
+def test_albums(index):
+    assert [a['Id'] for a in index.albums('genre', 'Rock')] == ['1', '2']
+    assert [a['Id'] for a in index.albums('decade', '2000')] == ['3']
+    assert index.albums('genre', 'Jazz') == []
+
+
+def test_disk_index_replaces_file(tmp_path):
+    path = str(tmp_path / 'index' / 'facets.sqlite3')
+    DiskFacetIndex(ALBUMS, path)
+    index = DiskFacetIndex(ALBUMS[1:], path)
+
+    assert index.counts('genre') == {'Rock': 1}
+    assert index.albums('year', '1999') == [ALBUMS[1]]
@@ -0,0 +1,65 @@
+from __future__ import unicode_literals
+
+import mock
+
+from mopidy.models import TlTrack, Track
+
+from mopidy_emby.frontend import EmbyFrontend
+
+
+@mock.patch('mopidy_emby.frontend.pykka.ActorRegistry.get_by_class')
+def test_tracklist_changed_pins_tracks(get_by_class_mock, config):
+    config['emby']['stream_cache'] = True
+    core = mock.Mock()
+    core.tracklist.get_tracks.return_value.get.return_value = [
+        Track(uri='emby:track:1'),
+        Track(uri='emby:track:2'),
+    ]
+    frontend = EmbyFrontend(config, core)
+
+    frontend.tracklist_changed()
+
+    backend = get_by_class_mock.return_value[0].proxy.return_value
+    backend.playback.pin_tracks.assert_called_once_with(
+        ['emby:track:1', 'emby:track:2']
+    )
+
+
+@mock.patch('mopidy_emby.frontend.pykka.ActorRegistry.get_by_class')
+def test_tracklist_changed_without_stream_cache(get_by_class_mock, config):
+    core = mock.Mock()
+    frontend = EmbyFrontend(config, core)
+
+    frontend.tracklist_changed()
+
+    assert not core.tracklist.get_tracks.called
+    assert not get_by_class_mock.called
+
+
+@mock.patch('mopidy_emby.frontend.pykka.ActorRegistry.get_by_class')
+def test_playback_events_are_reported(get_by_class_mock, config):
+    config['emby']['playback_reporting'] = True
+    frontend = EmbyFrontend(config, mock.Mock())
+    tl_track = TlTrack(tlid=1, track=Track(uri='emby:track:1'))
+
+    frontend.track_playback_started(tl_track)
+    frontend.track_playback_paused(tl_track, 1000)
+    frontend.track_playback_ended(tl_track, 2000)
+
+    backend = get_by_class_mock.return_value[0].proxy.return_value
+    reporter = backend.reporter.get.return_value
+    reporter.started.assert_called_once_with('1')
+    reporter.paused.assert_called_once_with('1', 1000)
+    reporter.stopped.assert_called_once_with('1', 2000)
+
+
+@mock.patch('mopidy_emby.frontend.pykka.ActorRegistry.get_by_class')
+def test_other_tracks_are_not_reported(get_by_class_mock, config):
+    config['emby']['playback_reporting'] = True
+    frontend = EmbyFrontend(config, mock.Mock())
+
+    frontend.track_playback_started(
+        TlTrack(tlid=1, track=Track(uri='local:track:1'))
+    )
+
+    assert not get_by_class_mock.called
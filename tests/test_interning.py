@@ -0,0 +1,45 @@
+from __future__ import unicode_literals
+
+from mopidy.models import Album, Artist
+
+from mopidy_emby.interning import ModelInterner
+
+
+def test_artist():
+    interner = ModelInterner()
+
+    artist = interner.artist('1', 'Chairlift')
+
+    assert artist == Artist(uri='emby:artist:1', name='Chairlift')
+    assert interner.artist('1', 'Chairlift') is artist
+    assert interner.artist('1', 'Chairlift', 'mbid') is not artist
+    assert interner.artist('2', 'Chairlift') != artist
+    assert interner.artist(None, 'Chairlift').uri is None
+    assert len(interner) == 4
+
+
+def test_album():
+    interner = ModelInterner()
+    artists = [interner.artist('1', 'Chairlift')]
+
+    album = interner.album('10', 'Moth', artists, date='2016')
+
+    assert album == Album(
+        uri='emby:album:10',
+        name='Moth',
+        artists=[Artist(uri='emby:artist:1', name='Chairlift')],
+        date='2016'
+    )
+    assert interner.album('10', 'Moth', [interner.artist('1', 'Chairlift')],
+                          date='2016') is album
+    assert interner.album('10', 'Moth', [], date='2016') is not album
+    assert interner.album('10', 'Moth', artists) is not album
+
+
+def test_clear():
+    interner = ModelInterner()
+    interner.album('10', 'Moth', [interner.artist('1', 'Chairlift')])
+
+    interner.clear()
+
+    assert len(interner) == 0
@@ -1,9 +1,18 @@
 from __future__ import unicode_literals
 
-from mopidy.models import Album, Artist, Track
+import time
+
+from concurrent.futures import TimeoutError
+
+import mock
+
+from mopidy.models import Album, Artist, Ref, Track
 
 import pytest
 
+from mopidy_emby import workers
+from mopidy_emby.library import EmbyLibraryProvider
+
 
 @pytest.mark.parametrize('uri,expected', [
     ('emby:', ['Artistlist']),
@@ -69,3 +78,143 @@ def test_lookup_uri(uri, expected, libraryprovider):
 ])
 def test_lookup_uris(uri, expected, libraryprovider):
     assert libraryprovider.lookup(uris=uri) == expected
+
+
+def test_lookup_uris_batches_tracks(backend_mock):
+    backend_mock.remote.get_tracks_by_ids.return_value = [
+        Track(uri='emby:track:1'), Track(uri='emby:track:3'),
+    ]
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.lookup(uris=[
+        'emby:track:1', 'emby:track:2', 'emby:track:3', 'emby:foo:1',
+    ]) == {
+        'emby:track:1': [Track(uri='emby:track:1')],
+        'emby:track:2': [],
+        'emby:track:3': [Track(uri='emby:track:3')],
+        'emby:foo:1': [],
+    }
+    backend_mock.remote.get_tracks_by_ids.assert_called_once_with(
+        ['1', '2', '3'])
+    backend_mock.remote.get_track.assert_not_called()
+
+
+def test_get_images_batches_per_kind(backend_mock):
+    backend_mock.remote.get_images_many.return_value = [['a'], ['b']]
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.get_images(
+        ['emby:album:1', 'emby:album:2', 'emby:foo']
+    ) == {'emby:album:1': ['a'], 'emby:album:2': ['b']}
+    backend_mock.remote.get_images_many.assert_called_once_with(
+        'album', ['1', '2'])
+
+
+def test_browse_timeout(backend_mock):
+    backend_mock.remote.get_artists.side_effect = lambda: time.sleep(0.2)
+    provider = EmbyLibraryProvider(backend_mock)
+    provider.timeouts = dict(provider.timeouts, browse=0.05)
+
+    with pytest.raises(TimeoutError):
+        provider.browse('emby:directory:root')
+
+
+def test_lookup_track_runs_as_playback(backend_mock):
+    backend_mock.workers = mock.Mock()
+    provider = EmbyLibraryProvider(backend_mock)
+
+    provider.lookup(uri='emby:track:123')
+    provider.lookup(uri='emby:album:123')
+
+    priorities = [c[0][0] for c in backend_mock.workers.run.call_args_list]
+    assert priorities == [workers.PLAYBACK, workers.INTERACTIVE]
+
+
+def test_lookup_snapshot(backend_mock):
+    backend_mock.snapshot.load.return_value = iter(['track1', 'track2'])
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.lookup(uri='emby:library') == ['track1', 'track2']
+    backend_mock.remote.get_track.assert_not_called()
+
+
+@pytest.mark.parametrize('uri,method', [
+    ('emby:shuffle', 'shuffle'),
+    ('emby:shuffle:album', 'random_album'),
+])
+def test_lookup_queue(uri, method, backend_mock):
+    getattr(backend_mock.queues, method).return_value = ['track1']
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.lookup(uri=uri) == ['track1']
+
+
+def test_lookup_instant_mix(backend_mock):
+    backend_mock.queues.instant_mix.return_value = ['track1']
+    backend_mock.workers = mock.Mock(wraps=backend_mock.workers)
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.lookup(uri='emby:mix:track:123') == ['track1']
+    backend_mock.queues.instant_mix.assert_called_once_with(
+        backend_mock.remote, '123')
+    assert backend_mock.workers.run.call_args[0][0] == workers.INTERACTIVE
+
+
+def test_browse_root_lists_shelves(backend_mock):
+    backend_mock.remote.get_artists.return_value = ['Artistlist']
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert [ref.uri for ref in provider.browse('emby:directory:root')[:4]] \
+        == ['emby:directory:latest', 'emby:directory:most_played',
+            'emby:directory:genres', 'emby:directory:decades']
+    assert provider.browse('emby:directory:root')[4:] == ['Artistlist']
+
+
+@pytest.mark.parametrize('uri,method', [
+    ('emby:directory:latest', 'get_latest'),
+    ('emby:directory:most_played', 'get_most_played'),
+])
+def test_browse_shelf(uri, method, backend_mock):
+    getattr(backend_mock.remote, method).return_value = ['Ref']
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert provider.browse(uri) == ['Ref']
+
+
+def test_browse_genres(backend_mock):
+    backend_mock.remote.get_facet_counts.return_value = {
+        'Rock': 2, 'Hip:Hop': 1}
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert [(r.uri, r.name) for r in provider.browse('emby:directory:genres')] \
+        == [('emby:directory:genre:Hip%3AHop', 'Hip:Hop (1)'),
+            ('emby:directory:genre:Rock', 'Rock (2)')]
+    backend_mock.remote.get_facet_counts.assert_called_with('genre', None)
+
+
+def test_browse_decade(backend_mock):
+    backend_mock.remote.get_facet_counts.return_value = {'1994': 3}
+    provider = EmbyLibraryProvider(backend_mock)
+
+    assert [(r.uri, r.name) for r in
+            provider.browse('emby:directory:decade:1990')] == [
+        ('emby:directory:year:1994', '1994 (3)')]
+    backend_mock.remote.get_facet_counts.assert_called_with('year', '1990')
+
+
+def test_browse_genre_pages(backend_mock):
+    albums = [
+        Ref.album(uri='emby:album:{}'.format(i), name='{:02d}'.format(i))
+        for i in range(5)
+    ]
+    backend_mock.remote.get_facet_albums.return_value = albums
+    provider = EmbyLibraryProvider(backend_mock)
+    provider.page_size = 2
+
+    first = provider.browse('emby:directory:genre:Hip%3AHop')
+
+    backend_mock.remote.get_facet_albums.assert_called_with('genre', 'Hip:Hop')
+    assert first[:2] == albums[:2]
+    assert (first[2].uri, first[2].name) == (
+        'emby:directory:genre:Hip%3AHop:1', 'More (3)')
+    assert provider.browse('emby:directory:genre:Hip%3AHop:2') == albums[4:]
@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+import mock
+
+from mopidy_emby import memory
+from mopidy_emby.memory import MemoryGuard
+from mopidy_emby.metrics import metrics
+
+
+def test_rss():
+    assert memory.rss() > 1024 * 1024
+
+
+def test_report():
+    metrics.reset()
+    remote = mock.Mock()
+    remote.conditional.bytes = 1024
+
+    report = MemoryGuard([remote], 64).report()
+
+    assert report['budget'] == 64 * 1024 * 1024
+    assert report['responses'] == 1024
+    assert 'get_directory' in report['caches']
+    assert 'get_album_items' in report['caches']
+    assert 'get_search_results' in report['caches']
+
+    gauges = {g['name'] for g in metrics.snapshot()['gauges']}
+    assert {'emby_memory_rss_bytes', 'emby_cache_entries'} <= gauges
+
+
+def test_check_trims_above_budget():
+    remote = mock.Mock()
+    remote.conditional.bytes = 0
+
+    with mock.patch.object(memory, 'rss', return_value=100 * 1024 * 1024):
+        assert MemoryGuard([remote], 200).check() is False
+        remote.trim_caches.assert_not_called()
+
+        assert MemoryGuard([remote], 64).check() is True
+        remote.trim_caches.assert_called_once_with()
+
+
+def report(rss, entries):
+    return {'rss': rss * 1024 * 1024, 'caches': {'get_item': entries}}
+
+
+def test_check_waits_for_caches_to_regrow():
+    remote = mock.Mock()
+    guard = MemoryGuard([remote], 64)
+
+    with mock.patch.object(guard, 'report', side_effect=[
+            report(100, 100), report(100, 0),
+            report(100, 50),
+            report(100, 51), report(100, 0),
+            report(32, 10),
+            report(100, 10), report(100, 0)]):
+        assert guard.check() is True
+        # still above the budget, but nothing new to drop
+        assert guard.check() is False
+        assert guard.check() is True
+        assert guard.check() is False
+        assert guard.check() is True
+
+    assert remote.trim_caches.call_count == 3
+
+
+def test_start_stop():
+    guard = MemoryGuard([], 64)
+    guard.interval = 0.01
+
+    with mock.patch.object(guard, 'check') as check:
+        guard.start()
+        guard._stopped.wait(0.05)
+        guard.stop()
+
+    assert check.called
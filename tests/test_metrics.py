@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from mopidy_emby import utils
+from mopidy_emby.metrics import Metrics, endpoint, metrics
+
+
+@pytest.mark.parametrize('url,expected', [
+    (
+        'https://foo.bar:443/Users/2ec276a2642e54a19b612b9418a8bd3b/Items'
+        '?ParentId=eb169f4ba53fc560f549cb0f2a47d577&format=json',
+        '/Users/{id}/Items'
+    ),
+    (
+        'http://foo.bar:8096/Audio/18e5a9871e6a4a2294d5af998457ca16/stream',
+        '/Audio/{id}/stream'
+    ),
+    (
+        'http://foo.bar:8096/Users/2ec276a2642e54a19b612b9418a8bd3b/Items/7863'
+        '?format=json',
+        '/Users/{id}/Items/{id}'
+    ),
+    ('/Playlists/42/Items?StartIndex=100', '/Playlists/{id}/Items'),
+    ('/Users/Public?format=json', '/Users/Public'),
+])
+def test_endpoint(url, expected):
+    assert endpoint(url) == expected
+
+
+def test_counters_and_gauges():
+    registry = Metrics()
+    registry.inc('emby_requests_total', endpoint='/Foo')
+    registry.inc('emby_requests_total', 2, endpoint='/Foo')
+    registry.set('emby_worker_queue_depth', 3)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot['counters'] == [{
+        'name': 'emby_requests_total',
+        'labels': {'endpoint': '/Foo'},
+        'value': 3
+    }]
+    assert snapshot['gauges'][0]['value'] == 3
+
+
+def test_histogram():
+    registry = Metrics()
+    registry.observe('emby_request_seconds', 0.003, endpoint='/Foo')
+    registry.observe('emby_request_seconds', 0.2, endpoint='/Foo')
+
+    histogram = registry.snapshot()['histograms'][0]['value']
+
+    assert histogram['count'] == 2
+    assert histogram['sum'] == pytest.approx(0.203)
+    assert histogram['buckets'][0.005] == 1
+    assert histogram['buckets'][0.25] == 2
+
+
+def test_timed():
+    registry = Metrics()
+
+    @registry.timed('emby_processing_seconds')
+    def create_track(track):
+        return track
+
+    assert create_track('foo') == 'foo'
+    assert registry.snapshot()['histograms'][0]['labels'] == {
+        'function': 'create_track'
+    }
+
+
+def test_cache_hit_ratios():
+    metrics.reset()
+
+    @utils.cache()
+    def get_item(item_id):
+        return item_id
+
+    for i in range(4):
+        get_item(1)
+
+    assert metrics.cache_hit_ratios() == {'get_item': 0.75}
+
+
+def test_prometheus():
+    registry = Metrics()
+    registry.inc('emby_requests_total', endpoint='/Foo', status=200)
+    registry.observe('emby_request_seconds', 0.02, endpoint='/Foo')
+
+    text = registry.prometheus()
+
+    assert '# TYPE emby_requests_total counter\n' in text
+    assert 'emby_requests_total{endpoint="/Foo",status="200"} 1\n' in text
+    assert '# TYPE emby_request_seconds histogram\n' in text
+    assert 'emby_request_seconds_bucket{endpoint="/Foo",le="0.01"} 0\n' \
+        in text
+    assert 'emby_request_seconds_bucket{endpoint="/Foo",le="0.025"} 1\n' \
+        in text
+    assert 'emby_request_seconds_bucket{endpoint="/Foo",le="+Inf"} 1\n' \
+        in text
+    assert 'emby_request_seconds_count{endpoint="/Foo"} 1\n' in text
@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+import random
+
+import mock
+
+from mopidy.models import Album, Artist, Track
+
+import pytest
+
+from mopidy_emby.federation import Federation, Source
+from mopidy_emby.mixes import QueueBuilder, unique, weighted_sample
+
+
+def track(number, album=None, name=None, artist='Artist'):
+    return Track(
+        uri='emby:track:{}'.format(number),
+        name=name or 'Track {}'.format(number),
+        artists=[Artist(name=artist)],
+        album=Album(
+            uri=None if album is None else 'emby:album:{}'.format(album))
+    )
+
+
+def test_weighted_sample():
+    items = list(range(1000))
+
+    sample = weighted_sample(items, 100, rng=random.Random(1))
+
+    assert len(sample) == 100
+    assert len(set(sample)) == 100
+    assert sample != sorted(sample)
+    assert weighted_sample(items[:3], 100) != []
+    assert sorted(weighted_sample(items[:3], 100)) == [0, 1, 2]
+
+
+def test_weighted_sample_weights():
+    rng = random.Random(1)
+    picked = {'heavy': 0, 'light': 0}
+
+    for _ in range(500):
+        for item in weighted_sample(
+                ['heavy', 'light', 'never'], 1,
+                weight=lambda i: {'heavy': 9, 'light': 1, 'never': 0}[i],
+                rng=rng):
+            picked[item] += 1
+
+    assert picked['heavy'] > 5 * picked['light'] > 0
+
+
+def test_unique():
+    tracks = [
+        track(1),
+        track(1),
+        track(2, name='Track 1'),
+        track(3, name='Track 1', artist='Other'),
+    ]
+
+    assert [t.uri for t in unique(tracks)] == [
+        'emby:track:1', 'emby:track:3'
+    ]
+
+
+@pytest.fixture
+def federation():
+    federation = Federation([
+        Source(None, mock.Mock()),
+        Source('office', mock.Mock()),
+    ])
+
+    yield federation
+
+    federation.close()
+
+
+def test_shuffle(federation):
+    # one big album and a few singles
+    federation.primary.remote.get_random_tracks.return_value = [
+        track(i, album='big') for i in range(50)
+    ] + [track(i, album=i) for i in range(50, 65)]
+    federation.sources['office'].remote.get_random_tracks.return_value = [
+        track(i, album=i, artist='Office') for i in range(5)
+    ]
+    queues = QueueBuilder(federation, size=10, rng=random.Random(1))
+
+    tracks = queues.shuffle()
+
+    federation.primary.remote.get_random_tracks.assert_called_once_with(20)
+    assert len(tracks) == 10
+    assert len(set(t.uri for t in tracks)) == 10
+    assert sum(t.album.uri == 'emby:album:big' for t in tracks) < 5
+    assert any(t.uri.startswith('emby:office:') for t in tracks)
+
+
+def test_random_album(federation):
+    office = federation.sources['office']
+    federation.primary.remote.get_music_albums.return_value = []
+    office.remote.get_music_albums.return_value = [{'Id': 'a', 'Name': 'A'}]
+    office.remote.get_album_tracks.return_value = [track(1, album='a')]
+
+    tracks = QueueBuilder(federation).random_album()
+
+    office.remote.get_album_tracks.assert_called_once_with('a')
+    assert [t.uri for t in tracks] == ['emby:office:track:1']
+
+
+def test_random_album_empty(federation):
+    for source in federation.sources.values():
+        source.remote.get_music_albums.return_value = []
+
+    assert QueueBuilder(federation).random_album() == []
+
+
+def test_instant_mix(federation):
+    remote = federation.primary.remote
+    remote.get_instant_mix.return_value = [
+        track(1), track(1), track(2), track(3)
+    ]
+
+    tracks = QueueBuilder(federation, size=2).instant_mix(remote, 'x')
+
+    remote.get_instant_mix.assert_called_once_with('x', 2)
+    assert [t.uri for t in tracks] == ['emby:track:1', 'emby:track:2']
@@ -1,5 +1,9 @@
 from __future__ import unicode_literals
 
+import mock
+
+from mopidy.models import Track
+
 import pytest
 
 
@@ -18,3 +22,71 @@ import pytest
 ])
 def test_translate_uri(playbackprovider, uri, expected):
     assert playbackprovider.translate_uri(uri) in expected
+
+
+def test_translate_uri_cached(playbackprovider, mocker):
+    stream_cache = mock.Mock()
+    stream_cache.get.return_value = 'file:///cache/123.abc'
+    playbackprovider.backend.stream_cache = stream_cache
+    mocker.patch.object(playbackprovider.backend.remote, 'get_track',
+                        return_value=Track(uri='emby:track:123'))
+
+    assert playbackprovider.translate_uri('emby:track:123') == \
+        'file:///cache/123.abc'
+    assert not stream_cache.fetch.called
+
+
+def test_translate_uri_fetches_uncached(playbackprovider, mocker):
+    stream_cache = mock.Mock()
+    stream_cache.get.return_value = None
+    stream_cache.fetch.return_value = None
+    playbackprovider.backend.stream_cache = stream_cache
+    mocker.patch.object(playbackprovider.backend.remote, 'get_track',
+                        return_value=Track(uri='emby:track:123'))
+
+    url = playbackprovider.translate_uri('emby:track:123')
+
+    assert url.startswith('https://foo.bar:443/Audio/123/stream')
+    stream_cache.fetch.assert_called_once_with(
+        '123', stream_cache.track_version.return_value, url
+    )
+
+
+def test_translate_uri_plays_along_with_download(playbackprovider):
+    stream_cache = mock.Mock()
+    stream_cache.get.return_value = None
+    stream_cache.fetch.return_value = 'http://127.0.0.1/emby/stream/123.abc'
+    playbackprovider.backend.stream_cache = stream_cache
+    playbackprovider.backend.remote.get_track = mock.Mock()
+
+    assert playbackprovider.translate_uri('emby:track:123') == \
+        'http://127.0.0.1/emby/stream/123.abc'
+
+
+def test_change_track_takes_version_from_model(playbackprovider, mocker):
+    stream_cache = mock.Mock()
+    stream_cache.get.return_value = 'file:///cache/123.abc'
+    playbackprovider.backend.stream_cache = stream_cache
+    get_item = mocker.patch.object(playbackprovider.backend.remote,
+                                   'get_item')
+    get_track = mocker.patch.object(playbackprovider.backend.remote,
+                                    'get_track')
+    track = Track(uri='emby:track:123', length=1000)
+
+    assert playbackprovider.change_track(track) is True
+
+    stream_cache.track_version.assert_called_once_with(track)
+    playbackprovider.audio.set_uri.assert_called_once_with(
+        'file:///cache/123.abc', live_stream=False, download=False
+    )
+    assert not get_item.called
+    assert not get_track.called
+
+
+def test_pin_tracks(playbackprovider):
+    playbackprovider.backend.stream_cache = mock.Mock()
+
+    playbackprovider.pin_tracks(['emby:track:1', 'spotify:track:2'])
+
+    pinned = playbackprovider.backend.stream_cache.pin.call_args[0][0]
+    assert list(pinned) == ['1']
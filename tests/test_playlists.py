@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+from mopidy.models import Playlist, Ref, Track
+
+import pytest
+
+from mopidy_emby.playlists import EmbyPlaylistsProvider
+
+
+@pytest.fixture
+def playlistsprovider(backend_mock):
+    remote = backend_mock.remote
+    remote.get_playlists.return_value = [
+        {'Id': '1', 'Name': 'Playlist 1'},
+    ]
+    remote.get_playlist.return_value = {'Id': '1', 'Name': 'Playlist 1'}
+    remote.iter_playlist_items.return_value = [
+        {'Id': '10', 'Type': 'Audio'},
+        {'Id': '11', 'Type': 'Video'},
+        {'Id': '12', 'Type': 'Audio'},
+    ]
+    remote.create_track.side_effect = lambda item: Track(
+        uri='emby:track:{}'.format(item['Id'])
+    )
+    remote.create_track_ref.side_effect = lambda item: Ref.track(
+        uri='emby:track:{}'.format(item['Id'])
+    )
+
+    return EmbyPlaylistsProvider(backend=backend_mock)
+
+
+def test_as_list(playlistsprovider):
+    assert playlistsprovider.as_list() == [
+        Ref.playlist(uri='emby:playlist:1', name='Playlist 1')
+    ]
+
+
+def test_get_items(playlistsprovider):
+    assert playlistsprovider.get_items('emby:playlist:1') == [
+        Ref.track(uri='emby:track:10'),
+        Ref.track(uri='emby:track:12'),
+    ]
+    playlistsprovider.backend.remote.iter_playlist_items \
+        .assert_called_once_with('1')
+
+
+def test_lookup(playlistsprovider):
+    assert playlistsprovider.lookup('emby:playlist:1') == Playlist(
+        uri='emby:playlist:1',
+        name='Playlist 1',
+        tracks=[Track(uri='emby:track:10'), Track(uri='emby:track:12')]
+    )
+
+
+def test_lookup_unknown(playlistsprovider):
+    playlistsprovider.backend.remote.get_playlist.return_value = None
+
+    assert playlistsprovider.lookup('emby:playlist:2') is None
+
+
+@pytest.mark.parametrize('uri', ['emby:track:1', 'emby:playlist:1:2'])
+def test_invalid_uri(uri, playlistsprovider):
+    assert playlistsprovider.get_items(uri) is None
+    assert playlistsprovider.lookup(uri) is None
@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import pytest
+
+from mopidy_emby.profiling import Profile, Profiler
+
+
+def test_phases_are_exclusive():
+    profile = Profile('browse', 'emby:directory:root')
+
+    profile.enter('model')
+    time.sleep(0.02)
+    profile.enter('network')
+    time.sleep(0.05)
+    profile.exit()
+    profile.exit()
+    profile.finish()
+
+    assert profile.phases['network'] == pytest.approx(0.05, abs=0.02)
+    assert profile.phases['model'] == pytest.approx(0.02, abs=0.02)
+    assert profile.duration == pytest.approx(
+        sum(profile.phases.values()), abs=0.001)
+
+
+def test_not_sampled():
+    profiler = Profiler(sample_rate=0.0)
+
+    def browse(uri):
+        with profiler.phase('network'):
+            assert profiler.current is None
+        return uri
+
+    assert profiler.wrap('browse', 'emby:', browse) is browse
+    assert browse('emby:') == 'emby:'
+    assert profiler.slowest() == []
+
+
+def test_sampled():
+    profiler = Profiler(sample_rate=1.0)
+
+    @profiler.phased('model')
+    def create_track():
+        time.sleep(0.01)
+
+    def lookup(uri):
+        with profiler.phase('network'):
+            time.sleep(0.01)
+        create_track()
+        return [uri]
+
+    profiled = profiler.wrap('lookup', 'emby:track:1', lookup)
+
+    assert profiled('emby:track:1') == ['emby:track:1']
+    assert profiler.current is None
+
+    slowest = profiler.slowest()
+    assert len(slowest) == 1
+    assert slowest[0]['operation'] == 'lookup'
+    assert slowest[0]['target'] == 'emby:track:1'
+    assert set(slowest[0]['phases']) == set(['network', 'model', 'other'])
+
+
+def test_keeps_slowest():
+    profiler = Profiler(sample_rate=1.0, slowest=2)
+
+    for delay in (0.03, 0.0, 0.02, 0.01):
+        profiler.wrap('browse', delay, time.sleep)(delay)
+
+    assert [p['target'] for p in profiler.slowest()] == [0.03, 0.02]
+
+
+def test_records_on_exception():
+    profiler = Profiler(sample_rate=1.0)
+
+    def fail():
+        raise Exception('Cant connect to Emby API')
+
+    with pytest.raises(Exception):
+        profiler.wrap('search', {'any': ['foo']}, fail)()
+
+    assert profiler.slowest()[0]['target'] == {'any': ['foo']}
+
+
+def test_carry_to_other_threads():
+    profiler = Profiler(sample_rate=1.0)
+
+    def fetch(delay):
+        with profiler.phase('network'):
+            time.sleep(delay)
+
+    def browse():
+        with profiler.phase('model'):
+            threads = [
+                threading.Thread(target=profiler.carry(fetch), args=(d,))
+                for d in (0.05, 0.01)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            profiler.join()
+
+    profiler.wrap('browse', 'emby:', browse)()
+
+    phases = profiler.slowest()[0]['phases']
+    assert phases['network'] == pytest.approx(0.05, abs=0.02)
+    assert phases['model'] < 0.02
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+
+from urllib.parse import urlencode
+
+import pytest
+
+from mopidy_emby import query
+from mopidy_emby.query import Query
+
+
+@pytest.mark.parametrize('q,extra,expected', [
+    (
+        Query(),
+        {},
+        'EnableImages=true&EnableImageTypes=Primary%2CBackdrop'
+        '&ImageTypeLimit=1&EnableUserData=false'
+    ),
+    (
+        Query(types=('Audio', 'MusicAlbum'), sort_by=('SortName',),
+              fields=('Genres', 'Etag'), recursive=True, images=False,
+              user_data=True),
+        {'ParentId': '1', 'Limit': 10},
+        'Recursive=true&IncludeItemTypes=Audio%2CMusicAlbum'
+        '&SortBy=SortName&SortOrder=Ascending&Fields=Genres%2CEtag'
+        '&EnableImages=false&EnableUserData=true&Limit=10&ParentId=1'
+    ),
+    (
+        query.CHILDREN,
+        {'ParentId': '1'},
+        'SortBy=ParentIndexNumber%2CIndexNumber%2CSortName'
+        '&SortOrder=Ascending&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&ParentId=1'
+    ),
+    (
+        query.ALBUM_TRACKS,
+        {'ParentId': '1'},
+        'IncludeItemTypes=Audio'
+        '&SortBy=ParentIndexNumber%2CIndexNumber%2CSortName'
+        '&SortOrder=Ascending&Fields=DateCreated%2CDateModified%2CGenres'
+        '%2CMediaSources%2CParentId%2CProviderIds%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&ParentId=1'
+    ),
+    (
+        query.PLAYLISTS,
+        {},
+        'Recursive=true&IncludeItemTypes=Playlist&SortBy=SortName'
+        '&SortOrder=Ascending&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false'
+    ),
+])
+def test_params(q, extra, expected):
+    assert urlencode(q.params(**extra)) == expected
@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
 import json
+import time
 
 import mock
 
@@ -11,6 +12,8 @@ import pytest
 import requests
 
 from mopidy_emby import backend
+from mopidy_emby.client import Retry
+from mopidy_emby.metrics import metrics
 
 
 @pytest.mark.parametrize('hostname,url,expected', [
@@ -31,6 +34,20 @@ def test_api_url(password_data_mock, get_user_mock, create_header_mock,
     assert emby.api_url(url) == expected
 
 
+@pytest.mark.parametrize('url,params,expected', [
+    ('/Foo', None, 'https://foo.bar:443/Foo?format=json'),
+    ('/Foo?a=1', None, 'https://foo.bar:443/Foo?a=1&format=json'),
+    ('/Foo', {'a': 1}, 'https://foo.bar:443/Foo?a=1&format=json'),
+    (
+        '/Foo?a=1',
+        {'b': 'x y'},
+        'https://foo.bar:443/Foo?a=1&b=x+y&format=json'
+    ),
+])
+def test_api_url_params(url, params, expected, emby_client):
+    assert emby_client.api_url(url, params) == expected
+
+
 @pytest.mark.parametrize('data,expected', [
     ('tests/data/get_music_root0.json', 'eb169f4ba53fc560f549cb0f2a47d577')
 ])
@@ -61,9 +78,10 @@ def test_get_music_root_cant_find(r_get_mock, data, expected, emby_client):
     assert expected in str(execinfo.value)
 
 
-@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_root')
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['root'])
 @mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
-def test_get_artists(r_get_mock, get_music_root_mock, emby_client):
+def test_get_artists(r_get_mock, get_music_roots_mock, emby_client):
     expected = [
         Ref(name=u'Chairlift',
             type='artist',
@@ -82,9 +100,10 @@ def test_get_artists(r_get_mock, get_music_root_mock, emby_client):
     assert emby_client.get_artists() == expected
 
 
-@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_root')
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['root'])
 @mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
-def test_get_albums(r_get_mock, get_music_root_mock, emby_client):
+def test_get_albums(r_get_mock, get_music_roots_mock, emby_client):
     expected = [
         Ref(name=u'American Football',
             type='album',
@@ -103,9 +122,10 @@ def test_get_albums(r_get_mock, get_music_root_mock, emby_client):
     assert emby_client.get_albums(0) == expected
 
 
-@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_root')
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['root'])
 @mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
-def test_get_tracks(r_get_mock, get_music_root_mock, emby_client):
+def test_get_tracks(r_get_mock, get_music_roots_mock, emby_client):
     expected = [
         Ref(name=u'The One With the Tambourine',
             type='track',
@@ -124,12 +144,32 @@ def test_get_tracks(r_get_mock, get_music_root_mock, emby_client):
     assert emby_client.get_tracks(0) == expected
 
 
+CHAIRLIFT = Artist(
+    uri='emby:artist:e0361aff955c30f5a6dcc6fcf0c9d1cf',
+    name=u'Chairlift',
+    musicbrainz_id='a3cd61ef-7fd4-44af-a27f-99641a82b22b'
+)
+
+MOTH = Album(
+    uri='emby:album:ccb5e9bd85119952eb9ad5a46133fafc',
+    name=u'Moth',
+    artists=[CHAIRLIFT],
+    date='2016-01-22',
+    musicbrainz_id='13c6ad1f-ac2c-47d1-b5b3-fb75b6679c81'
+)
+
+
 @pytest.mark.parametrize('data,expected', [
     (
         'tests/data/track0.json',
         Track(
-            album=Album(artists=[Artist(name=u'Chairlift')], name=u'Moth'),
-            artists=[Artist(name=u'Chairlift')],
+            album=MOTH,
+            artists=[CHAIRLIFT],
+            bitrate=245,
+            date='2016-01-22',
+            disc_no=1,
+            genre=u'Electronic',
+            last_modified=1480072143000,
             length=295915,
             name=u'Ottawa to Osaka',
             track_no=6,
@@ -139,8 +179,13 @@ def test_get_tracks(r_get_mock, get_music_root_mock, emby_client):
     (
         'tests/data/track1.json',
         Track(
-            album=Album(artists=[Artist(name=u'Chairlift')], name=u'Moth'),
-            artists=[Artist(name=u'Chairlift')],
+            album=MOTH,
+            artists=[CHAIRLIFT],
+            bitrate=244,
+            date='2016-01-22',
+            disc_no=1,
+            genre=u'Electronic',
+            last_modified=1480072143000,
             length=269035,
             name=u'Crying in Public',
             track_no=5,
@@ -150,8 +195,13 @@ def test_get_tracks(r_get_mock, get_music_root_mock, emby_client):
     (
         'tests/data/track2.json',
         Track(
-            album=Album(artists=[Artist(name=u'Chairlift')], name=u'Moth'),
-            artists=[Artist(name=u'Chairlift')],
+            album=MOTH,
+            artists=[CHAIRLIFT],
+            bitrate=242,
+            date='2016-01-22',
+            disc_no=1,
+            genre=u'Electronic',
+            last_modified=1480072143000,
             length=283115,
             name=u'Polymorphing',
             track_no=2,
@@ -167,18 +217,9 @@ def test_create_track(data, expected, emby_client):
 
 
 @pytest.mark.parametrize('data,expected', [
-    (
-        'tests/data/track0.json',
-        Album(artists=[Artist(name=u'Chairlift')], name=u'Moth')
-    ),
-    (
-        'tests/data/track1.json',
-        Album(artists=[Artist(name=u'Chairlift')], name=u'Moth')
-    ),
-    (
-        'tests/data/track2.json',
-        Album(artists=[Artist(name=u'Chairlift')], name=u'Moth')
-    ),
+    ('tests/data/track0.json', MOTH),
+    ('tests/data/track1.json', MOTH),
+    ('tests/data/track2.json', MOTH),
 ])
 def test_create_album(data, expected, emby_client):
     with open(data, 'r') as f:
@@ -188,18 +229,9 @@ def test_create_album(data, expected, emby_client):
 
 
 @pytest.mark.parametrize('data,expected', [
-    (
-        'tests/data/track0.json',
-        [Artist(name=u'Chairlift')]
-    ),
-    (
-        'tests/data/track1.json',
-        [Artist(name=u'Chairlift')]
-    ),
-    (
-        'tests/data/track2.json',
-        [Artist(name=u'Chairlift')]
-    ),
+    ('tests/data/track0.json', [CHAIRLIFT]),
+    ('tests/data/track1.json', [CHAIRLIFT]),
+    ('tests/data/track2.json', [CHAIRLIFT]),
 ])
 def test_create_artists(data, expected, emby_client):
     with open(data, 'r') as f:
@@ -208,6 +240,57 @@ def test_create_artists(data, expected, emby_client):
     assert emby_client.create_artists(track) == expected
 
 
+def test_create_track_last_modified(emby_client):
+    item = {
+        'Id': 'abc',
+        'Name': 'Track',
+        'ArtistItems': [],
+        'RunTimeTicks': 10000,
+        'DateCreated': '2016-11-25T11:09:03.0000000Z',
+    }
+
+    assert emby_client.create_track(item).last_modified == 1480072143000
+
+    item['DateModified'] = '2016-11-26T11:09:03.0000000Z'
+
+    assert emby_client.create_track(item).last_modified == 1480158543000
+
+
+def test_create_track_without_details(emby_client):
+    track = emby_client.create_track({
+        'Id': 'abc',
+        'Name': 'Track',
+        'Album': 'Album',
+        'AlbumId': 'def',
+        'ArtistItems': [{'Id': 'a1', 'Name': 'One'}, {'Name': 'Two'}],
+        'ProductionYear': 1999,
+        'People': [{'Name': 'Writer', 'Type': 'Composer'},
+                   {'Name': 'Singer', 'Type': 'Actor'}],
+        'ProviderIds': {'MusicBrainzArtist': 'mbid'},
+        'RunTimeTicks': 10000,
+    })
+
+    assert track.date == '1999'
+    assert track.bitrate is None
+    assert track.last_modified is None
+    assert set(a.uri for a in track.artists) == {'emby:artist:a1', None}
+    assert set(a.musicbrainz_id for a in track.artists) == {None}
+    assert [c.name for c in track.composers] == ['Writer']
+    # no album artists, the track artists are used
+    assert track.album.artists == frozenset(track.artists)
+    assert track.album.uri == 'emby:album:def'
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('2016-11-25T11:09:03.0000000Z', 1480072143000),
+    ('2016-11-25T11:09:03Z', 1480072143000),
+    ('garbage', None),
+    (None, None),
+])
+def test_timestamp(value, expected, emby_client):
+    assert emby_client.timestamp(value) == expected
+
+
 @pytest.mark.parametrize('data,user_id', [
     ('tests/data/get_user0.json', '2ec276a2642e54a19b612b9418a8bd3b')
 ])
@@ -242,11 +325,19 @@ def test_get_user_exception(password_mock, create_headers_mock,
 
     get_mock.return_value = mock_response
 
+    emby = backend.EmbyHandler(config)
+
     with pytest.raises(Exception) as execinfo:
-        backend.EmbyHandler(config)
+        emby.connect()
 
     assert 'No Emby user embyuser found' in str(execinfo.value)
 
+    # tried again on next use
+    with pytest.raises(Exception):
+        emby.user_id
+
+    assert get_mock.call_count == 2
+
 
 @pytest.mark.parametrize('data,token', [
     ('tests/data/get_token0.json', 'f0d6b372b40b47299ed01b9b2d40489b'),
@@ -384,6 +475,22 @@ def test_search(get_search_mock, query, data, expected, emby_client):
     assert emby_client.search(query) == expected
 
 
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_search_cached(r_get_mock, emby_client):
+    r_get_mock.return_value = {'SearchHints': []}
+
+    emby_client.search({'track_name': ['viva hate'], 'album': ['viva']})
+    emby_client.search({'album': ['viva'], 'track_name': ['viva hate']})
+
+    assert r_get_mock.call_count == 2
+
+    emby_client.search({'album': ['viva']})
+
+    assert r_get_mock.call_count == 3
+
+    backend.EmbyHandler.get_search_results.cache.clear()
+
 @mock.patch('mopidy_emby.backend.EmbyHandler._get_session')
 def test_r_get(session_mock, emby_client):
     data = {'foo': 'bar'}
@@ -556,3 +663,771 @@ def test_lookup_artist(r_get_mock, emby_client):
             uri='emby:track:057801bc10cf08ce96e1e19bf98c407f'
         )
      ]
+
+
+@pytest.mark.parametrize('kind,method', [
+    ('track', 'get_item'),
+    ('album', 'find_album'),
+    ('artist', 'find_artist_album'),
+])
+def test_get_images(kind, method, emby_client):
+    item = {'Id': '1', 'ImageTags': {'Primary': 'a'}}
+
+    with mock.patch.object(emby_client, method, return_value=item):
+        images = emby_client.get_images(kind, '1')
+
+    assert [i.uri for i in images] == [
+        'https://foo.bar:443/emby/Items/1/Images/Primary'
+        '?maxHeight=400&maxWidth=400&tag=a'
+    ]
+
+
+def test_get_images_unknown(emby_client):
+    assert emby_client.get_images('foo', '1') == []
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler._get_session')
+def test_r_get_many(session_mock, emby_client):
+    session_mock.return_value.get.side_effect = lambda url: mock.Mock(
+        status_code=200,
+        content=b'{}',
+        json=mock.Mock(return_value={'url': url})
+    )
+
+    assert emby_client.r_get_many(['http://a', 'http://b']) == [
+        {'url': 'http://a'},
+        {'url': 'http://b'},
+    ]
+
+    emby_client.close()
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_tracks_by_ids(r_get_mock, emby_client):
+    items = []
+    for name in ('track0', 'track1'):
+        with open('tests/data/{}.json'.format(name), 'r') as f:
+            items.append(json.load(f))
+    r_get_mock.return_value = {'Items': items}
+
+    tracks = emby_client.get_tracks_by_ids([
+        '37f57f0b370274af96de06895a78c2c3',
+        'missing',
+        '18e5a9871e6a4a2294d5af998457ca16',
+    ])
+
+    r_get_mock.assert_called_once_with(
+        'https://foo.bar:443/Users/mock/Items?'
+        'Fields=DateCreated%2CDateModified%2CGenres%2CMediaSources%2C'
+        'ParentId%2CProviderIds%2CSortName&EnableImages=true&'
+        'EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1&'
+        'EnableUserData=false&Ids=37f57f0b370274af96de06895a78c2c3%2C'
+        'missing%2C18e5a9871e6a4a2294d5af998457ca16&format=json'
+    )
+    assert [t.uri for t in tracks] == [
+        'emby:track:37f57f0b370274af96de06895a78c2c3',
+        'emby:track:18e5a9871e6a4a2294d5af998457ca16',
+    ]
+
+
+def test_get_tracks_by_ids_empty(emby_client):
+    assert emby_client.get_tracks_by_ids([]) == []
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_album_items')
+def test_get_album_tracks(get_album_items_mock, emby_client):
+    with open('tests/data/track0.json', 'r') as f:
+        track = json.load(f)
+    get_album_items_mock.return_value = {'Items': [track]}
+
+    tracks = emby_client.get_album_tracks('ccb5e9bd85119952eb9ad5a46133fafc')
+
+    get_album_items_mock.assert_called_once_with(
+        'ccb5e9bd85119952eb9ad5a46133fafc')
+    assert [t.album for t in tracks] == [MOTH]
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler._get_session')
+def test_r_get_invalid_json(session_mock, emby_client):
+    session_mock.return_value.get.return_value.json.side_effect = \
+        ValueError('No JSON object could be decoded')
+
+    with pytest.raises(Exception) as execinfo:
+        emby_client.r_get('http://foo.bar')
+
+    assert 'Emby API sent no valid JSON' in str(execinfo.value)
+
+
+def album(album_id, name, parent_id='root'):
+    return {'Id': album_id, 'Name': name, 'Type': 'MusicAlbum',
+            'ParentId': parent_id}
+
+
+def test_apply_library_changes(emby_client):
+    backend.EmbyHandler.get_item_type.cache.cache[
+        (emby_client, 'root', 'MusicAlbum')
+    ] = ({'Items': [album('1', 'Old'), album('3', 'Gone'), album('5', 'Kept')],
+          'TotalRecordCount': 3}, 0)
+    backend.EmbyHandler.get_directory.cache.cache.update({
+        (emby_client, 'artist'): ({'Items': [album('3', 'Gone')]}, 0),
+        (emby_client, 'other'): ({'Items': [album('5', 'Kept')]}, 0),
+        (emby_client, 'parent'): ({'Items': []}, 0),
+    })
+    backend.EmbyHandler.get_album_items.cache.cache.update({
+        (emby_client, '3'): ({'Items': []}, 0),
+        (emby_client, '5'): ({'Items': []}, 0),
+    })
+    backend.EmbyHandler.get_item.cache.cache[(emby_client, '1')] = ({}, 0)
+    backend.EmbyHandler.get_latest_albums.cache.cache[(emby_client,)] = \
+        ([], 0)
+
+    with mock.patch.object(emby_client, 'get_items', return_value=[
+            album('1', 'New'), album('2', 'Added', parent_id='parent')]):
+        emby_client.apply_library_changes(
+            added=['2'], updated=['1'], removed=['3']
+        )
+
+    value, _ = backend.EmbyHandler.get_item_type.cache.cache[
+        (emby_client, 'root', 'MusicAlbum')]
+    assert [i['Name'] for i in value['Items']] == ['Added', 'Kept', 'New']
+    assert value['TotalRecordCount'] == 3
+
+    get_directory = backend.EmbyHandler.get_directory.cache.cache
+    assert (emby_client, 'artist') not in get_directory
+    assert (emby_client, 'parent') not in get_directory
+    assert (emby_client, 'other') in get_directory
+    get_album_items = backend.EmbyHandler.get_album_items.cache.cache
+    assert (emby_client, '3') not in get_album_items
+    assert (emby_client, '5') in get_album_items
+    assert (emby_client, '1') not in backend.EmbyHandler.get_item.cache.cache
+    assert (emby_client,) not in \
+        backend.EmbyHandler.get_latest_albums.cache.cache
+
+
+def test_album_artists_are_interned(emby_client):
+    artists = [{'Id': 'a', 'Name': 'Chairlift'}]
+    albums = [dict(album(album_id, name), AlbumArtists=artists,
+                   ArtistItems=artists)
+              for album_id, name in (('1', 'Moth'), ('2', 'Something'))]
+
+    with mock.patch.object(emby_client, 'get_music_albums',
+                           return_value=albums):
+        listed = emby_client.list_albums()
+        looked_up = emby_client.lookup_artist('a')
+        found = emby_client.create_album_id('2')
+
+    artist = emby_client.interner.artist('a', 'Chairlift')
+    assert artist.uri == 'emby:artist:a'
+    for model in listed + looked_up + [found]:
+        shared, = model.artists
+        assert shared is artist
+
+
+def test_processing_time_excludes_fetching(emby_client):
+    metrics.reset()
+
+    def get_music_albums():
+        time.sleep(0.2)
+        return [album('1', 'Album')]
+
+    with mock.patch.object(emby_client, 'get_music_albums',
+                           side_effect=get_music_albums):
+        emby_client.find_album('1')
+
+    histogram, = [
+        h['value'] for h in metrics.snapshot()['histograms']
+        if h['name'] == 'emby_processing_seconds'
+    ]
+    assert histogram['count'] == 1
+    assert histogram['sum'] < 0.1
+
+
+def test_apply_library_changes_keeps_genres(emby_client):
+    key = (emby_client, 'root', 'MusicAlbum')
+    backend.EmbyHandler.get_item_type.cache.cache[key] = ({
+        'Items': [dict(album('1', 'Old'), Genres=['Rock'])],
+        'TotalRecordCount': 1,
+    }, time.time())
+
+    def r_get(url):
+        # the server only sends the fields asked for
+        item = album('1', 'New')
+        if 'Genres' in url:
+            item['Genres'] = ['Rock', 'Jazz']
+        return {'Items': [item]}
+
+    with mock.patch.object(emby_client, 'r_get', side_effect=r_get), \
+            mock.patch.object(emby_client, 'get_music_roots',
+                              return_value=['root']):
+        emby_client.apply_library_changes(added=[], updated=['1'], removed=[])
+
+        assert emby_client.get_facet_counts('genre') == {'Jazz': 1, 'Rock': 1}
+
+    backend.EmbyHandler.get_item_type.cache.invalidate(*key)
+
+
+def test_events_connected(emby_client):
+    backend.EmbyHandler.get_item.cache.cache[(emby_client, '1')] = ({}, 0)
+
+    emby_client.events_connected()
+
+    assert (emby_client, '1') not in backend.EmbyHandler.get_item.cache.cache
+    assert backend.EmbyHandler.get_item.cache.lifetimes[emby_client] == \
+        (float('inf'), emby_client.event_cache_ttl)
+
+    emby_client.events_disconnected()
+
+    assert emby_client not in backend.EmbyHandler.get_item.cache.lifetimes
+    assert backend.EmbyHandler.get_item.cache.ttl == 3600
+    assert backend.EmbyHandler.get_item.cache.ctl == 8
+
+
+def test_events_connected_per_handler(config, emby_client):
+    other = backend.EmbyHandler(config)
+    now = time.time()
+    get_item = backend.EmbyHandler.get_item.cache.cache
+
+    emby_client.events_connected()
+    try:
+        get_item[(emby_client, '1')] = ({'Id': '1'}, now - 7200)
+        get_item[(other, '1')] = ({'Id': '1'}, now - 7200)
+
+        with mock.patch.object(backend.EmbyHandler, 'r_get',
+                               return_value={'Id': '2'}):
+            assert emby_client.get_item('1') == {'Id': '1'}
+            assert other.get_item('1') == {'Id': '2'}
+    finally:
+        emby_client.events_disconnected()
+        get_item.pop((emby_client, '1'), None)
+        get_item.pop((other, '1'), None)
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_items(r_get_mock, emby_client):
+    r_get_mock.return_value = {'Items': [{'Id': '1'}, {'Id': '2'}]}
+
+    assert emby_client.get_items(['1', '2']) == [{'Id': '1'}, {'Id': '2'}]
+    r_get_mock.assert_called_once_with(
+        'https://foo.bar:443/Users/mock/Items'
+        '?Fields=Genres%2CSortName%2CParentId&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&Ids=1%2C2&format=json'
+    )
+    assert emby_client.get_items([]) == []
+
+
+def test_get_items_chunked(emby_client):
+    emby_client.ids_per_request = 2
+
+    with mock.patch.object(emby_client, 'r_get_many') as r_get_many:
+        r_get_many.return_value = [
+            {'Items': [{'Id': '1'}, {'Id': '2'}]}, {'Items': [{'Id': '3'}]},
+        ]
+
+        assert emby_client.get_items(['1', '2', '3']) == [
+            {'Id': '1'}, {'Id': '2'}, {'Id': '3'},
+        ]
+
+    urls = r_get_many.call_args[0][0]
+    assert len(urls) == 2
+    assert 'Ids=1%2C2' in urls[0]
+    assert 'Ids=3' in urls[1]
+
+
+@pytest.mark.parametrize('kind,items', [
+    ('album', [{'Id': '1', 'ImageTags': {'Primary': 'a'},
+                'AlbumArtists': []}]),
+    ('artist', [{'Id': '9', 'ImageTags': {'Primary': 'a'},
+                 'AlbumArtists': [{'Id': '1'}]}]),
+])
+def test_get_images_many(kind, items, emby_client):
+    with mock.patch.object(emby_client, 'get_music_albums',
+                           return_value=items):
+        images = emby_client.get_images_many(kind, ['1', '2'])
+
+    assert [[i.uri for i in item_images] for item_images in images] == [
+        ['https://foo.bar:443/emby/Items/{}/Images/Primary'
+         '?maxHeight=400&maxWidth=400&tag=a'.format(items[0]['Id'])],
+        [],
+    ]
+
+
+def test_r_post(emby_client):
+    session = mock.Mock()
+    session.post.return_value.status_code = 204
+    emby_client._local.session = session
+
+    emby_client.r_post('https://foo.bar:443/Sessions/Playing', {'ItemId': '1'})
+
+    session.post.assert_called_once_with(
+        'https://foo.bar:443/Sessions/Playing',
+        json={'ItemId': '1'},
+        timeout=10
+    )
+    session.post.return_value.raise_for_status.assert_called_once_with()
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_iter_playlist_items(r_get_mock, emby_client):
+    emby_client.playlist_page_size = 2
+    r_get_mock.side_effect = [
+        {'Items': [{'Id': '1'}, {'Id': '2'}], 'TotalRecordCount': 5},
+        {'Items': [{'Id': '3'}, {'Id': '4'}], 'TotalRecordCount': 5},
+        {'Items': [{'Id': '5'}], 'TotalRecordCount': 5},
+    ]
+
+    assert [i['Id'] for i in emby_client.iter_playlist_items('p')] == [
+        '1', '2', '3', '4', '5'
+    ]
+    assert [c[0][0] for c in r_get_mock.call_args_list] == [
+        'https://foo.bar:443/Playlists/p/Items'
+        '?Fields=DateCreated%2CDateModified%2CGenres%2CMediaSources%2CParentId'
+        '%2CProviderIds%2CSortName'
+        '&EnableImages=true&EnableImageTypes=Primary%2CBackdrop'
+        '&ImageTypeLimit=1&EnableUserData=false'
+        '&Limit=2&StartIndex={}&UserId=mock&format=json'.format(i)
+        for i in (0, 2, 4)
+    ]
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['r1', 'r2'])
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_iter_all_tracks(r_get_mock, get_music_roots_mock, emby_client):
+    with open('tests/data/track0.json', 'r') as f:
+        track = json.load(f)
+    emby_client.export_page_size = 2
+    r_get_mock.side_effect = [
+        {'Items': [track, track], 'TotalRecordCount': 3},
+        {'Items': [track], 'TotalRecordCount': 3},
+        {'Items': [], 'TotalRecordCount': 0},
+    ]
+
+    tracks = list(emby_client.iter_all_tracks())
+
+    assert len(tracks) == 3
+    assert tracks[0].album == MOTH
+    assert [c[0][0] for c in r_get_mock.call_args_list] == [
+        'https://foo.bar:443/Users/mock/Items?Recursive=true'
+        '&IncludeItemTypes=Audio'
+        '&SortBy=AlbumArtist%2CAlbum%2CParentIndexNumber%2CIndexNumber'
+        '&SortOrder=Ascending&Fields=DateCreated%2CDateModified%2CGenres'
+        '%2CMediaSources%2CParentId%2CProviderIds%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&Limit=2&ParentId={}&StartIndex={}'
+        '&format=json'.format(root, start)
+        for root, start in (('r1', 0), ('r1', 2), ('r2', 0))
+    ]
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_instant_mix(r_get_mock, emby_client):
+    with open('tests/data/track0.json', 'r') as f:
+        track = json.load(f)
+    r_get_mock.return_value = {
+        'Items': [track, {'Id': 'v', 'Type': 'MusicVideo'}]
+    }
+
+    tracks = emby_client.get_instant_mix('a1', 50)
+
+    assert [t.uri for t in tracks] == [
+        'emby:track:18e5a9871e6a4a2294d5af998457ca16'
+    ]
+    r_get_mock.assert_called_once_with(
+        'https://foo.bar:443/Items/a1/InstantMix'
+        '?Fields=DateCreated%2CDateModified%2CGenres%2CMediaSources%2CParentId'
+        '%2CProviderIds%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&Limit=50&UserId=mock&format=json'
+    )
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['r1', 'r2'])
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_random_tracks(r_get_mock, get_music_roots_mock, emby_client):
+    with open('tests/data/track0.json', 'r') as f:
+        r_get_mock.return_value = {'Items': [json.load(f)]}
+
+    assert len(emby_client.get_random_tracks(10)) == 2
+    assert [c[0][0] for c in r_get_mock.call_args_list] == [
+        'https://foo.bar:443/Users/mock/Items?Recursive=true'
+        '&IncludeItemTypes=Audio&SortBy=Random&SortOrder=Ascending'
+        '&Fields=DateCreated%2CDateModified%2CGenres%2CMediaSources%2CParentId'
+        '%2CProviderIds%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&Limit=10&ParentId={}&format=json'.format(root)
+        for root in ('r1', 'r2')
+    ]
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['r1', 'r2'])
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_latest(r_get_mock, get_music_roots_mock, emby_client):
+    backend.EmbyHandler.get_latest_albums.cache.invalidate(emby_client)
+    emby_client.shelf_size = 2
+    r_get_mock.side_effect = [
+        [
+            {'Id': 'a', 'Name': 'A', 'Type': 'MusicAlbum',
+             'DateCreated': '2020-01-01T00:00:00.0000000Z'},
+            {'Id': 't', 'Name': 'T', 'Type': 'Audio'},
+        ],
+        [
+            {'Id': 'b', 'Name': 'B', 'Type': 'MusicAlbum',
+             'DateCreated': '2021-01-01T00:00:00.0000000Z'},
+            {'Id': 'c', 'Name': 'C', 'Type': 'MusicAlbum',
+             'DateCreated': '2019-01-01T00:00:00.0000000Z'},
+        ],
+    ]
+
+    refs = emby_client.get_latest()
+
+    assert [(r.uri, r.type) for r in refs] == [
+        ('emby:album:b', 'album'), ('emby:album:a', 'album')
+    ]
+    assert r_get_mock.call_args_list[0][0][0] == (
+        'https://foo.bar:443/Users/mock/Items/Latest'
+        '?IncludeItemTypes=Audio&Fields=DateCreated&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&GroupItems=true&Limit=2&ParentId=r1'
+        '&format=json'
+    )
+
+    # served from the cache
+    emby_client.get_latest()
+    assert r_get_mock.call_count == 2
+
+    backend.EmbyHandler.get_latest_albums.cache.invalidate(emby_client)
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['r1'])
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_most_played(r_get_mock, get_music_roots_mock, emby_client):
+    backend.EmbyHandler.get_most_played_tracks.cache.invalidate(emby_client)
+    r_get_mock.return_value = {'Items': [
+        {'Id': '1', 'Name': 'One', 'UserData': {'PlayCount': 9}},
+        {'Id': '3', 'Name': 'Zero', 'UserData': {'PlayCount': 3}},
+        {'Id': '2', 'Name': 'Two', 'UserData': {'PlayCount': 3}},
+    ]}
+
+    refs = emby_client.get_most_played()
+
+    assert [r.uri for r in refs] == \
+        ['emby:track:1', 'emby:track:2', 'emby:track:3']
+    r_get_mock.assert_called_once_with(
+        'https://foo.bar:443/Users/mock/Items?Recursive=true'
+        '&IncludeItemTypes=Audio&SortBy=PlayCount'
+        '&SortOrder=Descending&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=true&Filters=IsPlayed&Limit=50&ParentId=r1'
+        '&format=json'
+    )
+
+    backend.EmbyHandler.get_most_played_tracks.cache.invalidate(emby_client)
+
+
+def test_get_facets(emby_client):
+    albums = [
+        {'Id': '1', 'Name': 'A', 'Genres': ['Rock'], 'ProductionYear': 1994},
+        {'Id': '2', 'Name': 'B', 'Genres': ['Rock']},
+    ]
+    get_item_type = {'Items': albums}
+
+    with mock.patch.object(emby_client, 'get_music_roots',
+                           return_value=['root']), \
+            mock.patch.object(emby_client, 'get_item_type',
+                              side_effect=lambda *args: get_item_type):
+        facets = emby_client.get_facets()
+
+        assert emby_client.get_facet_counts('genre') == {'Rock': 2}
+        assert [r.uri for r in emby_client.get_facet_albums('year', '1994')] \
+            == ['emby:album:1']
+        assert emby_client.get_facets() is facets
+
+        # the album list got fetched again
+        get_item_type = {'Items': albums[1:]}
+
+        assert emby_client.get_facets() is not facets
+        assert emby_client.get_facet_counts('genre') == {'Rock': 1}
+
+
+def test_get_item_type_paged(emby_client):
+    emby_client.item_page_size = 2
+
+    with mock.patch.object(emby_client, 'r_get') as r_get:
+        r_get.side_effect = [
+            {'Items': [{'Id': '1'}, {'Id': '2'}], 'TotalRecordCount': 3},
+            {'Items': [{'Id': '3'}], 'TotalRecordCount': 3},
+        ]
+
+        assert emby_client.get_item_type('root', 'MusicAlbum') == {
+            'Items': [{'Id': '1'}, {'Id': '2'}, {'Id': '3'}],
+            'TotalRecordCount': 3,
+        }
+
+    assert 'Limit=2&ParentId=root&StartIndex=2' in r_get.call_args[0][0]
+
+
+def test_limit_memory(emby_client):
+    caches = [getattr(backend.EmbyHandler, name).cache
+              for name in backend.EmbyHandler.bounded]
+    try:
+        emby_client.limit_memory(64)
+
+        assert {c.max_entries for c in caches} == {256}
+        assert emby_client.artwork.max_entries == 256
+        assert emby_client.conditional.max_bytes == 1024 * 1024
+        assert emby_client.item_page_size == 500
+    finally:
+        for c in caches:
+            c.max_entries = None
+
+
+def test_trim_caches(emby_client):
+    get_item = backend.EmbyHandler.get_item.cache
+    get_item.cache[(emby_client, '1')] = ({'Id': '1'}, 0)
+    get_item.cache[('other', '1')] = ({'Id': '1'}, 0)
+    emby_client.artwork.template({'Id': '1', 'ImageTags': {'Primary': 'a'}})
+
+    emby_client.trim_caches()
+
+    assert not emby_client.artwork._templates
+
+    assert (emby_client, '1') not in get_item.cache
+    assert ('other', '1') in get_item.cache
+    get_item.invalidate('other', '1')
+
+
+def test_invalidate_playlists(emby_client):
+    backend.EmbyHandler.get_playlists.cache.cache[(emby_client,)] = ([], 0)
+    get_playlist_page = backend.EmbyHandler.get_playlist_page.cache.cache
+    get_playlist_page.update({
+        (emby_client, 'p1', 0): ({}, 0),
+        (emby_client, 'p2', 0): ({}, 0),
+    })
+
+    emby_client.invalidate_playlists(['p1'])
+
+    assert (emby_client,) not in backend.EmbyHandler.get_playlists.cache.cache
+    assert [k for k in get_playlist_page if k[0] is emby_client] == [
+        (emby_client, 'p2', 0)
+    ]
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_get_music_roots_libraries(r_get_mock, emby_client):
+    r_get_mock.return_value = {'Items': [
+        {'Id': '1', 'Name': 'Music', 'CollectionType': 'music'},
+        {'Id': '2', 'Name': 'Movies', 'CollectionType': 'movies'},
+        {'Id': '3', 'Name': 'Audiobooks', 'CollectionType': 'music'},
+        {'Id': '4', 'Name': 'Vinyl', 'CollectionType': 'music'},
+    ]}
+
+    assert emby_client.get_music_roots() == ['1', '3', '4']
+
+    emby_client.libraries = ['Music', 'Vinyl']
+    backend.EmbyHandler.get_music_roots.cache.invalidate(emby_client)
+
+    assert emby_client.get_music_roots() == ['1', '4']
+
+
+@mock.patch('mopidy_emby.remote.requests.post')
+@mock.patch('mopidy_emby.remote.EmbyHandler._get_user')
+def test_stored_credentials(get_user_mock, post_mock, config, tmpdir):
+    config['core'] = {'data_dir': str(tmpdir)}
+    get_user_mock.return_value = [{'Id': 'user'}]
+    post_mock.return_value.status_code = 200
+    post_mock.return_value.json.return_value = {'AccessToken': 'token'}
+
+    backend.EmbyHandler(config).connect()
+    emby = backend.EmbyHandler(config)
+
+    assert emby.user_id == 'user'
+    assert get_user_mock.call_count == 1
+    assert post_mock.call_count == 1
+    assert emby.user_id == 'user'
+    assert emby.headers['x-mediabrowser-token'] == 'token'
+
+
+@mock.patch('mopidy_emby.remote.requests.post')
+@mock.patch('mopidy_emby.remote.EmbyHandler._get_user')
+def test_get_token_api_key(get_user_mock, post_mock, config):
+    get_user_mock.return_value = [{'Id': 'user'}]
+    post_mock.return_value.status_code = 401
+
+    emby = backend.EmbyHandler(config)
+
+    assert emby.token == 'embypassword'
+
+
+@mock.patch('mopidy_emby.remote.requests.post')
+@mock.patch('mopidy_emby.remote.EmbyHandler._get_user')
+def test_get_token_api_key_not_stored(get_user_mock, post_mock, config,
+                                      tmpdir):
+    config['core'] = {'data_dir': str(tmpdir)}
+    get_user_mock.return_value = [{'Id': 'user'}]
+    post_mock.return_value.status_code = 401
+
+    assert backend.EmbyHandler(config).token == 'embypassword'
+    assert backend.EmbyHandler(config).token == 'embypassword'
+
+    assert post_mock.call_count == 2
+    assert 'embypassword' not in ''.join(
+        f.read_text('utf-8') for f in tmpdir.visit() if f.check(file=1)
+    )
+
+
+def test_request_reauthenticates(emby_client):
+    emby_client.connect()
+    emby_client.token = 'old'
+    session = mock.Mock()
+    session.get.side_effect = [
+        mock.Mock(status_code=401, content=b''),
+        mock.Mock(status_code=200, content=b'{}'),
+    ]
+    emby_client._local.session = session
+
+    def authenticate():
+        emby_client.token = 'new'
+
+    with mock.patch.object(emby_client, 'authenticate',
+                           side_effect=authenticate) as authenticate_mock:
+        r = emby_client._request('https://foo.bar:443/Items')
+
+        # a second request with the rejected token doesnt log in again
+        emby_client.reauthenticate('old')
+
+    assert r.status_code == 200
+    assert authenticate_mock.call_count == 1
+    assert session.get.call_count == 2
+
+
+@mock.patch('mopidy_emby.remote.EmbyHandler._get_session')
+def test_r_get_not_modified(session_mock, emby_client):
+    data = {'Items': [{'Id': '1'}]}
+    session = session_mock.return_value
+    session.get.side_effect = [
+        mock.Mock(status_code=200, content=b'{}', headers={'ETag': '"1"'},
+                  json=mock.Mock(return_value=data)),
+        mock.Mock(status_code=304, content=b'', headers={}),
+    ]
+
+    assert emby_client.r_get('https://foo.bar:443/Items') is data
+    assert emby_client.r_get('https://foo.bar:443/Items') is data
+
+    assert session.get.call_args_list[1] == mock.call(
+        'https://foo.bar:443/Items', headers={'If-None-Match': '"1"'}
+    )
+
+
+def test_session_accepts_compression(emby_client):
+    encodings = emby_client._get_session().headers['accept-encoding']
+
+    assert 'gzip' in encodings
+
+
+def test_request_backs_off_when_busy(emby_client):
+    session = mock.Mock()
+    session.get.side_effect = [
+        mock.Mock(status_code=503, content=b'', headers={}),
+        mock.Mock(status_code=429, content=b'',
+                  headers={'Retry-After': '2'}),
+        mock.Mock(status_code=200, content=b'{}'),
+    ]
+    emby_client._local.session = session
+    delays = []
+
+    for attempt in range(2):
+        with pytest.raises(Retry) as execinfo:
+            emby_client._request('https://foo.bar:443/Items', attempt)
+        delays.append(execinfo.value.delay)
+
+    assert delays == [0, 2.0]
+    assert emby_client._request(
+        'https://foo.bar:443/Items', 2).status_code == 200
+
+
+def test_request_gives_up(emby_client):
+    session = mock.Mock()
+    session.get.side_effect = [
+        mock.Mock(status_code=503, content=b'', headers={}),
+        Exception('refused'),
+    ]
+    emby_client._local.session = session
+
+    assert emby_client._request(
+        'https://foo.bar:443/Items', 5).status_code == 503
+    with pytest.raises(Exception) as execinfo:
+        emby_client._request('https://foo.bar:443/Items', 5)
+
+    assert 'Cant connect to Emby API' in str(execinfo.value)
+
+
+@pytest.mark.parametrize('method,args,url', [
+    (
+        'get_directory', ('a',),
+        'https://foo.bar:443/Users/mock/Items'
+        '?SortBy=ParentIndexNumber%2CIndexNumber%2CSortName'
+        '&SortOrder=Ascending&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&ParentId=a&format=json'
+    ),
+    (
+        'get_album_items', ('a',),
+        'https://foo.bar:443/Users/mock/Items'
+        '?IncludeItemTypes=Audio'
+        '&SortBy=ParentIndexNumber%2CIndexNumber%2CSortName'
+        '&SortOrder=Ascending&Fields=DateCreated%2CDateModified%2CGenres'
+        '%2CMediaSources%2CParentId%2CProviderIds%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&ParentId=a&format=json'
+    ),
+    (
+        'get_item_type', ('a', 'MusicAlbum'),
+        'https://foo.bar:443/Users/mock/Items'
+        '?Recursive=true&SortBy=SortName&SortOrder=Ascending'
+        '&Fields=Genres%2CSortName&EnableImages=true'
+        '&EnableImageTypes=Primary%2CBackdrop&ImageTypeLimit=1'
+        '&EnableUserData=false&IncludeItemTypes=MusicAlbum&ParentId=a'
+        '&format=json'
+    ),
+])
+@mock.patch('mopidy_emby.backend.EmbyHandler.r_get')
+def test_query_urls(r_get_mock, method, args, url, emby_client):
+    getattr(emby_client, method)(*args)
+
+    r_get_mock.assert_called_once_with(url)
+
+
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_music_roots',
+            return_value=['a', 'b'])
+@mock.patch('mopidy_emby.backend.EmbyHandler.get_item_type')
+def test_get_music_albums_merges_libraries(get_item_type_mock,
+                                           get_music_roots_mock, emby_client):
+    get_item_type_mock.side_effect = lambda root, t: {'a': {'Items': [
+        {'Name': 'A', 'SortName': 'a'}, {'Name': 'The C', 'SortName': 'c'},
+    ]}, 'b': {'Items': [
+        {'Name': 'B', 'SortName': 'b'},
+    ]}}[root]
+
+    assert [i['Name'] for i in emby_client.get_music_albums()] == [
+        'A', 'B', 'The C'
+    ]
+
+
+def test_create_track_shares_models(emby_client):
+    def track(track_id):
+        return {
+            'Id': track_id, 'Name': 'Track', 'RunTimeTicks': 0,
+            'AlbumId': 'album', 'Album': 'Album',
+            'ArtistItems': [{'Id': 'artist', 'Name': 'Artist'}],
+        }
+
+    first = emby_client.create_track(track('1'))
+    second = emby_client.create_track(track('2'))
+
+    assert first.album is second.album
+    assert list(first.artists)[0] is list(second.artists)[0]
+    assert list(first.album.artists)[0] is list(first.artists)[0]
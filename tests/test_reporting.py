@@ -0,0 +1,108 @@
+from __future__ import unicode_literals
+
+import json
+
+import mock
+
+import pytest
+
+from mopidy_emby.reporting import (
+    PLAYING, PROGRESS, PlaybackReporter, STOPPED
+)
+
+
+@pytest.fixture
+def reporter(tmpdir):
+    remote = mock.Mock()
+    remote.api_url.side_effect = lambda endpoint: endpoint
+
+    return PlaybackReporter(remote, str(tmpdir.join('reports.json')))
+
+
+def posted(reporter):
+    return [
+        (c[0][0], c[0][1].get('EventName'), c[0][1]['PositionTicks'])
+        for c in reporter.remote.r_post.call_args_list
+    ]
+
+
+@mock.patch('mopidy_emby.reporting.time.time')
+def test_flush(time_mock, reporter):
+    time_mock.return_value = 100
+    reporter.started('1')
+    reporter.paused('1', 500)
+    reporter.resumed('1', 500)
+    time_mock.return_value = 102
+
+    assert reporter.flush()
+    assert posted(reporter) == [
+        (PLAYING, None, 0),
+        (PROGRESS, 'Unpause', 5000000),
+    ]
+
+    reporter.remote.r_post.reset_mock()
+    reporter.flush()
+
+    # progress while playing is extrapolated
+    assert posted(reporter) == [(PROGRESS, 'TimeUpdate', 25000000)]
+
+
+def test_stopped_drops_progress(reporter):
+    reporter.started('1')
+    reporter.seeked(1000)
+    reporter.stopped('1', 1500)
+
+    reporter.flush()
+
+    assert posted(reporter) == [
+        (PLAYING, None, 0),
+        (STOPPED, None, 15000000),
+    ]
+
+    reporter.remote.r_post.reset_mock()
+    reporter.flush()
+
+    assert not reporter.remote.r_post.called
+
+
+def test_failed_reports_are_kept(reporter):
+    reporter.remote.r_post.side_effect = [None, Exception('offline')]
+    reporter.started('1')
+    reporter.stopped('1', 1000)
+    reporter.started('2')
+
+    assert not reporter.flush()
+
+    with open(reporter.path) as f:
+        assert [i[0] for i in json.load(f)] == [STOPPED, PLAYING]
+
+    # a restarted reporter picks them up
+    reporter = PlaybackReporter(reporter.remote, reporter.path)
+    reporter.remote.r_post.reset_mock()
+    reporter.remote.r_post.side_effect = None
+
+    assert reporter.flush()
+    assert [c[0][0] for c in reporter.remote.r_post.call_args_list] == [
+        STOPPED, PLAYING
+    ]
+    with pytest.raises(IOError):
+        open(reporter.path)
+
+
+def test_max_queued(reporter):
+    reporter.max_queued = 2
+    reporter.remote.r_post.side_effect = Exception('offline')
+
+    for i in range(3):
+        reporter.stopped(str(i), 0)
+    reporter.flush()
+
+    assert [i[1]['ItemId'] for i in reporter._queue] == ['1', '2']
+
+
+def test_start_stop(reporter):
+    reporter.started('1')
+    reporter.start()
+    reporter.stop()
+
+    assert reporter.remote.r_post.call_args_list[0][0][0] == PLAYING
@@ -0,0 +1,128 @@
+from __future__ import unicode_literals
+
+import asyncio
+
+from mopidy_emby import workers
+from mopidy_emby.metrics import metrics
+from mopidy_emby.scheduler import RequestScheduler, TokenBucket
+
+
+def run(scheduler, requests, hold=0.01):
+    """Runs ``(name, endpoint, priority)`` requests, returns start order.
+    """
+    started = []
+
+    async def request(name, endpoint, priority):
+        await scheduler.acquire(endpoint, priority)
+        started.append(name)
+        await asyncio.sleep(hold)
+        scheduler.release(endpoint, priority)
+
+    async def main():
+        await asyncio.gather(*[request(*r) for r in requests])
+
+    asyncio.run(main())
+
+    return started
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(2, burst=2, clock=lambda: now[0])
+
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == 0.5
+
+    now[0] = 0.5
+    assert bucket.take() == 0
+
+
+def test_priorities():
+    scheduler = RequestScheduler(max_connections=1)
+
+    assert run(scheduler, [
+        ('first', '/Items', workers.BACKGROUND),
+        ('sync', '/Items', workers.BACKGROUND),
+        ('browse', '/Artists', workers.INTERACTIVE),
+        ('play', '/Audio', workers.PLAYBACK),
+    ]) == ['first', 'play', 'browse', 'sync']
+
+
+def test_background_keeps_a_slot_free():
+    scheduler = RequestScheduler(max_connections=2, max_per_endpoint=2)
+
+    assert run(scheduler, [
+        ('sync1', '/Items', workers.BACKGROUND),
+        ('sync2', '/Items', workers.BACKGROUND),
+        ('sync3', '/Items', workers.BACKGROUND),
+        ('browse', '/Items', workers.INTERACTIVE),
+    ]) == ['sync1', 'browse', 'sync2', 'sync3']
+
+
+def test_max_per_endpoint():
+    scheduler = RequestScheduler(max_connections=3, max_per_endpoint=1)
+
+    assert run(scheduler, [
+        ('items1', '/Items', workers.INTERACTIVE),
+        ('items2', '/Items', workers.INTERACTIVE),
+        ('artists', '/Artists', workers.INTERACTIVE),
+    ]) == ['items1', 'artists', 'items2']
+
+
+def test_rate_limit():
+    scheduler = RequestScheduler(max_connections=4, rate=20, burst=1)
+    loop_time = []
+
+    async def main():
+        for endpoint in ('/A', '/B', '/C'):
+            await scheduler.acquire(endpoint)
+            loop_time.append(asyncio.get_event_loop().time())
+
+    asyncio.run(main())
+
+    assert loop_time[2] - loop_time[0] >= 0.09
+
+
+def test_queue_depth_metric():
+    metrics.reset()
+    scheduler = RequestScheduler(max_connections=1)
+
+    async def main():
+        await scheduler.acquire('/Items')
+        waiting = asyncio.ensure_future(
+            scheduler.acquire('/Items', workers.BACKGROUND))
+        await asyncio.sleep(0)
+
+        depth = scheduler.queue_depth
+        scheduler.release('/Items')
+        await waiting
+
+        return depth
+
+    assert asyncio.run(main()) == 1
+
+    gauges = {
+        g['labels']['lane']: g['value']
+        for g in metrics.snapshot()['gauges']
+        if g['name'] == 'emby_request_queue_depth'
+    }
+    assert gauges == {'playback': 0, 'interactive': 0, 'background': 0}
+
+
+def test_cancelled_waiter_is_skipped():
+    scheduler = RequestScheduler(max_connections=1)
+
+    async def main():
+        await scheduler.acquire('/Items')
+        waiting = asyncio.ensure_future(scheduler.acquire('/Items'))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+
+        scheduler.release('/Items')
+        await asyncio.wait_for(scheduler.acquire('/Items'), 1)
+
+    asyncio.run(main())
+
+    assert scheduler.queue_depth == 0
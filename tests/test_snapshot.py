@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+
+import time
+
+import mock
+
+from mopidy.models import Album, Artist, Track
+
+import pytest
+
+from mopidy_emby.classes import ATrack
+from mopidy_emby.federation import Federation, Source
+from mopidy_emby.snapshot import LibrarySnapshot
+
+
+TRACKS = [
+    ATrack(
+        uri='emby:track:1',
+        name='One',
+        artists=[Artist(uri='emby:artist:10', name='Artist')],
+        album=Album(uri='emby:album:20', name='Album'),
+        artwork='http://emby/1.jpg'
+    ),
+    Track(uri='emby:track:2', name='Two', disc_no=2, bitrate=320),
+]
+
+
+@pytest.fixture
+def federation():
+    primary = mock.Mock()
+    primary.iter_all_tracks.side_effect = lambda: iter(TRACKS)
+    office = mock.Mock()
+    office.iter_all_tracks.side_effect = lambda: iter(TRACKS[:1])
+
+    federation = Federation([Source(None, primary), Source('office', office)])
+
+    yield federation
+
+    federation.close()
+
+
+def test_tracks(federation):
+    tracks = list(LibrarySnapshot(federation).tracks())
+
+    assert [t.uri for t in tracks] == [
+        'emby:track:1', 'emby:track:2', 'emby:office:track:1'
+    ]
+    assert tracks[2].album.uri == 'emby:office:album:20'
+
+
+def test_tracks_skips_failed_server(federation):
+    office = federation.sources['office']
+    office.remote.iter_all_tracks.side_effect = Exception('down')
+
+    tracks = list(LibrarySnapshot(federation).tracks())
+
+    assert [t.uri for t in tracks] == ['emby:track:1', 'emby:track:2']
+    assert not office.healthy
+
+
+def test_tracks_single_server_raises():
+    remote = mock.Mock()
+    remote.iter_all_tracks.side_effect = Exception('down')
+
+    with pytest.raises(Exception):
+        list(LibrarySnapshot(Federation([Source(None, remote)])).tracks())
+
+
+def test_write_and_read(federation, tmpdir):
+    path = str(tmpdir.join('data', 'library.jsonl.gz'))
+    snapshot = LibrarySnapshot(federation, path)
+
+    assert not snapshot.exists()
+    assert snapshot.write() == 3
+    assert snapshot.exists()
+    assert not tmpdir.join('data', 'library.jsonl.gz.tmp').check()
+
+    tracks = list(snapshot.read())
+
+    assert tracks[:2] == TRACKS
+    assert isinstance(tracks[0], ATrack)
+    assert tracks[2].uri == 'emby:office:track:1'
+
+
+def test_load(federation, tmpdir):
+    snapshot = LibrarySnapshot(federation, str(tmpdir.join('library.gz')))
+
+    assert [t.uri for t in snapshot.load()] == [
+        'emby:track:1', 'emby:track:2', 'emby:office:track:1'
+    ]
+
+    snapshot.write()
+    federation.primary.remote.iter_all_tracks.side_effect = Exception('down')
+
+    assert len(list(snapshot.load())) == 3
+
+
+def test_write_keeps_old_dump_on_error(federation, tmpdir):
+    path = str(tmpdir.join('library.jsonl.gz'))
+    snapshot = LibrarySnapshot(Federation([federation.primary]), path)
+    snapshot.write()
+    federation.primary.remote.iter_all_tracks.side_effect = Exception('down')
+
+    with pytest.raises(Exception):
+        snapshot.write()
+
+    assert list(snapshot.read()) == TRACKS
+    assert not tmpdir.join('library.jsonl.gz.tmp').check()
+
+
+def test_write_without_path(federation):
+    assert LibrarySnapshot(federation).write() == 0
+
+
+def test_changed_writes_once_after_delay(federation, tmpdir):
+    snapshot = LibrarySnapshot(federation, str(tmpdir.join('library.gz')))
+    snapshot.refresh_delay = 0.05
+    submit = mock.Mock()
+
+    snapshot.changed(submit)
+    snapshot.changed(submit)
+    time.sleep(0.2)
+
+    submit.assert_called_once_with(snapshot.write)
+
+
+def test_changed_without_path(federation):
+    snapshot = LibrarySnapshot(federation)
+    snapshot.refresh_delay = 0.05
+    submit = mock.Mock()
+
+    snapshot.changed(submit)
+    time.sleep(0.1)
+
+    submit.assert_not_called()
+
+
+def test_cancel(federation, tmpdir):
+    snapshot = LibrarySnapshot(federation, str(tmpdir.join('library.gz')))
+    snapshot.refresh_delay = 0.05
+    submit = mock.Mock()
+
+    snapshot.changed(submit)
+    snapshot.cancel()
+    time.sleep(0.1)
+
+    submit.assert_not_called()
@@ -0,0 +1,214 @@
+from __future__ import unicode_literals
+
+import os
+
+import threading
+
+import mock
+
+from mopidy.models import Track
+
+import pytest
+
+from mopidy_emby import streamcache
+from mopidy_emby.streamcache import StreamCache
+
+
+def response(data):
+    r = mock.Mock()
+    r.iter_content.return_value = [data[i:i + 4]
+                                   for i in range(0, len(data), 4)]
+    r.headers = {'content-length': str(len(data))}
+
+    return r
+
+
+@pytest.fixture
+def stream_cache(tmpdir):
+    return StreamCache(str(tmpdir.join('streams')), 20, mock.Mock())
+
+
+@pytest.mark.parametrize('track,same_as', [
+    (Track(uri='emby:track:1', length=1000, bitrate=320),
+     Track(uri='emby:track:1', name='Renamed', length=1000, bitrate=320)),
+    (Track(last_modified=1), Track(name='Other', last_modified=1)),
+])
+def test_track_version(track, same_as):
+    assert StreamCache.track_version(track) == \
+        StreamCache.track_version(same_as)
+    assert StreamCache.track_version(track) != \
+        StreamCache.track_version(track.replace(length=2000))
+    assert StreamCache.track_version(track) != \
+        StreamCache.track_version(track.replace(last_modified=2))
+
+
+def test_get_miss(stream_cache):
+    assert stream_cache.get('123', 'abc') is None
+
+
+def test_download_and_get(stream_cache):
+    stream_cache.remote.r_stream.return_value = response(b'0123456789')
+
+    stream_cache._fetching['123.abc'] = threading.Event()
+    stream_cache._download('123', '123.abc', 'http://foo.bar')
+
+    uri = stream_cache.get('123', 'abc')
+    assert uri == 'file://' + os.path.join(stream_cache.path, '123.abc')
+    assert stream_cache.size == 10
+    assert not stream_cache._fetching
+
+
+def test_download_incomplete(stream_cache):
+    r = response(b'0123456789')
+    r.headers = {'content-length': '100'}
+    stream_cache.remote.r_stream.return_value = r
+
+    stream_cache._download('123', '123.abc', 'http://foo.bar')
+
+    assert stream_cache.get('123', 'abc') is None
+    assert os.listdir(stream_cache.path) == []
+
+
+def test_download_replaces_old_version(stream_cache):
+    stream_cache.remote.r_stream.return_value = response(b'0123')
+    stream_cache._download('123', '123.old', 'http://foo.bar')
+    stream_cache.remote.r_stream.return_value = response(b'01234567')
+    stream_cache._download('123', '123.new', 'http://foo.bar')
+
+    assert stream_cache.get('123', 'old') is None
+    assert stream_cache.get('123', 'new') is not None
+    assert stream_cache.size == 8
+
+
+def test_evicts_least_recently_used(stream_cache):
+    for item_id in ('1', '2'):
+        stream_cache.remote.r_stream.return_value = response(b'012345678')
+        stream_cache._download(item_id, item_id + '.v', 'http://foo.bar')
+
+    # touch the first one, so the second is the oldest
+    stream_cache.get('1', 'v')
+
+    stream_cache.remote.r_stream.return_value = response(b'012345678')
+    stream_cache._download('3', '3.v', 'http://foo.bar')
+
+    assert stream_cache.get('1', 'v') is not None
+    assert stream_cache.get('2', 'v') is None
+    assert stream_cache.get('3', 'v') is not None
+
+
+def test_pinned_items_are_not_evicted(stream_cache):
+    for item_id in ('1', '2'):
+        stream_cache.remote.r_stream.return_value = response(b'012345678')
+        stream_cache._download(item_id, item_id + '.v', 'http://foo.bar')
+
+    stream_cache.pin(['1', '2'])
+
+    stream_cache.remote.r_stream.return_value = response(b'012345678')
+    stream_cache._download('3', '3.v', 'http://foo.bar')
+
+    assert stream_cache.get('1', 'v') is not None
+    assert stream_cache.get('2', 'v') is not None
+    assert stream_cache.get('3', 'v') is None
+
+
+def test_fetch_skips_cached(stream_cache, mocker):
+    thread_mock = mocker.patch('mopidy_emby.streamcache.threading.Thread')
+    stream_cache.remote.r_stream.return_value = response(b'0123')
+    stream_cache._download('1', '1.v', 'http://foo.bar')
+
+    stream_cache.fetch('1', 'v', 'http://foo.bar')
+    stream_cache.fetch('2', 'v', 'http://foo.bar')
+    stream_cache.fetch('2', 'v', 'http://foo.bar')
+
+    assert thread_mock.call_count == 1
+
+
+def test_fetch_returns_local_url(stream_cache):
+    stream_cache.remote.r_stream.return_value = response(b'0123')
+
+    assert stream_cache.fetch('1', 'abc', 'http://foo.bar') is None
+
+    stream_cache.local_url = 'http://127.0.0.1:6680/emby/stream/'
+
+    assert stream_cache.fetch('1', 'abc', 'http://foo.bar') == \
+        'http://127.0.0.1:6680/emby/stream/1.abc'
+    assert stream_cache.fetch('2', 'abc', 'http://foo.bar') == \
+        'http://127.0.0.1:6680/emby/stream/2.abc'
+
+
+def test_fetch_download_failed(stream_cache):
+    stream_cache.local_url = 'http://127.0.0.1:6680/emby/stream/'
+    stream_cache.remote.r_stream.side_effect = Exception('Unavailable')
+
+    assert stream_cache.fetch('1', 'abc', 'http://foo.bar') is None
+    assert not stream_cache._fetching
+
+
+def test_fetch_download_not_started(stream_cache, mocker):
+    mocker.patch('mopidy_emby.streamcache.threading.Thread')
+    mocker.patch.object(StreamCache, 'start_timeout', 0)
+    stream_cache.local_url = 'http://127.0.0.1:6680/emby/stream/'
+
+    assert stream_cache.fetch('1', 'abc', 'http://foo.bar') is None
+
+
+@pytest.mark.parametrize('http,expected', [
+    ({'enabled': True, 'hostname': '::', 'port': 6680},
+     'http://127.0.0.1:6680/emby/stream/'),
+    ({'enabled': True, 'hostname': '::1', 'port': 6680},
+     'http://[::1]:6680/emby/stream/'),
+    ({'enabled': False, 'hostname': '::', 'port': 6680}, None),
+    (None, None),
+])
+def test_local_url(http, expected):
+    assert streamcache.local_url({'http': http}) == expected
+
+
+def test_follow_download(stream_cache, mocker):
+    mocker.patch.object(StreamCache, 'poll_interval', 0.01)
+    chunks = [b'0123', b'4567', b'89']
+    arrived = threading.Event()
+
+    def iter_content(chunk_size):
+        for chunk in chunks:
+            yield chunk
+            arrived.wait(1)
+            arrived.clear()
+
+    r = response(b'0123456789')
+    r.iter_content = iter_content
+    stream_cache.remote.r_stream.return_value = r
+    stream_cache.fetch('123', 'abc', 'http://foo.bar')
+
+    data = b''
+    for chunk in StreamCache.follow(stream_cache.path, '123.abc', 1):
+        data += chunk
+        arrived.set()
+
+    assert data == b'0123456789'
+    assert stream_cache.get('123', 'abc') is not None
+
+
+def test_follow_cached(stream_cache):
+    stream_cache.remote.r_stream.return_value = response(b'0123456789')
+    stream_cache._download('123', '123.abc', 'http://foo.bar')
+
+    assert b''.join(StreamCache.follow(stream_cache.path, '123.abc')) == \
+        b'0123456789'
+
+
+@pytest.mark.parametrize('name', ['123.abc', '../123.abc', '123'])
+def test_follow_missing(name, stream_cache):
+    assert list(StreamCache.follow(stream_cache.path, name, 0)) == []
+
+
+def test_load_existing_files(tmpdir):
+    path = tmpdir.mkdir('streams')
+    path.join('1.v').write('0123')
+    path.join('2.v.part').write('01')
+
+    stream_cache = StreamCache(str(path), 20, mock.Mock())
+
+    assert stream_cache.size == 4
+    assert stream_cache.get('1', 'v') is not None
+    assert not path.join('2.v.part').exists()
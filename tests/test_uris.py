@@ -0,0 +1,85 @@
+from __future__ import unicode_literals
+
+import mock
+
+import pytest
+
+from mopidy_emby.federation import Federation, Source
+from mopidy_emby.uris import UriRouter
+
+
+@pytest.fixture
+def federation():
+    federation = Federation([
+        Source(None, mock.Mock()),
+        Source('office', mock.Mock()),
+    ])
+
+    yield federation
+
+    federation.close()
+
+
+@pytest.fixture
+def router():
+    return UriRouter([
+        ('directory:root', lambda: 'root'),
+        ('directory:genre:*', lambda genre: ('genre', genre)),
+        ('directory:*', lambda value: ('directory', value)),
+        ('track:*', lambda remote, id: [remote, id], True),
+    ])
+
+
+@pytest.mark.parametrize('uri,expected', [
+    ('emby:directory:root', 'root'),
+    ('emby:directory:genre:Rock', ('genre', 'Rock')),
+    ('emby:directory:123', ('directory', '123')),
+])
+def test_dispatch(uri, expected, router, federation):
+    assert router.dispatch(federation, uri) == expected
+
+
+@pytest.mark.parametrize('uri', [
+    None, '', 'emby', 'spotify:track:1', 'emby:track', 'emby:track:1:2',
+    'emby:album:1', 'emby:office:directory:root', 'emby:home:track:1',
+])
+def test_dispatch_invalid(uri, router, federation):
+    assert router.dispatch(federation, uri, default=[]) == []
+
+
+def test_dispatch_per_source(router, federation):
+    primary = federation.sources[None].remote
+    office = federation.sources['office'].remote
+
+    assert router.dispatch(federation, 'emby:track:1') == [primary, '1']
+    assert router.dispatch(federation, 'emby:office:track:1') == \
+        [office, '1']
+
+
+def test_match_keeps_local_uri(router, federation):
+    route = router.match(federation, 'emby:office:track:1')
+
+    assert route.source is federation.sources['office']
+    assert route.args == ('1',)
+    assert route.uri == 'emby:track:1'
+
+
+def test_dispatch_many_batches_per_server(federation):
+    single = mock.Mock(side_effect=lambda remote, id: 'single ' + id)
+    batch = mock.Mock(
+        side_effect=lambda remote, args: ['batch ' + a[0] for a in args])
+    router = UriRouter([('track:*', single, True, batch)])
+
+    results = router.dispatch_many(federation, [
+        'emby:track:1', 'emby:office:track:2', 'emby:album:3',
+        'emby:track:4',
+    ])
+
+    assert list(results.items()) == [
+        ('emby:track:1', 'batch 1'),
+        ('emby:office:track:2', 'single 2'),
+        ('emby:track:4', 'batch 4'),
+    ]
+    batch.assert_called_once_with(
+        federation.sources[None].remote, [('1',), ('4',)])
+    single.assert_called_once_with(federation.sources['office'].remote, '2')
@@ -1,9 +1,12 @@
 from __future__ import unicode_literals
 
+import threading
+
 from mock import Mock
 
+import pytest
 
-from mopidy_emby import utils
+from mopidy_emby import utils, workers
 
 
 def test_decorator():
@@ -33,3 +36,149 @@ def test_set_ttl_cache():
     assert func.called is True
     assert decorated_func._call_count == 1
     assert decorated_func.ttl == 5
+
+
+def test_invalidate_and_patch():
+    calls = []
+
+    @utils.cache()
+    def get_item(item_id):
+        calls.append(item_id)
+        return {'Id': item_id}
+
+    get_item(1)
+    get_item.cache.patch((1,), {'Id': 1, 'Name': 'patched'})
+    get_item.cache.patch((2,), {'Id': 2})
+
+    assert get_item(1) == {'Id': 1, 'Name': 'patched'}
+    assert get_item.cache.entries() == [((1,), {'Id': 1, 'Name': 'patched'})]
+
+    get_item.cache.invalidate(1)
+    get_item(1)
+
+    assert calls == [1, 1]
+
+    get_item.cache.clear()
+    assert get_item.cache.entries() == []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils, 'time', Mock(time=lambda: now[0]))
+    monkeypatch.setattr(utils.cache, 'executor', lambda func: func())
+
+    return now
+
+
+def test_stale_while_revalidate(clock):
+    calls = []
+
+    @utils.cache(ctl=float('inf'), ttl=10, stale=100)
+    def get_item(item_id):
+        calls.append(item_id)
+        return len(calls)
+
+    assert get_item(1) == 1
+
+    # expired, the old value is served and refetched for the next call
+    clock[0] += 20
+    assert get_item(1) == 1
+    assert get_item(1) == 2
+    assert calls == [1, 1]
+
+    # too old to be served
+    clock[0] += 200
+    assert get_item(1) == 3
+
+
+def test_stale_refresh_runs_once(clock):
+    refreshes = []
+    utils.cache.executor = refreshes.append
+
+    @utils.cache(ctl=float('inf'), ttl=10, stale=100)
+    def get_item(item_id):
+        return 'new'
+
+    get_item(1)
+    clock[0] += 20
+    get_item(1)
+    get_item(1)
+
+    assert len(refreshes) == 1
+
+
+def test_stale_refresh_keeps_invalidated_entry(clock):
+    values = iter(['first', 'second', 'third'])
+
+    @utils.cache(ctl=float('inf'), ttl=10, stale=100)
+    def get_item(item_id):
+        return next(values)
+
+    def executor(func):
+        # library change events drop the entry while it is refetched
+        get_item.cache.invalidate(1)
+        func()
+
+    get_item(1)
+    clock[0] += 20
+    utils.cache.executor = executor
+
+    assert get_item(1) == 'first'
+    assert get_item.cache.entries() == []
+    assert get_item(1) == 'third'
+
+
+def test_stale_refresh_failure_keeps_value(clock):
+    @utils.cache(ctl=float('inf'), ttl=10, stale=100)
+    def get_item(item_id):
+        if clock[0] > 1000:
+            raise Exception('Cant connect to Emby API')
+        return 'old'
+
+    get_item(1)
+    clock[0] += 20
+
+    assert get_item(1) == 'old'
+    assert get_item(1) == 'old'
+
+
+def test_stale_refresh_in_thread(monkeypatch):
+    monkeypatch.setattr(utils.cache, 'executor', None)
+    refreshed = threading.Event()
+    priorities = []
+
+    @utils.cache(ctl=2, stale=100)
+    def get_item(item_id):
+        priorities.append(workers.current_priority())
+        if len(priorities) > 1:
+            refreshed.set()
+        return item_id
+
+    for i in range(3):
+        assert get_item(1) == 1
+
+    assert refreshed.wait(1)
+    assert priorities == [workers.INTERACTIVE, workers.BACKGROUND]
+
+
+def test_max_entries():
+    calls = []
+
+    @utils.cache(ctl=float('inf'), max_entries=2)
+    def get_item(item_id):
+        calls.append(item_id)
+        return item_id
+
+    get_item(1)
+    get_item(2)
+    get_item(1)
+    get_item(3)
+
+    assert len(get_item.cache) == 2
+    assert [args for args, _ in get_item.cache.entries()] == [(1,), (3,)]
+
+    get_item(1)
+    get_item(2)
+
+    assert calls == [1, 2, 3, 2]
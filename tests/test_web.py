@@ -0,0 +1,151 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import tempfile
+
+import mock
+
+from mopidy.models import Track
+
+import tornado.testing
+import tornado.web
+
+from mopidy_emby import web
+from mopidy_emby.metrics import metrics
+from mopidy_emby.profiling import profiler
+from mopidy_emby.snapshot import LibrarySnapshot
+
+
+class MetricsHandlerTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application(web.factory({}, None))
+
+    def setUp(self):
+        super(MetricsHandlerTest, self).setUp()
+        metrics.reset()
+        metrics.inc('emby_requests_total', endpoint='/Foo', status=200)
+
+    def test_prometheus(self):
+        response = self.fetch('/metrics')
+
+        assert response.code == 200
+        assert response.headers['Content-Type'].startswith('text/plain')
+        assert b'emby_requests_total{endpoint="/Foo",status="200"} 1' in \
+            response.body
+
+    def test_json(self):
+        response = self.fetch('/metrics?format=json')
+
+        assert response.code == 200
+        assert json.loads(response.body.decode('utf-8'))['counters'] == [{
+            'name': 'emby_requests_total',
+            'labels': {'endpoint': '/Foo', 'status': 200},
+            'value': 1
+        }]
+
+
+class ProfileHandlerTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application(web.factory({}, None))
+
+    def test_profile(self):
+        profiler.configure(1.0, 5)
+        profiler.wrap('browse', 'emby:directory:root', lambda: None)()
+
+        response = self.fetch('/profile')
+        data = json.loads(response.body.decode('utf-8'))
+
+        profiler.configure(0.0)
+
+        assert response.code == 200
+        assert data['sample_rate'] == 1.0
+        assert data['slowest'][0]['target'] == 'emby:directory:root'
+
+
+class SnapshotHandlerTest(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'library.jsonl.gz')
+        self.snapshot = LibrarySnapshot(mock.Mock(), self.path)
+        self.snapshot.tracks = mock.Mock(side_effect=lambda: iter([
+            Track(uri='emby:track:{}'.format(i)) for i in range(3)
+        ]))
+        super(SnapshotHandlerTest, self).setUp()
+
+    def get_app(self):
+        return tornado.web.Application([
+            ('/snapshot', web.SnapshotHandler, {
+                'path': self.path,
+                'get_snapshot': lambda: self.snapshot,
+            }),
+        ])
+
+    def fetch_uris(self):
+        response = self.fetch('/snapshot')
+        lines = response.body.decode('utf-8').splitlines()
+
+        assert response.code == 200
+        assert response.headers['Content-Type'] == 'application/x-ndjson'
+
+        return [json.loads(line)['uri'] for line in lines]
+
+    def test_snapshot(self):
+        self.snapshot.write()
+        self.snapshot.tracks.reset_mock()
+
+        with mock.patch.object(web.SnapshotHandler, 'chunk_size', 20):
+            uris = self.fetch_uris()
+
+        assert uris == ['emby:track:0', 'emby:track:1', 'emby:track:2']
+        self.snapshot.tracks.assert_not_called()
+
+    def test_export_without_dump(self):
+        with mock.patch.object(web.SnapshotHandler, 'batch_size', 2):
+            uris = self.fetch_uris()
+
+        assert uris == ['emby:track:0', 'emby:track:1', 'emby:track:2']
+
+
+class SnapshotDisabledTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application(web.factory({}, None))
+
+    def test_backend_not_running(self):
+        assert self.fetch('/snapshot').code == 503
+
+
+class StreamHandlerTest(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        super(StreamHandlerTest, self).setUp()
+
+    def get_app(self):
+        return tornado.web.Application([
+            ('/stream/([^/]+)', web.StreamHandler, {'path': self.path}),
+        ])
+
+    def test_cached(self):
+        with open(os.path.join(self.path, '123.abc'), 'wb') as f:
+            f.write(b'audio')
+
+        response = self.fetch('/stream/123.abc')
+
+        assert response.code == 200
+        assert response.body == b'audio'
+
+    def test_invalid_name(self):
+        assert self.fetch('/stream/..').code == 404
+
+
+class StreamDisabledTest(tornado.testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application(web.factory({}, None))
+
+    def test_disabled(self):
+        assert self.fetch('/stream/123.abc').code == 404
@@ -0,0 +1,148 @@
+from __future__ import unicode_literals
+
+import threading
+
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from mopidy_emby import workers
+from mopidy_emby.workers import WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(2)
+
+    yield pool
+
+    pool.stop()
+
+
+def test_run(pool):
+    assert pool.run(workers.INTERACTIVE, 1, lambda x: x * 2, 21) == 42
+
+
+def test_run_exception(pool):
+    def fail():
+        raise Exception('Emby: Cant find music root directory')
+
+    with pytest.raises(Exception) as execinfo:
+        pool.run(workers.INTERACTIVE, 1, fail)
+
+    assert 'Cant find music root directory' in str(execinfo.value)
+
+
+def test_run_timeout(pool):
+    event = threading.Event()
+
+    with pytest.raises(TimeoutError):
+        pool.run(workers.INTERACTIVE, 0.05, event.wait)
+
+    event.set()
+
+
+def test_run_timeout_drops_queued_job(pool):
+    release = threading.Event()
+    called = []
+
+    # keeps both threads busy
+    for i in range(2):
+        pool.submit(workers.INTERACTIVE, release.wait)
+
+    with pytest.raises(TimeoutError):
+        pool.run(workers.INTERACTIVE, 0.05, called.append, 'late')
+
+    release.set()
+    pool.run(workers.INTERACTIVE, 1, lambda: None)
+
+    assert called == []
+
+
+def test_interactive_jumps_ahead_of_background(pool):
+    release = threading.Event()
+    order = []
+
+    # keeps the only background slot busy
+    pool.submit(workers.BACKGROUND, release.wait)
+    queued = [
+        pool.submit(workers.BACKGROUND, order.append, 'background')
+        for i in range(3)
+    ]
+
+    # the reserved thread runs this while background work is stuck
+    assert pool.run(workers.PLAYBACK, 1, order.append, 'playback') is None
+    assert order == ['playback']
+
+    release.set()
+    for future in queued:
+        future.result(timeout=1)
+
+    assert order == ['playback'] + ['background'] * 3
+
+
+def test_priority_order():
+    pool = WorkerPool(2)
+    release = threading.Event()
+    started = threading.Semaphore(0)
+    order = []
+
+    def block():
+        started.release()
+        release.wait()
+
+    try:
+        # block both threads so the following jobs queue up
+        blockers = [pool.submit(workers.INTERACTIVE, block) for i in range(2)]
+        started.acquire()
+        started.acquire()
+
+        futures = [
+            pool.submit(workers.BACKGROUND, order.append, 'background'),
+            pool.submit(workers.INTERACTIVE, order.append, 'interactive'),
+            pool.submit(workers.PLAYBACK, order.append, 'playback'),
+        ]
+        assert pool.queue_depth == 3
+
+        release.set()
+        for future in blockers + futures:
+            future.result(timeout=1)
+    finally:
+        pool.stop()
+
+    assert order.index('playback') < order.index('background')
+    assert order.index('interactive') < order.index('background')
+
+
+def test_stop_cancels_queued():
+    pool = WorkerPool(2)
+    release = threading.Event()
+
+    for i in range(2):
+        pool.submit(workers.INTERACTIVE, release.wait)
+    future = pool.submit(workers.INTERACTIVE, lambda: None)
+
+    pool.stop()
+    release.set()
+
+    assert future.cancelled()
+
+    with pytest.raises(Exception):
+        pool.submit(workers.INTERACTIVE, lambda: None)
+
+
+def test_current_priority(pool):
+    assert workers.current_priority() == workers.INTERACTIVE
+    assert pool.run(
+        workers.BACKGROUND, 1, workers.current_priority
+    ) == workers.BACKGROUND
+    assert pool.run(
+        workers.PLAYBACK, 1, workers.current_priority
+    ) == workers.PLAYBACK
+
+
+def test_running_as():
+    with workers.running_as(workers.BACKGROUND):
+        assert workers.current_priority() == workers.BACKGROUND
+
+    assert workers.current_priority() == workers.INTERACTIVE